@@ -5,18 +5,32 @@ Quick data audit for the Olist raw CSVs (Step 1: Data Audit + Grain Lock).
 Usage:
   python notebooks/01_data_audit.py
   python notebooks/01_data_audit.py --write-report docs/data_quality_report.md
+  python notebooks/01_data_audit.py --streaming --chunksize 500000
+
+--streaming computes the same report in one chunked pass per file with
+bounded memory: counts, nulls and time checks are exact, duplicates and join
+coverage use 64-bit key hashes (src/sketches.py), and the describe()
+percentiles come from a mergeable quantile sketch (within 0.1%).
 """
 
 from __future__ import annotations
 
 import argparse
+import sys
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterator, Optional, Sequence
 
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from raw_cache import read_raw  # noqa: E402
+from schema import apply_schema, read_csv_dtypes  # noqa: E402
+from sketches import HashedKeySet, QuantileSketch, hash_keys  # noqa: E402
+
 
 RAW_DIR = Path("data/raw")
+DEFAULT_CHUNKSIZE = 250_000
+DESCRIBE_PERCENTILES = [0.99]
 EXPECTED_FILES = {
     "orders": "olist_orders_dataset.csv",
     "order_items": "olist_order_items_dataset.csv",
@@ -31,15 +45,15 @@ def pct(n: int, d: int) -> float:
     return (n / d * 100.0) if d else 0.0
 
 
-def load_csv(path: Path) -> pd.DataFrame:
-    return pd.read_csv(path)
+def load_csv(path: Path, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    return read_raw(path.name, columns=columns, raw_dir=path.parent)
 
 
 def safe_dt(series: pd.Series) -> pd.Series:
     return pd.to_datetime(series, errors="coerce", utc=False)
 
 
-def audit() -> Dict[str, object]:
+def check_files() -> None:
     missing = [name for name, fn in EXPECTED_FILES.items() if not (RAW_DIR / fn).exists()]
     if missing:
         missing_files = [EXPECTED_FILES[name] for name in missing]
@@ -47,11 +61,29 @@ def audit() -> Dict[str, object]:
             "Missing raw files in data/raw/: " + ", ".join(missing_files)
         )
 
-    orders = load_csv(RAW_DIR / EXPECTED_FILES["orders"])
-    order_items = load_csv(RAW_DIR / EXPECTED_FILES["order_items"])
-    payments = load_csv(RAW_DIR / EXPECTED_FILES["payments"])
-    customers = load_csv(RAW_DIR / EXPECTED_FILES["customers"])
-    products = load_csv(RAW_DIR / EXPECTED_FILES["products"])
+
+def audit() -> Dict[str, object]:
+    check_files()
+
+    orders = load_csv(
+        RAW_DIR / EXPECTED_FILES["orders"],
+        columns=[
+            "order_id",
+            "order_status",
+            "order_purchase_timestamp",
+            "order_delivered_customer_date",
+            "order_estimated_delivery_date",
+        ],
+    )
+    order_items = load_csv(
+        RAW_DIR / EXPECTED_FILES["order_items"],
+        columns=["order_id", "order_item_id", "product_id", "price", "freight_value"],
+    )
+    payments = load_csv(
+        RAW_DIR / EXPECTED_FILES["payments"], columns=["order_id", "payment_value"]
+    )
+    customers = load_csv(RAW_DIR / EXPECTED_FILES["customers"], columns=["customer_id"])
+    products = load_csv(RAW_DIR / EXPECTED_FILES["products"], columns=["product_id"])
 
     # PK uniqueness
     dup_orders = orders.duplicated(subset=["order_id"]).sum()
@@ -73,9 +105,11 @@ def audit() -> Dict[str, object]:
     orders_with_payments = orders["order_id"].isin(payments["order_id"]).sum()
 
     # Price / payment ranges
-    price_stats = order_items["price"].describe(percentiles=[0.99])
-    freight_stats = order_items["freight_value"].describe(percentiles=[0.99])
-    payment_stats = payments["payment_value"].describe(percentiles=[0.99])
+    price_stats = order_items["price"].describe(percentiles=DESCRIBE_PERCENTILES)
+    freight_stats = order_items["freight_value"].describe(
+        percentiles=DESCRIBE_PERCENTILES
+    )
+    payment_stats = payments["payment_value"].describe(percentiles=DESCRIBE_PERCENTILES)
 
     # Time logic checks
     purchase_ts = safe_dt(orders["order_purchase_timestamp"])
@@ -85,53 +119,214 @@ def audit() -> Dict[str, object]:
     delivered_before_purchase = (delivered_ts < purchase_ts).sum()
     delivered_after_estimated = (delivered_ts > estimated_ts).sum()
 
-    return {
-        "counts": {
+    return build_result(
+        counts={
             "orders": len(orders),
             "order_items": len(order_items),
             "payments": len(payments),
             "customers": len(customers),
             "products": len(products),
         },
+        dupes={
+            "orders": dup_orders,
+            "order_items": dup_order_items,
+            "customers": dup_customers,
+            "products": dup_products,
+        },
+        missing_ts={
+            "purchase": missing_purchase,
+            "delivered": missing_delivered,
+            "estimated": missing_estimated,
+        },
+        status_counts=status_counts,
+        coverage={
+            "orders_with_items": orders_with_items,
+            "items_with_products": items_with_products,
+            "orders_with_payments": orders_with_payments,
+        },
+        stats={
+            "price_stats": price_stats,
+            "freight_stats": freight_stats,
+            "payment_stats": payment_stats,
+        },
+        time_logic={
+            "delivered_before_purchase": delivered_before_purchase,
+            "delivered_after_estimated": delivered_after_estimated,
+        },
+    )
+
+
+def build_result(
+    counts: Dict[str, int],
+    dupes: Dict[str, int],
+    missing_ts: Dict[str, int],
+    status_counts: pd.Series,
+    coverage: Dict[str, int],
+    stats: Dict[str, pd.Series],
+    time_logic: Dict[str, int],
+) -> Dict[str, object]:
+    """Shape shared by both audits: (count, percent) pairs plus the stats."""
+    # Denominator of each coverage metric.
+    coverage_base = {
+        "orders_with_items": "orders",
+        "items_with_products": "order_items",
+        "orders_with_payments": "orders",
+    }
+    return {
+        "counts": counts,
         "pk_dupes": {
-            "orders": (dup_orders, pct(dup_orders, len(orders))),
-            "order_items": (dup_order_items, pct(dup_order_items, len(order_items))),
-            "customers": (dup_customers, pct(dup_customers, len(customers))),
-            "products": (dup_products, pct(dup_products, len(products))),
+            name: (n, pct(n, counts[name])) for name, n in dupes.items()
         },
         "missing_ts": {
-            "purchase": (missing_purchase, pct(missing_purchase, len(orders))),
-            "delivered": (missing_delivered, pct(missing_delivered, len(orders))),
-            "estimated": (missing_estimated, pct(missing_estimated, len(orders))),
+            name: (n, pct(n, counts["orders"])) for name, n in missing_ts.items()
         },
         "status_counts": status_counts,
         "join_coverage": {
-            "orders_with_items": (orders_with_items, pct(orders_with_items, len(orders))),
-            "items_with_products": (
-                items_with_products,
-                pct(items_with_products, len(order_items)),
-            ),
-            "orders_with_payments": (
-                orders_with_payments,
-                pct(orders_with_payments, len(orders)),
-            ),
+            name: (n, pct(n, counts[coverage_base[name]]))
+            for name, n in coverage.items()
         },
-        "price_stats": price_stats,
-        "freight_stats": freight_stats,
-        "payment_stats": payment_stats,
+        **stats,
         "time_logic": {
-            "delivered_before_purchase": (
-                delivered_before_purchase,
-                pct(delivered_before_purchase, len(orders)),
-            ),
-            "delivered_after_estimated": (
-                delivered_after_estimated,
-                pct(delivered_after_estimated, len(orders)),
-            ),
+            name: (n, pct(n, counts["orders"])) for name, n in time_logic.items()
         },
     }
 
 
+def read_chunks(
+    name: str, columns: Sequence[str], chunksize: int
+) -> Iterator[pd.DataFrame]:
+    """Stream a raw file with the registry dtypes (bypasses the raw cache)."""
+    path = RAW_DIR / EXPECTED_FILES[name]
+    reader = pd.read_csv(
+        path,
+        usecols=list(columns),
+        dtype=read_csv_dtypes(path.name, columns),
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        yield apply_schema(chunk, path.name)
+
+
+def audit_streaming(chunksize: int = DEFAULT_CHUNKSIZE) -> Dict[str, object]:
+    """
+    Same metrics as audit() in one chunked pass per file. Key sets are built
+    from the files other checks look up into (products, payments, items)
+    before orders are read.
+    """
+    check_files()
+    counts = dict.fromkeys(["orders", "order_items", "payments", "customers", "products"], 0)
+    dupes = dict.fromkeys(["orders", "order_items", "customers", "products"], 0)
+
+    product_ids = HashedKeySet()
+    for products in read_chunks("products", ["product_id"], chunksize):
+        counts["products"] += len(products)
+        dupes["products"] += product_ids.add(hash_keys(products["product_id"]))
+
+    customer_ids = HashedKeySet()
+    for customers in read_chunks("customers", ["customer_id"], chunksize):
+        counts["customers"] += len(customers)
+        dupes["customers"] += customer_ids.add(hash_keys(customers["customer_id"]))
+    del customer_ids
+
+    payment_orders = HashedKeySet()
+    payment_sketch = QuantileSketch()
+    for payments in read_chunks("payments", ["order_id", "payment_value"], chunksize):
+        counts["payments"] += len(payments)
+        payment_orders.add(hash_keys(payments["order_id"]))
+        payment_sketch.update(payments["payment_value"])
+
+    item_keys = HashedKeySet()
+    item_orders = HashedKeySet()
+    price_sketch = QuantileSketch()
+    freight_sketch = QuantileSketch()
+    items_with_products = 0
+    item_columns = ["order_id", "order_item_id", "product_id", "price", "freight_value"]
+    for items in read_chunks("order_items", item_columns, chunksize):
+        counts["order_items"] += len(items)
+        dupes["order_items"] += item_keys.add(
+            hash_keys(items[["order_id", "order_item_id"]])
+        )
+        item_orders.add(hash_keys(items["order_id"]))
+        items_with_products += int(
+            product_ids.contains(hash_keys(items["product_id"])).sum()
+        )
+        price_sketch.update(items["price"])
+        freight_sketch.update(items["freight_value"])
+    del item_keys, product_ids
+
+    order_ids = HashedKeySet()
+    missing_ts = dict.fromkeys(["purchase", "delivered", "estimated"], 0)
+    time_logic = dict.fromkeys(
+        ["delivered_before_purchase", "delivered_after_estimated"], 0
+    )
+    coverage = dict.fromkeys(
+        ["orders_with_items", "items_with_products", "orders_with_payments"], 0
+    )
+    coverage["items_with_products"] = items_with_products
+    status_totals: Dict[object, int] = {}
+    order_columns = [
+        "order_id",
+        "order_status",
+        "order_purchase_timestamp",
+        "order_delivered_customer_date",
+        "order_estimated_delivery_date",
+    ]
+    for orders in read_chunks("orders", order_columns, chunksize):
+        counts["orders"] += len(orders)
+        order_hashes = hash_keys(orders["order_id"])
+        dupes["orders"] += order_ids.add(order_hashes)
+
+        missing_ts["purchase"] += int(orders["order_purchase_timestamp"].isna().sum())
+        missing_ts["delivered"] += int(
+            orders["order_delivered_customer_date"].isna().sum()
+        )
+        missing_ts["estimated"] += int(
+            orders["order_estimated_delivery_date"].isna().sum()
+        )
+
+        statuses = orders["order_status"].astype(object)
+        for status, n in statuses.value_counts(dropna=False, sort=False).items():
+            key = None if pd.isna(status) else status
+            status_totals[key] = status_totals.get(key, 0) + int(n)
+
+        coverage["orders_with_items"] += int(item_orders.contains(order_hashes).sum())
+        coverage["orders_with_payments"] += int(
+            payment_orders.contains(order_hashes).sum()
+        )
+
+        purchase_ts = safe_dt(orders["order_purchase_timestamp"])
+        delivered_ts = safe_dt(orders["order_delivered_customer_date"])
+        estimated_ts = safe_dt(orders["order_estimated_delivery_date"])
+        time_logic["delivered_before_purchase"] += int((delivered_ts < purchase_ts).sum())
+        time_logic["delivered_after_estimated"] += int((delivered_ts > estimated_ts).sum())
+
+    # Same order as value_counts on the categorical column: count descending,
+    # ties by value.
+    status_counts = pd.Series(
+        list(status_totals.values()),
+        index=pd.Index(list(status_totals), name="order_status"),
+        name="count",
+        dtype="int64",
+    )
+    status_counts = status_counts.sort_index().sort_values(
+        ascending=False, kind="stable"
+    )
+
+    return build_result(
+        counts=counts,
+        dupes=dupes,
+        missing_ts=missing_ts,
+        status_counts=status_counts,
+        coverage=coverage,
+        stats={
+            "price_stats": price_sketch.describe(DESCRIBE_PERCENTILES),
+            "freight_stats": freight_sketch.describe(DESCRIBE_PERCENTILES),
+            "payment_stats": payment_sketch.describe(DESCRIBE_PERCENTILES),
+        },
+        time_logic=time_logic,
+    )
+
+
 def format_report(result: Dict[str, object]) -> str:
     counts = result["counts"]
     pk_dupes = result["pk_dupes"]
@@ -203,9 +398,20 @@ def main() -> None:
         default=None,
         help="Write markdown report to this path",
     )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="One chunked pass per file with bounded memory (approximate percentiles)",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=DEFAULT_CHUNKSIZE,
+        help=f"Rows per chunk for --streaming (default: {DEFAULT_CHUNKSIZE})",
+    )
     args = parser.parse_args()
 
-    result = audit()
+    result = audit_streaming(args.chunksize) if args.streaming else audit()
     report = format_report(result)
 
     if args.write_report:
@@ -0,0 +1,24 @@
+-- fact_seller_daily validation checks (Postgres)
+
+-- 1) Items and GMV match fact_order_items (should be 0)
+SELECT
+    (SELECT SUM(items_cnt) FROM fact_seller_daily)
+    - (SELECT COUNT(*) FROM fact_order_items WHERE order_date IS NOT NULL) AS items_diff,
+    ROUND(
+        (SELECT SUM(gmv_sum) FROM fact_seller_daily)
+        - (SELECT SUM(item_gmv) FROM fact_order_items WHERE order_date IS NOT NULL),
+        0
+    ) AS gmv_diff;
+
+-- 2) Late counts within their denominator (should return 0 rows)
+SELECT seller_id, order_date, late_orders_cnt, late_orders_den
+FROM fact_seller_daily
+WHERE late_orders_cnt > late_orders_den
+   OR late_orders_den > orders_cnt;
+
+-- 3) Sellers without a state (coverage)
+SELECT
+    SUM(CASE WHEN seller_state IS NULL THEN 1 ELSE 0 END) AS rows_without_state,
+    COUNT(DISTINCT seller_id) AS sellers,
+    COUNT(*) AS rows_cnt
+FROM fact_seller_daily;
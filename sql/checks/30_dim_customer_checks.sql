@@ -0,0 +1,23 @@
+-- dim_customer / cohort_retention validation checks (Postgres)
+
+-- 1) Grain check (should return 0)
+SELECT
+    COUNT(*) - COUNT(DISTINCT customer_unique_id) AS diff_count
+FROM dim_customer;
+
+-- 2) Orders add up to fact_orders (should be 0)
+SELECT
+    (SELECT SUM(orders_cnt) FROM dim_customer)
+    - (SELECT COUNT(*) FROM fact_orders WHERE customer_unique_id IS NOT NULL)
+    AS orders_cnt_diff;
+
+-- 3) Month 0 of every cohort contains the whole cohort (should return 0)
+SELECT COUNT(*) AS bad_month_zero_rows
+FROM cohort_retention
+WHERE month_offset = 0
+  AND active_customers <> cohort_size;
+
+-- 4) Repeat customer rate
+SELECT
+    AVG(is_repeat_customer::numeric) AS repeat_customer_rate
+FROM dim_customer;
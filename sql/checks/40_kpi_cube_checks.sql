@@ -0,0 +1,25 @@
+-- kpi_cube validation checks (Postgres)
+
+-- 1) Every grain covers every order, with and without the state split
+--    (should return 0 rows)
+SELECT
+    period_grain,
+    customer_state = 'ALL' AS is_all_states,
+    SUM(orders_cnt) AS cube_orders,
+    (SELECT COUNT(*) FROM fact_orders WHERE order_purchase_ts IS NOT NULL) AS fact_orders
+FROM kpi_cube
+GROUP BY period_grain, customer_state = 'ALL'
+HAVING SUM(orders_cnt)
+    <> (SELECT COUNT(*) FROM fact_orders WHERE order_purchase_ts IS NOT NULL);
+
+-- 2) Revenue matches fact_orders at month / ALL grain (difference ~0)
+SELECT
+    (SELECT SUM(revenue_sum) FROM kpi_cube
+     WHERE period_grain = 'month' AND customer_state = 'ALL')
+    - (SELECT SUM(revenue_order) FROM fact_orders) AS revenue_diff;
+
+-- 3) Rows per grain
+SELECT period_grain, COUNT(*) AS rows_cnt
+FROM kpi_cube
+GROUP BY period_grain
+ORDER BY period_grain;
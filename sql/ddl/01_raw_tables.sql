@@ -0,0 +1,83 @@
+-- raw_* tables (one per Olist CSV) - Postgres
+-- These definitions are also the schema registry the Python readers use
+-- (src/schema.py): VARCHAR columns other than ids are read as categoricals,
+-- NOT NULL integers get the width declared here, TIMESTAMP columns are
+-- parsed with a fixed format.
+CREATE TABLE IF NOT EXISTS raw_orders (
+    order_id VARCHAR(50) NOT NULL,
+    customer_id VARCHAR(50) NOT NULL,
+    order_status VARCHAR(32),
+    order_purchase_timestamp TIMESTAMP,
+    order_approved_at TIMESTAMP,
+    order_delivered_carrier_date TIMESTAMP,
+    order_delivered_customer_date TIMESTAMP,
+    order_estimated_delivery_date TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS raw_order_items (
+    order_id VARCHAR(50) NOT NULL,
+    order_item_id SMALLINT NOT NULL,
+    product_id VARCHAR(50),
+    seller_id VARCHAR(50),
+    shipping_limit_date TIMESTAMP,
+    price NUMERIC(12,2),
+    freight_value NUMERIC(12,2)
+);
+
+CREATE TABLE IF NOT EXISTS raw_order_payments (
+    order_id VARCHAR(50) NOT NULL,
+    payment_sequential SMALLINT NOT NULL,
+    payment_type VARCHAR(32),
+    payment_installments SMALLINT NOT NULL,
+    payment_value NUMERIC(12,2)
+);
+
+CREATE TABLE IF NOT EXISTS raw_customers (
+    customer_id VARCHAR(50) NOT NULL,
+    customer_unique_id VARCHAR(50),
+    customer_zip_code_prefix INT NOT NULL,
+    customer_city VARCHAR(64),
+    customer_state VARCHAR(8)
+);
+
+CREATE TABLE IF NOT EXISTS raw_products (
+    product_id VARCHAR(50) NOT NULL,
+    product_category_name VARCHAR(128),
+    product_name_lenght INT,
+    product_description_lenght INT,
+    product_photos_qty INT,
+    product_weight_g INT,
+    product_length_cm INT,
+    product_height_cm INT,
+    product_width_cm INT
+);
+
+CREATE TABLE IF NOT EXISTS raw_category_translation (
+    product_category_name VARCHAR(128),
+    product_category_name_english VARCHAR(128)
+);
+
+CREATE TABLE IF NOT EXISTS raw_sellers (
+    seller_id VARCHAR(50) NOT NULL,
+    seller_zip_code_prefix INT NOT NULL,
+    seller_city VARCHAR(64),
+    seller_state VARCHAR(8)
+);
+
+CREATE TABLE IF NOT EXISTS raw_geolocation (
+    geolocation_zip_code_prefix INT NOT NULL,
+    geolocation_lat DOUBLE PRECISION,
+    geolocation_lng DOUBLE PRECISION,
+    geolocation_city VARCHAR(64),
+    geolocation_state VARCHAR(8)
+);
+
+CREATE TABLE IF NOT EXISTS raw_reviews (
+    review_id VARCHAR(50) NOT NULL,
+    order_id VARCHAR(50) NOT NULL,
+    review_score SMALLINT NOT NULL,
+    review_comment_title TEXT,
+    review_comment_message TEXT,
+    review_creation_date TIMESTAMP,
+    review_answer_timestamp TIMESTAMP
+);
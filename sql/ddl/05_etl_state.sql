@@ -0,0 +1,53 @@
+-- Incremental refresh state (sql/incremental/*.sql) - Postgres
+-- etl_watermark: highest (order_purchase_ts, order_id) already loaded per
+-- target table, the last etl_raw_changes entry it consumed, and the oldest
+-- transaction still running when it ran (last_xmin). change_id comes from a
+-- sequence, so a transaction can commit a change below last_change_id after
+-- the run: changes of transactions at or above last_xmin are read again.
+-- etl_order_fingerprints: hash of the source rows each order was last built
+-- from, compared only for the orders change capture points at.
+-- etl_raw_changes: keys of raw rows inserted / updated / deleted, written by
+-- the triggers in 06_etl_change_capture.sql (key_id NULL: table truncated).
+-- etl_raw_relations: raw table oids each target last ran against; a raw table
+-- recreated by the loader (or missing its triggers) forces a full refresh.
+CREATE TABLE IF NOT EXISTS etl_watermark (
+    target_table VARCHAR(64) NOT NULL,
+    order_purchase_ts TIMESTAMP,
+    order_id VARCHAR(50),
+    new_orders INT NOT NULL DEFAULT 0,
+    changed_orders INT NOT NULL DEFAULT 0,
+    deleted_orders INT NOT NULL DEFAULT 0,
+    last_change_id BIGINT,
+    last_xmin XID8,
+    updated_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (target_table)
+);
+
+ALTER TABLE etl_watermark ADD COLUMN IF NOT EXISTS last_change_id BIGINT;
+ALTER TABLE etl_watermark ADD COLUMN IF NOT EXISTS last_xmin XID8;
+
+CREATE TABLE IF NOT EXISTS etl_order_fingerprints (
+    target_table VARCHAR(64) NOT NULL,
+    order_id VARCHAR(50) NOT NULL,
+    fingerprint CHAR(32) NOT NULL,
+    PRIMARY KEY (target_table, order_id)
+);
+
+CREATE TABLE IF NOT EXISTS etl_raw_changes (
+    change_id BIGSERIAL NOT NULL,
+    table_name VARCHAR(64) NOT NULL,
+    key_id VARCHAR(50),
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    xact_id XID8 NOT NULL DEFAULT pg_current_xact_id(),
+    PRIMARY KEY (change_id)
+);
+
+ALTER TABLE etl_raw_changes
+    ADD COLUMN IF NOT EXISTS xact_id XID8 NOT NULL DEFAULT pg_current_xact_id();
+
+CREATE TABLE IF NOT EXISTS etl_raw_relations (
+    target_table VARCHAR(64) NOT NULL,
+    table_name VARCHAR(64) NOT NULL,
+    relid OID,
+    PRIMARY KEY (target_table, table_name)
+);
@@ -0,0 +1,157 @@
+-- Change capture on the raw tables the incremental refresh reads - Postgres
+-- Statement-level triggers append the keys of every inserted, updated or
+-- deleted row to etl_raw_changes (one row per distinct key and statement, so
+-- a COPY of a whole file costs one extra INSERT ... SELECT), and a TRUNCATE
+-- logs a NULL key. sql/incremental/*.sql only fingerprint the orders these
+-- keys point at. load_postgres.py --if-exists replace drops and recreates the
+-- raw tables, which drops the triggers with them: rerun this file after a
+-- reload; the next incremental run sees the new table oids and does a full
+-- refresh once. CREATE OR REPLACE TRIGGER needs Postgres 14+.
+CREATE OR REPLACE FUNCTION etl_capture_new_rows() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE 'INSERT INTO etl_raw_changes (table_name, key_id) SELECT DISTINCT '
+        || quote_literal(TG_TABLE_NAME) || ', ' || quote_ident(TG_ARGV[0])
+        || ' FROM new_rows';
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION etl_capture_old_rows() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE 'INSERT INTO etl_raw_changes (table_name, key_id) SELECT DISTINCT '
+        || quote_literal(TG_TABLE_NAME) || ', ' || quote_ident(TG_ARGV[0])
+        || ' FROM old_rows';
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION etl_capture_updated_rows() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- Both sides: an update may move a row to another key.
+    EXECUTE 'INSERT INTO etl_raw_changes (table_name, key_id) SELECT '
+        || quote_literal(TG_TABLE_NAME) || ', ' || quote_ident(TG_ARGV[0])
+        || ' FROM old_rows UNION SELECT '
+        || quote_literal(TG_TABLE_NAME) || ', ' || quote_ident(TG_ARGV[0])
+        || ' FROM new_rows';
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION etl_capture_truncate() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO etl_raw_changes (table_name, key_id) VALUES (TG_TABLE_NAME, NULL);
+    RETURN NULL;
+END
+$$;
+
+-- The raw tables behind sql/incremental/10_fact_orders.sql and
+-- 11_fact_order_items.sql, keyed by the column their changes map through
+-- (raw_geolocation by zip prefix: the orders shipping from or to it).
+CREATE OR REPLACE TRIGGER etl_capture_insert AFTER INSERT ON raw_orders
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_new_rows('order_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_update AFTER UPDATE ON raw_orders
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_updated_rows('order_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_delete AFTER DELETE ON raw_orders
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_old_rows('order_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_truncate AFTER TRUNCATE ON raw_orders
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_truncate();
+
+CREATE OR REPLACE TRIGGER etl_capture_insert AFTER INSERT ON raw_order_items
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_new_rows('order_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_update AFTER UPDATE ON raw_order_items
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_updated_rows('order_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_delete AFTER DELETE ON raw_order_items
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_old_rows('order_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_truncate AFTER TRUNCATE ON raw_order_items
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_truncate();
+
+CREATE OR REPLACE TRIGGER etl_capture_insert AFTER INSERT ON raw_order_payments
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_new_rows('order_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_update AFTER UPDATE ON raw_order_payments
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_updated_rows('order_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_delete AFTER DELETE ON raw_order_payments
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_old_rows('order_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_truncate AFTER TRUNCATE ON raw_order_payments
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_truncate();
+
+CREATE OR REPLACE TRIGGER etl_capture_insert AFTER INSERT ON raw_customers
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_new_rows('customer_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_update AFTER UPDATE ON raw_customers
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_updated_rows('customer_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_delete AFTER DELETE ON raw_customers
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_old_rows('customer_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_truncate AFTER TRUNCATE ON raw_customers
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_truncate();
+
+CREATE OR REPLACE TRIGGER etl_capture_insert AFTER INSERT ON raw_reviews
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_new_rows('order_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_update AFTER UPDATE ON raw_reviews
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_updated_rows('order_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_delete AFTER DELETE ON raw_reviews
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_old_rows('order_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_truncate AFTER TRUNCATE ON raw_reviews
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_truncate();
+
+CREATE OR REPLACE TRIGGER etl_capture_insert AFTER INSERT ON raw_sellers
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_new_rows('seller_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_update AFTER UPDATE ON raw_sellers
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_updated_rows('seller_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_delete AFTER DELETE ON raw_sellers
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_old_rows('seller_id');
+
+CREATE OR REPLACE TRIGGER etl_capture_truncate AFTER TRUNCATE ON raw_sellers
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_truncate();
+
+CREATE OR REPLACE TRIGGER etl_capture_insert AFTER INSERT ON raw_geolocation
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_new_rows('geolocation_zip_code_prefix');
+
+CREATE OR REPLACE TRIGGER etl_capture_update AFTER UPDATE ON raw_geolocation
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_updated_rows('geolocation_zip_code_prefix');
+
+CREATE OR REPLACE TRIGGER etl_capture_delete AFTER DELETE ON raw_geolocation
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_old_rows('geolocation_zip_code_prefix');
+
+CREATE OR REPLACE TRIGGER etl_capture_truncate AFTER TRUNCATE ON raw_geolocation
+FOR EACH STATEMENT EXECUTE FUNCTION etl_capture_truncate();
@@ -19,6 +19,10 @@ CREATE TABLE IF NOT EXISTS fact_orders (
     on_time_flag SMALLINT,
     is_canceled SMALLINT NOT NULL DEFAULT 0,
     is_new_customer SMALLINT,
+    max_delivery_distance_km NUMERIC(10,2),
+    review_score_avg NUMERIC(4,2),
+    reviews_cnt INT,
+    review_response_hours_avg NUMERIC(10,2),
     PRIMARY KEY (order_id),
     CONSTRAINT chk_on_time_flag CHECK (on_time_flag IN (0, 1) OR on_time_flag IS NULL),
     CONSTRAINT chk_is_canceled CHECK (is_canceled IN (0, 1)),
@@ -21,6 +21,7 @@ CREATE TABLE IF NOT EXISTS fact_order_items (
     freight_value NUMERIC(12,2),
     item_gmv NUMERIC(12,2),
     item_cnt SMALLINT,
+    delivery_distance_km NUMERIC(10,2),
     PRIMARY KEY (order_id, order_item_id)
 );
 
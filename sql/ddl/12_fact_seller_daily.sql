@@ -0,0 +1,20 @@
+-- fact_seller_daily (seller x purchase day) - Postgres
+-- Additive measures only; ratios are SUM(numerator) / SUM(denominator).
+CREATE TABLE IF NOT EXISTS fact_seller_daily (
+    seller_id VARCHAR(50) NOT NULL,
+    order_date DATE NOT NULL,
+    seller_state VARCHAR(8),
+    items_cnt INT NOT NULL,
+    orders_cnt INT NOT NULL,
+    price_sum NUMERIC(14,2) NOT NULL,
+    freight_sum NUMERIC(14,2) NOT NULL,
+    gmv_sum NUMERIC(14,2) NOT NULL,
+    late_orders_cnt INT NOT NULL,
+    late_orders_den INT NOT NULL,
+    PRIMARY KEY (seller_id, order_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_fact_seller_daily_order_date
+    ON fact_seller_daily (order_date);
+CREATE INDEX IF NOT EXISTS idx_fact_seller_daily_state_date
+    ON fact_seller_daily (seller_state, order_date);
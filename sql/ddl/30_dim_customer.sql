@@ -0,0 +1,16 @@
+-- dim_customer (customer grain, 1 row per customer_unique_id) - Postgres
+CREATE TABLE IF NOT EXISTS dim_customer (
+    customer_unique_id VARCHAR(50) NOT NULL,
+    first_purchase_ts TIMESTAMP,
+    last_purchase_ts TIMESTAMP,
+    orders_cnt INT NOT NULL,
+    lifetime_revenue NUMERIC(14,2),
+    first_state VARCHAR(8),
+    cohort_month VARCHAR(7),
+    is_repeat_customer SMALLINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (customer_unique_id),
+    CONSTRAINT chk_is_repeat_customer CHECK (is_repeat_customer IN (0, 1))
+);
+
+CREATE INDEX IF NOT EXISTS idx_dim_customer_cohort_month
+    ON dim_customer (cohort_month);
@@ -0,0 +1,13 @@
+-- cohort_retention (cohort month x month offset) - Postgres
+CREATE TABLE IF NOT EXISTS cohort_retention (
+    cohort_month VARCHAR(7) NOT NULL,
+    month_offset INT NOT NULL,
+    activity_month VARCHAR(7) NOT NULL,
+    cohort_size INT NOT NULL,
+    active_customers INT NOT NULL,
+    retention_rate NUMERIC(6,4),
+    orders_cnt INT NOT NULL,
+    revenue NUMERIC(14,2),
+    PRIMARY KEY (cohort_month, month_offset),
+    CONSTRAINT chk_month_offset CHECK (month_offset >= 0)
+);
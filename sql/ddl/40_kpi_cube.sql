@@ -0,0 +1,25 @@
+-- kpi_cube (period grain x period start x state x status) - Postgres
+-- Additive measures only; ratios are SUM(numerator) / SUM(denominator).
+CREATE TABLE IF NOT EXISTS kpi_cube (
+    period_grain VARCHAR(8) NOT NULL,
+    period_start DATE NOT NULL,
+    customer_state VARCHAR(8) NOT NULL,
+    order_status VARCHAR(32) NOT NULL,
+    orders_cnt INT NOT NULL,
+    revenue_sum NUMERIC(14,2) NOT NULL,
+    revenue_orders_cnt INT NOT NULL,
+    items_cnt INT NOT NULL,
+    canceled_cnt INT NOT NULL,
+    on_time_cnt INT NOT NULL,
+    on_time_den INT NOT NULL,
+    delivered_days_sum BIGINT NOT NULL,
+    delivered_days_cnt INT NOT NULL,
+    estimated_gap_days_sum BIGINT NOT NULL,
+    estimated_gap_days_cnt INT NOT NULL,
+    new_customers_cnt INT NOT NULL,
+    PRIMARY KEY (period_grain, period_start, customer_state, order_status),
+    CONSTRAINT chk_period_grain CHECK (period_grain IN ('day', 'week', 'month'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_kpi_cube_grain_state
+    ON kpi_cube (period_grain, customer_state, period_start);
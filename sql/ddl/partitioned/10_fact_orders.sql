@@ -0,0 +1,57 @@
+-- fact_orders (order grain), partitioned by purchase month - Postgres
+-- Drop-in alternative to sql/ddl/10_fact_orders.sql for large volumes:
+-- same columns, range-partitioned on order_purchase_ts so date-filtered
+-- queries only scan the matching months, with BRIN instead of B-tree indexes
+-- on the timestamp columns (rows arrive roughly in purchase order, so the
+-- block ranges stay tight).
+-- Monthly partitions are created by src/pg_partitions.py; rows outside every
+-- monthly range land in fact_orders_default until their month is created.
+-- The partition key must be part of every unique key, and a primary key would
+-- make order_purchase_ts NOT NULL; orders without a purchase timestamp go to
+-- fact_orders_default instead, under a NULLS NOT DISTINCT unique constraint
+-- (Postgres 15+). The incremental upserts (sql/incremental/) need the
+-- unpartitioned table, whose primary key is order_id alone.
+CREATE TABLE IF NOT EXISTS fact_orders (
+    order_id VARCHAR(50) NOT NULL,
+    customer_id VARCHAR(50),
+    customer_unique_id VARCHAR(50),
+    order_status VARCHAR(32),
+    order_purchase_ts TIMESTAMP,
+    order_purchase_date DATE,
+    order_delivered_ts TIMESTAMP,
+    order_estimated_ts TIMESTAMP,
+    customer_city VARCHAR(64),
+    customer_state VARCHAR(8),
+    payment_value_total NUMERIC(12,2),
+    orders_cnt SMALLINT,
+    items_cnt INT,
+    revenue_order NUMERIC(12,2),
+    delivered_days INT,
+    estimated_gap_days INT,
+    on_time_flag SMALLINT,
+    is_canceled SMALLINT NOT NULL DEFAULT 0,
+    is_new_customer SMALLINT,
+    max_delivery_distance_km NUMERIC(10,2),
+    review_score_avg NUMERIC(4,2),
+    reviews_cnt INT,
+    review_response_hours_avg NUMERIC(10,2),
+    CONSTRAINT uq_fact_orders_key
+        UNIQUE NULLS NOT DISTINCT (order_id, order_purchase_ts),
+    CONSTRAINT chk_on_time_flag CHECK (on_time_flag IN (0, 1) OR on_time_flag IS NULL),
+    CONSTRAINT chk_is_canceled CHECK (is_canceled IN (0, 1)),
+    CONSTRAINT chk_is_new_customer CHECK (is_new_customer IN (0, 1) OR is_new_customer IS NULL)
+) PARTITION BY RANGE (order_purchase_ts);
+
+CREATE TABLE IF NOT EXISTS fact_orders_default
+    PARTITION OF fact_orders DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_fact_orders_customer_id
+    ON fact_orders (customer_id);
+CREATE INDEX IF NOT EXISTS idx_fact_orders_customer_unique_id
+    ON fact_orders (customer_unique_id);
+CREATE INDEX IF NOT EXISTS brin_fact_orders_purchase_ts
+    ON fact_orders USING BRIN (order_purchase_ts) WITH (pages_per_range = 32);
+CREATE INDEX IF NOT EXISTS brin_fact_orders_purchase_date
+    ON fact_orders USING BRIN (order_purchase_date) WITH (pages_per_range = 32);
+CREATE INDEX IF NOT EXISTS brin_fact_orders_delivered_ts
+    ON fact_orders USING BRIN (order_delivered_ts) WITH (pages_per_range = 32);
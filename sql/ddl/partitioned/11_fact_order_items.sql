@@ -0,0 +1,48 @@
+-- fact_order_items (item grain), partitioned by purchase month - Postgres
+-- Drop-in alternative to sql/ddl/11_fact_order_items.sql; see
+-- partitioned/10_fact_orders.sql. Items inherit their order's purchase
+-- timestamp, so an order and its items sit in the same month. The transform
+-- LEFT JOINs raw_orders, so items of an unknown order (or of an order without
+-- a purchase timestamp) get a NULL order_purchase_ts and land in the DEFAULT
+-- partition; the key is a NULLS NOT DISTINCT unique constraint instead of a
+-- primary key for that reason (Postgres 15+).
+CREATE TABLE IF NOT EXISTS fact_order_items (
+    order_id VARCHAR(50) NOT NULL,
+    order_item_id INT NOT NULL,
+    product_id VARCHAR(50),
+    seller_id VARCHAR(50),
+    customer_id VARCHAR(50),
+    customer_unique_id VARCHAR(50),
+    order_purchase_ts TIMESTAMP,
+    order_date DATE,
+    order_status VARCHAR(32),
+    customer_city VARCHAR(64),
+    customer_state VARCHAR(8),
+    product_category_name VARCHAR(128),
+    product_category_en VARCHAR(128),
+    product_weight_g INT,
+    product_length_cm INT,
+    product_height_cm INT,
+    product_width_cm INT,
+    item_price NUMERIC(12,2),
+    freight_value NUMERIC(12,2),
+    item_gmv NUMERIC(12,2),
+    item_cnt SMALLINT,
+    delivery_distance_km NUMERIC(10,2),
+    CONSTRAINT uq_fact_order_items_key
+        UNIQUE NULLS NOT DISTINCT (order_id, order_item_id, order_purchase_ts)
+) PARTITION BY RANGE (order_purchase_ts);
+
+CREATE TABLE IF NOT EXISTS fact_order_items_default
+    PARTITION OF fact_order_items DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_fact_order_items_product_id
+    ON fact_order_items (product_id);
+CREATE INDEX IF NOT EXISTS idx_fact_order_items_seller_id
+    ON fact_order_items (seller_id);
+CREATE INDEX IF NOT EXISTS idx_fact_order_items_category_en
+    ON fact_order_items (product_category_en);
+CREATE INDEX IF NOT EXISTS brin_fact_order_items_purchase_ts
+    ON fact_order_items USING BRIN (order_purchase_ts) WITH (pages_per_range = 32);
+CREATE INDEX IF NOT EXISTS brin_fact_order_items_order_date
+    ON fact_order_items USING BRIN (order_date) WITH (pages_per_range = 32);
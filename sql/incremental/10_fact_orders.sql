@@ -0,0 +1,557 @@
+-- Incremental refresh of fact_orders from raw tables (Postgres).
+-- Rerunnable alternative to sql/transform/10_fact_orders.sql. Only candidate
+-- orders are fingerprinted: those above the watermark plus those whose raw
+-- orders / items / payments / customers / reviews / sellers / geolocation rows
+-- were logged in etl_raw_changes since the last run (sql/ddl/06_etl_change_capture.sql).
+-- Candidates whose source rows (status, delivery dates, customer and zip,
+-- payments, item count and sellers, reviews, delivery distance) actually
+-- changed are upserted,
+-- candidates gone from raw_orders are deleted, and is_new_customer is
+-- recomputed only for the customer_unique_ids those orders touch. The first
+-- run, a truncated raw table, or a raw table recreated since the last run
+-- (or without its triggers) makes every order a candidate, i.e. a full
+-- build.
+-- Assumes raw tables, fact_orders (sql/ddl/10_fact_orders.sql) and the state
+-- tables and triggers (sql/ddl/05_etl_state.sql, 06_etl_change_capture.sql)
+-- exist.
+
+BEGIN;
+
+-- Current oid of each raw table, NULL when its capture triggers are missing
+CREATE TEMP TABLE raw_relations ON COMMIT DROP AS
+SELECT
+    t.table_name,
+    CASE
+        WHEN (
+            SELECT COUNT(*)
+            FROM pg_trigger g
+            WHERE g.tgrelid = to_regclass(t.table_name)
+              AND g.tgname IN (
+                  'etl_capture_insert', 'etl_capture_update',
+                  'etl_capture_delete', 'etl_capture_truncate'
+              )
+        ) = 4
+        THEN CAST(to_regclass(t.table_name) AS OID)
+    END AS relid
+FROM (
+    VALUES
+        ('raw_orders'), ('raw_order_items'), ('raw_order_payments'), ('raw_customers'),
+        ('raw_reviews'), ('raw_sellers'), ('raw_geolocation')
+) t (table_name);
+
+-- 1) Changes logged since the last run; full refresh when they can't be trusted
+CREATE TEMP TABLE run_state ON COMMIT DROP AS
+SELECT
+    COALESCE(w.last_change_id, 0) AS last_change_id,
+    -- change_id is taken at insert, not at commit: a change below
+    -- last_change_id may have committed since, so the changes of
+    -- transactions still running at the last run are read again.
+    w.last_xmin,
+    pg_snapshot_xmin(pg_current_snapshot()) AS snapshot_xmin,
+    (SELECT COALESCE(MAX(change_id), 0) FROM etl_raw_changes) AS max_change_id,
+    (
+        w.last_change_id IS NULL
+        OR EXISTS (
+            SELECT 1
+            FROM etl_raw_changes ch
+            WHERE (ch.change_id > w.last_change_id OR ch.xact_id >= w.last_xmin)
+              AND ch.key_id IS NULL
+              AND ch.table_name IN (
+                  'raw_orders', 'raw_order_items', 'raw_order_payments', 'raw_customers',
+                  'raw_reviews', 'raw_sellers', 'raw_geolocation'
+              )
+        )
+        OR EXISTS (
+            SELECT 1
+            FROM raw_relations t
+            LEFT JOIN etl_raw_relations r
+                ON r.target_table = 'fact_orders'
+               AND r.table_name = t.table_name
+            WHERE r.relid IS DISTINCT FROM t.relid
+        )
+    ) AS full_refresh
+FROM (SELECT 1) one
+LEFT JOIN etl_watermark w
+    ON w.target_table = 'fact_orders';
+
+-- 2) Candidate orders: everything on a full refresh, else above the
+-- watermark or pointed at by a logged change
+CREATE TEMP TABLE candidate_orders ON COMMIT DROP AS
+SELECT o.order_id
+FROM raw_orders o
+JOIN run_state r
+    ON r.full_refresh
+UNION
+SELECT o.order_id
+FROM raw_orders o
+JOIN etl_watermark w
+    ON w.target_table = 'fact_orders'
+WHERE (CAST(o.order_purchase_timestamp AS TIMESTAMP), o.order_id)
+    > (w.order_purchase_ts, w.order_id)
+UNION
+SELECT ch.key_id
+FROM etl_raw_changes ch
+JOIN run_state r
+    ON (ch.change_id > r.last_change_id OR ch.xact_id >= r.last_xmin)
+   AND ch.change_id <= r.max_change_id
+WHERE ch.table_name IN (
+        'raw_orders', 'raw_order_items', 'raw_order_payments', 'raw_reviews'
+    )
+  AND ch.key_id IS NOT NULL
+UNION
+SELECT o.order_id
+FROM etl_raw_changes ch
+JOIN run_state r
+    ON (ch.change_id > r.last_change_id OR ch.xact_id >= r.last_xmin)
+   AND ch.change_id <= r.max_change_id
+JOIN raw_orders o
+    ON o.customer_id = ch.key_id
+WHERE ch.table_name = 'raw_customers'
+UNION
+SELECT oi.order_id
+FROM etl_raw_changes ch
+JOIN run_state r
+    ON (ch.change_id > r.last_change_id OR ch.xact_id >= r.last_xmin)
+   AND ch.change_id <= r.max_change_id
+JOIN raw_order_items oi
+    ON oi.seller_id = ch.key_id
+WHERE ch.table_name = 'raw_sellers'
+UNION
+SELECT o.order_id
+FROM etl_raw_changes ch
+JOIN run_state r
+    ON (ch.change_id > r.last_change_id OR ch.xact_id >= r.last_xmin)
+   AND ch.change_id <= r.max_change_id
+JOIN raw_customers c
+    ON CAST(c.customer_zip_code_prefix AS VARCHAR) = ch.key_id
+JOIN raw_orders o
+    ON o.customer_id = c.customer_id
+WHERE ch.table_name = 'raw_geolocation'
+UNION
+SELECT oi.order_id
+FROM etl_raw_changes ch
+JOIN run_state r
+    ON (ch.change_id > r.last_change_id OR ch.xact_id >= r.last_xmin)
+   AND ch.change_id <= r.max_change_id
+JOIN raw_sellers s
+    ON CAST(s.seller_zip_code_prefix AS VARCHAR) = ch.key_id
+JOIN raw_order_items oi
+    ON oi.seller_id = s.seller_id
+WHERE ch.table_name = 'raw_geolocation';
+
+ANALYZE candidate_orders;
+
+-- 3) Zip prefix centroids the candidates ship between
+CREATE TEMP TABLE candidate_centroids ON COMMIT DROP AS
+SELECT
+    geolocation_zip_code_prefix AS zip_code_prefix,
+    AVG(geolocation_lat) AS lat,
+    AVG(geolocation_lng) AS lng
+FROM raw_geolocation
+WHERE geolocation_lat BETWEEN -34.0 AND 5.5
+  AND geolocation_lng BETWEEN -74.5 AND -34.0
+  AND geolocation_zip_code_prefix IN (
+      SELECT c.customer_zip_code_prefix
+      FROM candidate_orders k
+      JOIN raw_orders o
+          ON o.order_id = k.order_id
+      JOIN raw_customers c
+          ON o.customer_id = c.customer_id
+      UNION
+      SELECT s.seller_zip_code_prefix
+      FROM candidate_orders k
+      JOIN raw_order_items oi
+          ON oi.order_id = k.order_id
+      JOIN raw_sellers s
+          ON oi.seller_id = s.seller_id
+  )
+GROUP BY geolocation_zip_code_prefix;
+
+-- Delivery distance per candidate order, rounded like the column
+CREATE TEMP TABLE candidate_distances ON COMMIT DROP AS
+SELECT
+    oi.order_id,
+    CAST(MAX(2 * 6371.0088 * ASIN(SQRT(
+        POWER(SIN((RADIANS(cg.lat) - RADIANS(sg.lat)) / 2), 2)
+        + COS(RADIANS(sg.lat)) * COS(RADIANS(cg.lat))
+        * POWER(SIN((RADIANS(cg.lng) - RADIANS(sg.lng)) / 2), 2)
+    ))) AS NUMERIC(10,2)) AS max_delivery_distance_km
+FROM candidate_orders k
+JOIN raw_order_items oi
+    ON oi.order_id = k.order_id
+JOIN raw_orders o
+    ON oi.order_id = o.order_id
+JOIN raw_customers c
+    ON o.customer_id = c.customer_id
+JOIN raw_sellers s
+    ON oi.seller_id = s.seller_id
+JOIN candidate_centroids sg
+    ON s.seller_zip_code_prefix = sg.zip_code_prefix
+JOIN candidate_centroids cg
+    ON c.customer_zip_code_prefix = cg.zip_code_prefix
+GROUP BY oi.order_id;
+
+-- Source fingerprint per candidate order; the distance stands in for the
+-- seller zips and centroids it is computed from
+CREATE TEMP TABLE src_orders ON COMMIT DROP AS
+SELECT
+    o.order_id,
+    CAST(o.order_purchase_timestamp AS TIMESTAMP) AS order_purchase_ts,
+    MD5(CAST(ROW(
+        o.customer_id,
+        o.order_status,
+        o.order_purchase_timestamp,
+        o.order_delivered_customer_date,
+        o.order_estimated_delivery_date,
+        c.customer_unique_id,
+        c.customer_city,
+        c.customer_state,
+        c.customer_zip_code_prefix,
+        p.payment_value_total,
+        i.items_cnt,
+        i.sellers_key,
+        r.reviews_key,
+        dist.max_delivery_distance_km
+    ) AS TEXT)) AS fingerprint
+FROM candidate_orders k
+JOIN raw_orders o
+    ON o.order_id = k.order_id
+LEFT JOIN raw_customers c
+    ON o.customer_id = c.customer_id
+LEFT JOIN (
+    SELECT order_id, SUM(payment_value) AS payment_value_total
+    FROM raw_order_payments
+    WHERE order_id IN (SELECT order_id FROM candidate_orders)
+    GROUP BY order_id
+) p
+    ON o.order_id = p.order_id
+LEFT JOIN (
+    SELECT
+        order_id,
+        COUNT(*) AS items_cnt,
+        STRING_AGG(seller_id, '|' ORDER BY order_item_id) AS sellers_key
+    FROM raw_order_items
+    WHERE order_id IN (SELECT order_id FROM candidate_orders)
+    GROUP BY order_id
+) i
+    ON o.order_id = i.order_id
+LEFT JOIN (
+    SELECT
+        order_id,
+        STRING_AGG(
+            CAST(ROW(review_score, review_creation_date, review_answer_timestamp) AS TEXT),
+            '|' ORDER BY review_id
+        ) AS reviews_key
+    FROM raw_reviews
+    WHERE order_id IN (SELECT order_id FROM candidate_orders)
+    GROUP BY order_id
+) r
+    ON o.order_id = r.order_id
+LEFT JOIN candidate_distances dist
+    ON o.order_id = dist.order_id;
+
+-- 4) Delta: candidates that are new (above the watermark) or whose
+-- fingerprint moved; deletions among the candidates (any order on a full refresh)
+CREATE TEMP TABLE delta_orders ON COMMIT DROP AS
+SELECT
+    s.order_id,
+    s.fingerprint,
+    CASE
+        WHEN w.target_table IS NULL THEN 1
+        WHEN (s.order_purchase_ts, s.order_id) > (w.order_purchase_ts, w.order_id) THEN 1
+        ELSE 0
+    END AS is_new
+FROM src_orders s
+LEFT JOIN etl_watermark w
+    ON w.target_table = 'fact_orders'
+LEFT JOIN etl_order_fingerprints f
+    ON f.target_table = 'fact_orders'
+   AND f.order_id = s.order_id
+WHERE f.fingerprint IS DISTINCT FROM s.fingerprint;
+
+CREATE TEMP TABLE deleted_orders ON COMMIT DROP AS
+SELECT f.order_id
+FROM etl_order_fingerprints f
+JOIN run_state r
+    ON r.full_refresh
+    OR f.order_id IN (SELECT order_id FROM candidate_orders)
+WHERE f.target_table = 'fact_orders'
+  AND NOT EXISTS (SELECT 1 FROM src_orders s WHERE s.order_id = f.order_id);
+
+-- 5) Customers whose first purchase may move: new and previous owners
+CREATE TEMP TABLE affected_customers ON COMMIT DROP AS
+SELECT c.customer_unique_id
+FROM delta_orders d
+JOIN raw_orders o
+    ON o.order_id = d.order_id
+JOIN raw_customers c
+    ON o.customer_id = c.customer_id
+WHERE c.customer_unique_id IS NOT NULL
+UNION
+SELECT f.customer_unique_id
+FROM fact_orders f
+WHERE f.customer_unique_id IS NOT NULL
+  AND (
+      f.order_id IN (SELECT order_id FROM delta_orders)
+      OR f.order_id IN (SELECT order_id FROM deleted_orders)
+  );
+
+ANALYZE delta_orders;
+ANALYZE affected_customers;
+
+-- 6) Apply the delta
+DELETE FROM fact_orders
+WHERE order_id IN (SELECT order_id FROM deleted_orders);
+
+INSERT INTO fact_orders (
+    order_id,
+    customer_id,
+    customer_unique_id,
+    order_status,
+    order_purchase_ts,
+    order_purchase_date,
+    order_delivered_ts,
+    order_estimated_ts,
+    customer_city,
+    customer_state,
+    payment_value_total,
+    orders_cnt,
+    items_cnt,
+    revenue_order,
+    delivered_days,
+    estimated_gap_days,
+    on_time_flag,
+    is_canceled,
+    is_new_customer,
+    max_delivery_distance_km,
+    review_score_avg,
+    reviews_cnt,
+    review_response_hours_avg
+)
+SELECT
+    o.order_id,
+    o.customer_id,
+    c.customer_unique_id,
+    o.order_status,
+    CAST(o.order_purchase_timestamp AS TIMESTAMP) AS order_purchase_ts,
+    CAST(o.order_purchase_timestamp AS DATE) AS order_purchase_date,
+    CAST(o.order_delivered_customer_date AS TIMESTAMP) AS order_delivered_ts,
+    CAST(o.order_estimated_delivery_date AS TIMESTAMP) AS order_estimated_ts,
+    c.customer_city,
+    c.customer_state,
+    p.payment_value_total,
+    1 AS orders_cnt,
+    COALESCE(i.items_cnt, 0) AS items_cnt,
+    p.payment_value_total AS revenue_order,
+    -- Whole days floored, as pandas Timedelta.days does (EXTRACT(DAY FROM
+    -- interval) would truncate toward zero and differ on negative gaps).
+    CASE
+        WHEN o.order_delivered_customer_date IS NULL
+          OR o.order_purchase_timestamp IS NULL
+        THEN NULL
+        ELSE FLOOR(
+            EXTRACT(
+                EPOCH FROM (
+                    CAST(o.order_delivered_customer_date AS TIMESTAMP)
+                    - CAST(o.order_purchase_timestamp AS TIMESTAMP)
+                )
+            ) / 86400
+        )
+    END AS delivered_days,
+    CASE
+        WHEN o.order_delivered_customer_date IS NULL
+          OR o.order_estimated_delivery_date IS NULL
+        THEN NULL
+        ELSE FLOOR(
+            EXTRACT(
+                EPOCH FROM (
+                    CAST(o.order_delivered_customer_date AS TIMESTAMP)
+                    - CAST(o.order_estimated_delivery_date AS TIMESTAMP)
+                )
+            ) / 86400
+        )
+    END AS estimated_gap_days,
+    CASE
+        WHEN o.order_delivered_customer_date IS NULL
+          OR o.order_estimated_delivery_date IS NULL
+        THEN NULL
+        WHEN CAST(o.order_delivered_customer_date AS TIMESTAMP)
+          <= CAST(o.order_estimated_delivery_date AS TIMESTAMP)
+        THEN 1
+        ELSE 0
+    END AS on_time_flag,
+    CASE WHEN o.order_status = 'canceled' THEN 1 ELSE 0 END AS is_canceled,
+    -- Set in step 7 together with the other orders of the same customer.
+    NULL AS is_new_customer,
+    dist.max_delivery_distance_km,
+    r.review_score_avg,
+    -- An empty raw_reviews means no reviews file was loaded: unknown, not 0.
+    CASE
+        WHEN EXISTS (SELECT 1 FROM raw_reviews) THEN COALESCE(r.reviews_cnt, 0)
+    END AS reviews_cnt,
+    r.review_response_hours_avg
+FROM delta_orders d
+JOIN raw_orders o
+    ON o.order_id = d.order_id
+LEFT JOIN raw_customers c
+    ON o.customer_id = c.customer_id
+LEFT JOIN (
+    SELECT order_id, SUM(payment_value) AS payment_value_total
+    FROM raw_order_payments
+    WHERE order_id IN (SELECT order_id FROM delta_orders)
+    GROUP BY order_id
+) p
+    ON o.order_id = p.order_id
+LEFT JOIN (
+    SELECT order_id, COUNT(*) AS items_cnt
+    FROM raw_order_items
+    WHERE order_id IN (SELECT order_id FROM delta_orders)
+    GROUP BY order_id
+) i
+    ON o.order_id = i.order_id
+LEFT JOIN candidate_distances dist
+    ON o.order_id = dist.order_id
+LEFT JOIN (
+    SELECT
+        order_id,
+        AVG(review_score) AS review_score_avg,
+        COUNT(review_score) AS reviews_cnt,
+        -- Rounded in hundredths of an hour (seconds / 36): ROUND goes half
+        -- away from zero on NUMERIC and DOUBLE alike, so exact ties agree
+        -- between Postgres, DuckDB and src/reviews.py.
+        ROUND(
+            AVG(
+                EXTRACT(
+                    EPOCH FROM (
+                        CAST(review_answer_timestamp AS TIMESTAMP)
+                        - CAST(review_creation_date AS TIMESTAMP)
+                    )
+                )
+            ) / 36
+        ) / 100 AS review_response_hours_avg
+    FROM raw_reviews
+    WHERE order_id IN (SELECT order_id FROM delta_orders)
+    GROUP BY order_id
+) r
+    ON o.order_id = r.order_id
+ON CONFLICT (order_id) DO UPDATE SET
+    customer_id = EXCLUDED.customer_id,
+    customer_unique_id = EXCLUDED.customer_unique_id,
+    order_status = EXCLUDED.order_status,
+    order_purchase_ts = EXCLUDED.order_purchase_ts,
+    order_purchase_date = EXCLUDED.order_purchase_date,
+    order_delivered_ts = EXCLUDED.order_delivered_ts,
+    order_estimated_ts = EXCLUDED.order_estimated_ts,
+    customer_city = EXCLUDED.customer_city,
+    customer_state = EXCLUDED.customer_state,
+    payment_value_total = EXCLUDED.payment_value_total,
+    orders_cnt = EXCLUDED.orders_cnt,
+    items_cnt = EXCLUDED.items_cnt,
+    revenue_order = EXCLUDED.revenue_order,
+    delivered_days = EXCLUDED.delivered_days,
+    estimated_gap_days = EXCLUDED.estimated_gap_days,
+    on_time_flag = EXCLUDED.on_time_flag,
+    is_canceled = EXCLUDED.is_canceled,
+    is_new_customer = EXCLUDED.is_new_customer,
+    max_delivery_distance_km = EXCLUDED.max_delivery_distance_km,
+    review_score_avg = EXCLUDED.review_score_avg,
+    reviews_cnt = EXCLUDED.reviews_cnt,
+    review_response_hours_avg = EXCLUDED.review_response_hours_avg;
+
+-- 7) is_new_customer over the affected customer_unique_id partitions only
+UPDATE fact_orders f
+SET is_new_customer = n.is_new_customer
+FROM (
+    SELECT
+        order_id,
+        CASE
+            WHEN order_purchase_ts
+              = MIN(order_purchase_ts) OVER (PARTITION BY customer_unique_id)
+            THEN 1
+            ELSE 0
+        END AS is_new_customer
+    FROM fact_orders
+    WHERE customer_unique_id IN (SELECT customer_unique_id FROM affected_customers)
+) n
+WHERE f.order_id = n.order_id
+  AND f.is_new_customer IS DISTINCT FROM n.is_new_customer;
+
+-- 8) Advance the state
+DELETE FROM etl_order_fingerprints
+WHERE target_table = 'fact_orders'
+  AND order_id IN (SELECT order_id FROM deleted_orders);
+
+INSERT INTO etl_order_fingerprints (target_table, order_id, fingerprint)
+SELECT 'fact_orders', order_id, fingerprint
+FROM delta_orders
+ON CONFLICT (target_table, order_id) DO UPDATE SET
+    fingerprint = EXCLUDED.fingerprint;
+
+INSERT INTO etl_watermark (
+    target_table,
+    order_purchase_ts,
+    order_id,
+    new_orders,
+    changed_orders,
+    deleted_orders,
+    last_change_id,
+    last_xmin,
+    updated_at
+)
+SELECT
+    'fact_orders',
+    wm.order_purchase_ts,
+    wm.order_id,
+    (SELECT COUNT(*) FROM delta_orders WHERE is_new = 1),
+    (SELECT COUNT(*) FROM delta_orders WHERE is_new = 0),
+    (SELECT COUNT(*) FROM deleted_orders),
+    (SELECT max_change_id FROM run_state),
+    (SELECT snapshot_xmin FROM run_state),
+    CURRENT_TIMESTAMP
+FROM (
+    -- New orders are always candidates, so the previous watermark and the
+    -- candidates hold the maximum.
+    SELECT order_purchase_ts, order_id
+    FROM (
+        SELECT order_purchase_ts, order_id
+        FROM src_orders
+        UNION ALL
+        SELECT order_purchase_ts, order_id
+        FROM etl_watermark
+        WHERE target_table = 'fact_orders'
+    ) c
+    WHERE order_purchase_ts IS NOT NULL
+    ORDER BY order_purchase_ts DESC, order_id DESC
+    LIMIT 1
+) wm
+ON CONFLICT (target_table) DO UPDATE SET
+    order_purchase_ts = EXCLUDED.order_purchase_ts,
+    order_id = EXCLUDED.order_id,
+    new_orders = EXCLUDED.new_orders,
+    changed_orders = EXCLUDED.changed_orders,
+    deleted_orders = EXCLUDED.deleted_orders,
+    last_change_id = EXCLUDED.last_change_id,
+    last_xmin = EXCLUDED.last_xmin,
+    updated_at = EXCLUDED.updated_at;
+
+INSERT INTO etl_raw_relations (target_table, table_name, relid)
+SELECT 'fact_orders', table_name, relid
+FROM raw_relations
+ON CONFLICT (target_table, table_name) DO UPDATE SET
+    relid = EXCLUDED.relid;
+
+-- Changes every incremental target has consumed and will not read again
+DELETE FROM etl_raw_changes ch
+WHERE ch.change_id <= (
+    SELECT MIN(last_change_id)
+    FROM etl_watermark
+    WHERE target_table IN ('fact_orders', 'fact_order_items')
+)
+  AND NOT EXISTS (
+    SELECT 1
+    FROM etl_watermark w
+    WHERE w.target_table IN ('fact_orders', 'fact_order_items')
+      AND (w.last_xmin IS NULL OR ch.xact_id >= w.last_xmin)
+);
+
+COMMIT;
@@ -0,0 +1,433 @@
+-- Incremental refresh of fact_order_items from raw tables (Postgres).
+-- Rerunnable alternative to sql/transform/11_fact_order_items.sql. Only
+-- candidate orders are fingerprinted: those above the watermark plus those
+-- whose raw items / order / customer / seller / geolocation rows were logged
+-- in etl_raw_changes since the last run (sql/ddl/06_etl_change_capture.sql).
+-- The items of candidates whose source rows or delivery distances actually
+-- changed are upserted; items that disappeared from raw_order_items are
+-- deleted. The first run, a truncated raw table, or a raw table recreated
+-- since the last run (or without its triggers) makes every order a
+-- candidate, i.e. a full build. Product and category attributes are neither
+-- captured nor fingerprinted, so a change to raw_products or
+-- raw_category_translation still needs the full transform.
+-- Assumes raw tables, fact_order_items (sql/ddl/11_fact_order_items.sql) and
+-- the state tables and triggers (sql/ddl/05_etl_state.sql,
+-- 06_etl_change_capture.sql) exist.
+
+BEGIN;
+
+-- Current oid of each raw table, NULL when its capture triggers are missing
+CREATE TEMP TABLE raw_relations ON COMMIT DROP AS
+SELECT
+    t.table_name,
+    CASE
+        WHEN (
+            SELECT COUNT(*)
+            FROM pg_trigger g
+            WHERE g.tgrelid = to_regclass(t.table_name)
+              AND g.tgname IN (
+                  'etl_capture_insert', 'etl_capture_update',
+                  'etl_capture_delete', 'etl_capture_truncate'
+              )
+        ) = 4
+        THEN CAST(to_regclass(t.table_name) AS OID)
+    END AS relid
+FROM (
+    VALUES
+        ('raw_orders'), ('raw_order_items'), ('raw_customers'), ('raw_sellers'),
+        ('raw_geolocation')
+) t (table_name);
+
+-- 1) Changes logged since the last run; full refresh when they can't be trusted
+CREATE TEMP TABLE run_state ON COMMIT DROP AS
+SELECT
+    COALESCE(w.last_change_id, 0) AS last_change_id,
+    -- change_id is taken at insert, not at commit: a change below
+    -- last_change_id may have committed since, so the changes of
+    -- transactions still running at the last run are read again.
+    w.last_xmin,
+    pg_snapshot_xmin(pg_current_snapshot()) AS snapshot_xmin,
+    (SELECT COALESCE(MAX(change_id), 0) FROM etl_raw_changes) AS max_change_id,
+    (
+        w.last_change_id IS NULL
+        OR EXISTS (
+            SELECT 1
+            FROM etl_raw_changes ch
+            WHERE (ch.change_id > w.last_change_id OR ch.xact_id >= w.last_xmin)
+              AND ch.key_id IS NULL
+              AND ch.table_name IN (
+                  'raw_orders', 'raw_order_items', 'raw_customers', 'raw_sellers',
+                  'raw_geolocation'
+              )
+        )
+        OR EXISTS (
+            SELECT 1
+            FROM raw_relations t
+            LEFT JOIN etl_raw_relations r
+                ON r.target_table = 'fact_order_items'
+               AND r.table_name = t.table_name
+            WHERE r.relid IS DISTINCT FROM t.relid
+        )
+    ) AS full_refresh
+FROM (SELECT 1) one
+LEFT JOIN etl_watermark w
+    ON w.target_table = 'fact_order_items';
+
+-- 2) Candidate orders: everything on a full refresh, else above the
+-- watermark or pointed at by a logged change
+CREATE TEMP TABLE candidate_orders ON COMMIT DROP AS
+SELECT i.order_id
+FROM raw_order_items i
+JOIN run_state r
+    ON r.full_refresh
+UNION
+SELECT o.order_id
+FROM raw_orders o
+JOIN etl_watermark w
+    ON w.target_table = 'fact_order_items'
+WHERE (CAST(o.order_purchase_timestamp AS TIMESTAMP), o.order_id)
+    > (w.order_purchase_ts, w.order_id)
+UNION
+SELECT ch.key_id
+FROM etl_raw_changes ch
+JOIN run_state r
+    ON (ch.change_id > r.last_change_id OR ch.xact_id >= r.last_xmin)
+   AND ch.change_id <= r.max_change_id
+WHERE ch.table_name IN ('raw_orders', 'raw_order_items')
+  AND ch.key_id IS NOT NULL
+UNION
+SELECT o.order_id
+FROM etl_raw_changes ch
+JOIN run_state r
+    ON (ch.change_id > r.last_change_id OR ch.xact_id >= r.last_xmin)
+   AND ch.change_id <= r.max_change_id
+JOIN raw_orders o
+    ON o.customer_id = ch.key_id
+WHERE ch.table_name = 'raw_customers'
+UNION
+SELECT oi.order_id
+FROM etl_raw_changes ch
+JOIN run_state r
+    ON (ch.change_id > r.last_change_id OR ch.xact_id >= r.last_xmin)
+   AND ch.change_id <= r.max_change_id
+JOIN raw_order_items oi
+    ON oi.seller_id = ch.key_id
+WHERE ch.table_name = 'raw_sellers'
+UNION
+SELECT o.order_id
+FROM etl_raw_changes ch
+JOIN run_state r
+    ON (ch.change_id > r.last_change_id OR ch.xact_id >= r.last_xmin)
+   AND ch.change_id <= r.max_change_id
+JOIN raw_customers c
+    ON CAST(c.customer_zip_code_prefix AS VARCHAR) = ch.key_id
+JOIN raw_orders o
+    ON o.customer_id = c.customer_id
+WHERE ch.table_name = 'raw_geolocation'
+UNION
+SELECT oi.order_id
+FROM etl_raw_changes ch
+JOIN run_state r
+    ON (ch.change_id > r.last_change_id OR ch.xact_id >= r.last_xmin)
+   AND ch.change_id <= r.max_change_id
+JOIN raw_sellers s
+    ON CAST(s.seller_zip_code_prefix AS VARCHAR) = ch.key_id
+JOIN raw_order_items oi
+    ON oi.seller_id = s.seller_id
+WHERE ch.table_name = 'raw_geolocation';
+
+ANALYZE candidate_orders;
+
+-- 3) Zip prefix centroids the candidates ship between
+CREATE TEMP TABLE candidate_centroids ON COMMIT DROP AS
+SELECT
+    geolocation_zip_code_prefix AS zip_code_prefix,
+    AVG(geolocation_lat) AS lat,
+    AVG(geolocation_lng) AS lng
+FROM raw_geolocation
+WHERE geolocation_lat BETWEEN -34.0 AND 5.5
+  AND geolocation_lng BETWEEN -74.5 AND -34.0
+  AND geolocation_zip_code_prefix IN (
+      SELECT c.customer_zip_code_prefix
+      FROM candidate_orders k
+      JOIN raw_orders o
+          ON o.order_id = k.order_id
+      JOIN raw_customers c
+          ON o.customer_id = c.customer_id
+      UNION
+      SELECT s.seller_zip_code_prefix
+      FROM candidate_orders k
+      JOIN raw_order_items oi
+          ON oi.order_id = k.order_id
+      JOIN raw_sellers s
+          ON oi.seller_id = s.seller_id
+  )
+GROUP BY geolocation_zip_code_prefix;
+
+-- Delivery distance per candidate item, rounded like the column
+CREATE TEMP TABLE candidate_distances ON COMMIT DROP AS
+SELECT
+    oi.order_id,
+    oi.order_item_id,
+    CAST(2 * 6371.0088 * ASIN(SQRT(
+        POWER(SIN((RADIANS(cg.lat) - RADIANS(sg.lat)) / 2), 2)
+        + COS(RADIANS(sg.lat)) * COS(RADIANS(cg.lat))
+        * POWER(SIN((RADIANS(cg.lng) - RADIANS(sg.lng)) / 2), 2)
+    )) AS NUMERIC(10,2)) AS delivery_distance_km
+FROM candidate_orders k
+JOIN raw_order_items oi
+    ON oi.order_id = k.order_id
+LEFT JOIN raw_orders o
+    ON oi.order_id = o.order_id
+LEFT JOIN raw_customers c
+    ON o.customer_id = c.customer_id
+LEFT JOIN raw_sellers s
+    ON oi.seller_id = s.seller_id
+LEFT JOIN candidate_centroids sg
+    ON s.seller_zip_code_prefix = sg.zip_code_prefix
+LEFT JOIN candidate_centroids cg
+    ON c.customer_zip_code_prefix = cg.zip_code_prefix;
+
+-- Source fingerprint per candidate order that has items; the distances
+-- stand in for the seller zips and centroids they are computed from
+CREATE TEMP TABLE src_item_orders ON COMMIT DROP AS
+SELECT
+    i.order_id,
+    CAST(o.order_purchase_timestamp AS TIMESTAMP) AS order_purchase_ts,
+    MD5(CAST(ROW(
+        o.customer_id,
+        o.order_status,
+        o.order_purchase_timestamp,
+        c.customer_unique_id,
+        c.customer_city,
+        c.customer_state,
+        c.customer_zip_code_prefix,
+        i.items_key
+    ) AS TEXT)) AS fingerprint
+FROM (
+    SELECT
+        oi.order_id,
+        STRING_AGG(
+            CAST(ROW(
+                oi.order_item_id, oi.product_id, oi.seller_id, oi.price,
+                oi.freight_value, d.delivery_distance_km
+            ) AS TEXT),
+            '|' ORDER BY oi.order_item_id
+        ) AS items_key
+    FROM raw_order_items oi
+    JOIN candidate_distances d
+        ON d.order_id = oi.order_id
+       AND d.order_item_id = oi.order_item_id
+    GROUP BY oi.order_id
+) i
+LEFT JOIN raw_orders o
+    ON i.order_id = o.order_id
+LEFT JOIN raw_customers c
+    ON o.customer_id = c.customer_id;
+
+-- 4) Delta: candidates that are new (above the watermark) or whose
+-- fingerprint moved; deletions among the candidates (any order on a full refresh)
+CREATE TEMP TABLE delta_orders ON COMMIT DROP AS
+SELECT
+    s.order_id,
+    s.fingerprint,
+    CASE
+        WHEN w.target_table IS NULL THEN 1
+        WHEN (s.order_purchase_ts, s.order_id) > (w.order_purchase_ts, w.order_id) THEN 1
+        ELSE 0
+    END AS is_new
+FROM src_item_orders s
+LEFT JOIN etl_watermark w
+    ON w.target_table = 'fact_order_items'
+LEFT JOIN etl_order_fingerprints f
+    ON f.target_table = 'fact_order_items'
+   AND f.order_id = s.order_id
+WHERE f.fingerprint IS DISTINCT FROM s.fingerprint;
+
+CREATE TEMP TABLE deleted_orders ON COMMIT DROP AS
+SELECT f.order_id
+FROM etl_order_fingerprints f
+JOIN run_state r
+    ON r.full_refresh
+    OR f.order_id IN (SELECT order_id FROM candidate_orders)
+WHERE f.target_table = 'fact_order_items'
+  AND NOT EXISTS (SELECT 1 FROM src_item_orders s WHERE s.order_id = f.order_id);
+
+ANALYZE delta_orders;
+
+-- 5) Apply the delta
+DELETE FROM fact_order_items
+WHERE order_id IN (SELECT order_id FROM deleted_orders);
+
+-- Items dropped from an order that is still there
+DELETE FROM fact_order_items f
+WHERE f.order_id IN (SELECT order_id FROM delta_orders)
+  AND NOT EXISTS (
+      SELECT 1
+      FROM raw_order_items oi
+      WHERE oi.order_id = f.order_id
+        AND oi.order_item_id = f.order_item_id
+  );
+
+INSERT INTO fact_order_items (
+    order_id,
+    order_item_id,
+    product_id,
+    seller_id,
+    customer_id,
+    customer_unique_id,
+    order_purchase_ts,
+    order_date,
+    order_status,
+    customer_city,
+    customer_state,
+    product_category_name,
+    product_category_en,
+    product_weight_g,
+    product_length_cm,
+    product_height_cm,
+    product_width_cm,
+    item_price,
+    freight_value,
+    item_gmv,
+    item_cnt,
+    delivery_distance_km
+)
+SELECT
+    oi.order_id,
+    oi.order_item_id,
+    oi.product_id,
+    oi.seller_id,
+    o.customer_id,
+    c.customer_unique_id,
+    CAST(o.order_purchase_timestamp AS TIMESTAMP) AS order_purchase_ts,
+    CAST(o.order_purchase_timestamp AS DATE) AS order_date,
+    o.order_status,
+    c.customer_city,
+    c.customer_state,
+    p.product_category_name,
+    ct.product_category_name_english AS product_category_en,
+    p.product_weight_g,
+    p.product_length_cm,
+    p.product_height_cm,
+    p.product_width_cm,
+    oi.price AS item_price,
+    oi.freight_value,
+    (oi.price + oi.freight_value) AS item_gmv,
+    1 AS item_cnt,
+    dist.delivery_distance_km
+FROM delta_orders d
+JOIN raw_order_items oi
+    ON oi.order_id = d.order_id
+LEFT JOIN raw_orders o
+    ON oi.order_id = o.order_id
+LEFT JOIN raw_customers c
+    ON o.customer_id = c.customer_id
+LEFT JOIN raw_products p
+    ON oi.product_id = p.product_id
+LEFT JOIN raw_category_translation ct
+    ON p.product_category_name = ct.product_category_name
+LEFT JOIN candidate_distances dist
+    ON dist.order_id = oi.order_id
+   AND dist.order_item_id = oi.order_item_id
+ON CONFLICT (order_id, order_item_id) DO UPDATE SET
+    product_id = EXCLUDED.product_id,
+    seller_id = EXCLUDED.seller_id,
+    customer_id = EXCLUDED.customer_id,
+    customer_unique_id = EXCLUDED.customer_unique_id,
+    order_purchase_ts = EXCLUDED.order_purchase_ts,
+    order_date = EXCLUDED.order_date,
+    order_status = EXCLUDED.order_status,
+    customer_city = EXCLUDED.customer_city,
+    customer_state = EXCLUDED.customer_state,
+    product_category_name = EXCLUDED.product_category_name,
+    product_category_en = EXCLUDED.product_category_en,
+    product_weight_g = EXCLUDED.product_weight_g,
+    product_length_cm = EXCLUDED.product_length_cm,
+    product_height_cm = EXCLUDED.product_height_cm,
+    product_width_cm = EXCLUDED.product_width_cm,
+    item_price = EXCLUDED.item_price,
+    freight_value = EXCLUDED.freight_value,
+    item_gmv = EXCLUDED.item_gmv,
+    item_cnt = EXCLUDED.item_cnt,
+    delivery_distance_km = EXCLUDED.delivery_distance_km;
+
+-- 6) Advance the state
+DELETE FROM etl_order_fingerprints
+WHERE target_table = 'fact_order_items'
+  AND order_id IN (SELECT order_id FROM deleted_orders);
+
+INSERT INTO etl_order_fingerprints (target_table, order_id, fingerprint)
+SELECT 'fact_order_items', order_id, fingerprint
+FROM delta_orders
+ON CONFLICT (target_table, order_id) DO UPDATE SET
+    fingerprint = EXCLUDED.fingerprint;
+
+INSERT INTO etl_watermark (
+    target_table,
+    order_purchase_ts,
+    order_id,
+    new_orders,
+    changed_orders,
+    deleted_orders,
+    last_change_id,
+    last_xmin,
+    updated_at
+)
+SELECT
+    'fact_order_items',
+    wm.order_purchase_ts,
+    wm.order_id,
+    (SELECT COUNT(*) FROM delta_orders WHERE is_new = 1),
+    (SELECT COUNT(*) FROM delta_orders WHERE is_new = 0),
+    (SELECT COUNT(*) FROM deleted_orders),
+    (SELECT max_change_id FROM run_state),
+    (SELECT snapshot_xmin FROM run_state),
+    CURRENT_TIMESTAMP
+FROM (
+    -- New orders are always candidates, so the previous watermark and the
+    -- candidates hold the maximum.
+    SELECT order_purchase_ts, order_id
+    FROM (
+        SELECT order_purchase_ts, order_id
+        FROM src_item_orders
+        UNION ALL
+        SELECT order_purchase_ts, order_id
+        FROM etl_watermark
+        WHERE target_table = 'fact_order_items'
+    ) c
+    WHERE order_purchase_ts IS NOT NULL
+    ORDER BY order_purchase_ts DESC, order_id DESC
+    LIMIT 1
+) wm
+ON CONFLICT (target_table) DO UPDATE SET
+    order_purchase_ts = EXCLUDED.order_purchase_ts,
+    order_id = EXCLUDED.order_id,
+    new_orders = EXCLUDED.new_orders,
+    changed_orders = EXCLUDED.changed_orders,
+    deleted_orders = EXCLUDED.deleted_orders,
+    last_change_id = EXCLUDED.last_change_id,
+    last_xmin = EXCLUDED.last_xmin,
+    updated_at = EXCLUDED.updated_at;
+
+INSERT INTO etl_raw_relations (target_table, table_name, relid)
+SELECT 'fact_order_items', table_name, relid
+FROM raw_relations
+ON CONFLICT (target_table, table_name) DO UPDATE SET
+    relid = EXCLUDED.relid;
+
+-- Changes every incremental target has consumed and will not read again
+DELETE FROM etl_raw_changes ch
+WHERE ch.change_id <= (
+    SELECT MIN(last_change_id)
+    FROM etl_watermark
+    WHERE target_table IN ('fact_orders', 'fact_order_items')
+)
+  AND NOT EXISTS (
+    SELECT 1
+    FROM etl_watermark w
+    WHERE w.target_table IN ('fact_orders', 'fact_order_items')
+      AND (w.last_xmin IS NULL OR ch.xact_id >= w.last_xmin)
+);
+
+COMMIT;
@@ -1,6 +1,11 @@
 -- Build fact_orders from raw tables (Postgres).
 -- Assumes raw tables exist:
---   raw_orders, raw_order_items, raw_order_payments, raw_customers
+--   raw_orders, raw_order_items, raw_order_payments, raw_customers,
+--   raw_sellers, raw_geolocation, raw_reviews
+-- max_delivery_distance_km: farthest seller of the order, in great-circle km
+-- between zip prefix centroids (see 11_fact_order_items.sql).
+-- review_*: as src/reviews.py computes them; reviews without a score are not
+-- counted, and both means round half away from zero to 0.01.
 
 INSERT INTO fact_orders (
     order_id,
@@ -21,7 +26,21 @@ INSERT INTO fact_orders (
     estimated_gap_days,
     on_time_flag,
     is_canceled,
-    is_new_customer
+    is_new_customer,
+    max_delivery_distance_km,
+    review_score_avg,
+    reviews_cnt,
+    review_response_hours_avg
+)
+WITH zip_centroids AS (
+    SELECT
+        geolocation_zip_code_prefix AS zip_code_prefix,
+        AVG(geolocation_lat) AS lat,
+        AVG(geolocation_lng) AS lng
+    FROM raw_geolocation
+    WHERE geolocation_lat BETWEEN -34.0 AND 5.5
+      AND geolocation_lng BETWEEN -74.5 AND -34.0
+    GROUP BY geolocation_zip_code_prefix
 )
 SELECT
     o.order_id,
@@ -38,26 +57,32 @@ SELECT
     1 AS orders_cnt,
     COALESCE(i.items_cnt, 0) AS items_cnt,
     p.payment_value_total AS revenue_order,
+    -- Whole days floored, as pandas Timedelta.days does (EXTRACT(DAY FROM
+    -- interval) would truncate toward zero and differ on negative gaps).
     CASE
         WHEN o.order_delivered_customer_date IS NULL
           OR o.order_purchase_timestamp IS NULL
         THEN NULL
-        ELSE EXTRACT(
-            DAY FROM (
-                CAST(o.order_delivered_customer_date AS TIMESTAMP)
-                - CAST(o.order_purchase_timestamp AS TIMESTAMP)
-            )
+        ELSE FLOOR(
+            EXTRACT(
+                EPOCH FROM (
+                    CAST(o.order_delivered_customer_date AS TIMESTAMP)
+                    - CAST(o.order_purchase_timestamp AS TIMESTAMP)
+                )
+            ) / 86400
         )
     END AS delivered_days,
     CASE
         WHEN o.order_delivered_customer_date IS NULL
           OR o.order_estimated_delivery_date IS NULL
         THEN NULL
-        ELSE EXTRACT(
-            DAY FROM (
-                CAST(o.order_delivered_customer_date AS TIMESTAMP)
-                - CAST(o.order_estimated_delivery_date AS TIMESTAMP)
-            )
+        ELSE FLOOR(
+            EXTRACT(
+                EPOCH FROM (
+                    CAST(o.order_delivered_customer_date AS TIMESTAMP)
+                    - CAST(o.order_estimated_delivery_date AS TIMESTAMP)
+                )
+            ) / 86400
         )
     END AS estimated_gap_days,
     CASE
@@ -77,7 +102,14 @@ SELECT
             OVER (PARTITION BY c.customer_unique_id)
         THEN 1
         ELSE 0
-    END AS is_new_customer
+    END AS is_new_customer,
+    d.max_delivery_distance_km,
+    r.review_score_avg,
+    -- An empty raw_reviews means no reviews file was loaded: unknown, not 0.
+    CASE
+        WHEN EXISTS (SELECT 1 FROM raw_reviews) THEN COALESCE(r.reviews_cnt, 0)
+    END AS reviews_cnt,
+    r.review_response_hours_avg
 FROM raw_orders o
 LEFT JOIN raw_customers c
     ON o.customer_id = c.customer_id
@@ -92,4 +124,48 @@ LEFT JOIN (
     FROM raw_order_items
     GROUP BY order_id
 ) i
-    ON o.order_id = i.order_id;
+    ON o.order_id = i.order_id
+LEFT JOIN (
+    SELECT
+        oi.order_id,
+        MAX(2 * 6371.0088 * ASIN(SQRT(
+            POWER(SIN((RADIANS(cg.lat) - RADIANS(sg.lat)) / 2), 2)
+            + COS(RADIANS(sg.lat)) * COS(RADIANS(cg.lat))
+            * POWER(SIN((RADIANS(cg.lng) - RADIANS(sg.lng)) / 2), 2)
+        ))) AS max_delivery_distance_km
+    FROM raw_order_items oi
+    JOIN raw_orders io
+        ON oi.order_id = io.order_id
+    JOIN raw_customers ic
+        ON io.customer_id = ic.customer_id
+    JOIN raw_sellers s
+        ON oi.seller_id = s.seller_id
+    JOIN zip_centroids sg
+        ON s.seller_zip_code_prefix = sg.zip_code_prefix
+    JOIN zip_centroids cg
+        ON ic.customer_zip_code_prefix = cg.zip_code_prefix
+    GROUP BY oi.order_id
+) d
+    ON o.order_id = d.order_id
+LEFT JOIN (
+    SELECT
+        order_id,
+        AVG(review_score) AS review_score_avg,
+        COUNT(review_score) AS reviews_cnt,
+        -- Rounded in hundredths of an hour (seconds / 36): ROUND goes half
+        -- away from zero on NUMERIC and DOUBLE alike, so exact ties agree
+        -- between Postgres, DuckDB and src/reviews.py.
+        ROUND(
+            AVG(
+                EXTRACT(
+                    EPOCH FROM (
+                        CAST(review_answer_timestamp AS TIMESTAMP)
+                        - CAST(review_creation_date AS TIMESTAMP)
+                    )
+                )
+            ) / 36
+        ) / 100 AS review_response_hours_avg
+    FROM raw_reviews
+    GROUP BY order_id
+) r
+    ON o.order_id = r.order_id;
@@ -1,6 +1,10 @@
 -- Build fact_order_items from raw tables (Postgres).
 -- Assumes raw tables exist:
---   raw_orders, raw_order_items, raw_customers, raw_products, raw_category_translation
+--   raw_orders, raw_order_items, raw_customers, raw_products, raw_category_translation,
+--   raw_sellers, raw_geolocation
+-- delivery_distance_km: great-circle km between the seller and customer zip
+-- prefix centroids (mean of the geolocation points inside Brazil's bounding
+-- box), as src/geo_index.py computes it; NULL when a prefix has no points.
 
 INSERT INTO fact_order_items (
     order_id,
@@ -23,7 +27,18 @@ INSERT INTO fact_order_items (
     item_price,
     freight_value,
     item_gmv,
-    item_cnt
+    item_cnt,
+    delivery_distance_km
+)
+WITH zip_centroids AS (
+    SELECT
+        geolocation_zip_code_prefix AS zip_code_prefix,
+        AVG(geolocation_lat) AS lat,
+        AVG(geolocation_lng) AS lng
+    FROM raw_geolocation
+    WHERE geolocation_lat BETWEEN -34.0 AND 5.5
+      AND geolocation_lng BETWEEN -74.5 AND -34.0
+    GROUP BY geolocation_zip_code_prefix
 )
 SELECT
     oi.order_id,
@@ -46,7 +61,13 @@ SELECT
     oi.price AS item_price,
     oi.freight_value,
     (oi.price + oi.freight_value) AS item_gmv,
-    1 AS item_cnt
+    1 AS item_cnt,
+    -- Haversine; the NUMERIC(10,2) column rounds it to 0.01 km.
+    2 * 6371.0088 * ASIN(SQRT(
+        POWER(SIN((RADIANS(cg.lat) - RADIANS(sg.lat)) / 2), 2)
+        + COS(RADIANS(sg.lat)) * COS(RADIANS(cg.lat))
+        * POWER(SIN((RADIANS(cg.lng) - RADIANS(sg.lng)) / 2), 2)
+    )) AS delivery_distance_km
 FROM raw_order_items oi
 LEFT JOIN raw_orders o
     ON oi.order_id = o.order_id
@@ -55,4 +76,10 @@ LEFT JOIN raw_customers c
 LEFT JOIN raw_products p
     ON oi.product_id = p.product_id
 LEFT JOIN raw_category_translation ct
-    ON p.product_category_name = ct.product_category_name;
+    ON p.product_category_name = ct.product_category_name
+LEFT JOIN raw_sellers s
+    ON oi.seller_id = s.seller_id
+LEFT JOIN zip_centroids sg
+    ON s.seller_zip_code_prefix = sg.zip_code_prefix
+LEFT JOIN zip_centroids cg
+    ON c.customer_zip_code_prefix = cg.zip_code_prefix;
@@ -0,0 +1,46 @@
+-- Build fact_seller_daily from fact_order_items and fact_orders (Postgres).
+-- One row per seller x purchase day; items without a purchase day are left
+-- out. Order-level measures count each seller/order pair once, and an order
+-- is late when fact_orders.on_time_flag = 0.
+
+INSERT INTO fact_seller_daily (
+    seller_id,
+    order_date,
+    seller_state,
+    items_cnt,
+    orders_cnt,
+    price_sum,
+    freight_sum,
+    gmv_sum,
+    late_orders_cnt,
+    late_orders_den
+)
+SELECT
+    so.seller_id,
+    so.order_date,
+    s.seller_state,
+    SUM(so.items_cnt) AS items_cnt,
+    COUNT(*) AS orders_cnt,
+    ROUND(SUM(so.price_sum), 2) AS price_sum,
+    ROUND(SUM(so.freight_sum), 2) AS freight_sum,
+    ROUND(SUM(so.gmv_sum), 2) AS gmv_sum,
+    COALESCE(SUM(1 - o.on_time_flag), 0) AS late_orders_cnt,
+    COUNT(o.on_time_flag) AS late_orders_den
+FROM (
+    SELECT
+        seller_id,
+        order_id,
+        order_date,
+        COUNT(*) AS items_cnt,
+        SUM(item_price) AS price_sum,
+        SUM(freight_value) AS freight_sum,
+        SUM(item_gmv) AS gmv_sum
+    FROM fact_order_items
+    WHERE order_date IS NOT NULL
+    GROUP BY seller_id, order_id, order_date
+) so
+LEFT JOIN fact_orders o
+    ON so.order_id = o.order_id
+LEFT JOIN raw_sellers s
+    ON so.seller_id = s.seller_id
+GROUP BY so.seller_id, so.order_date, s.seller_state;
@@ -0,0 +1,37 @@
+-- Build dim_customer from fact_orders (Postgres).
+-- Assumes fact_orders is loaded. First state = state of the earliest order
+-- (ties broken by order_id).
+
+INSERT INTO dim_customer (
+    customer_unique_id,
+    first_purchase_ts,
+    last_purchase_ts,
+    orders_cnt,
+    lifetime_revenue,
+    first_state,
+    cohort_month,
+    is_repeat_customer
+)
+SELECT
+    customer_unique_id,
+    MIN(order_purchase_ts) AS first_purchase_ts,
+    MAX(order_purchase_ts) AS last_purchase_ts,
+    COUNT(*) AS orders_cnt,
+    ROUND(SUM(revenue_order), 2) AS lifetime_revenue,
+    MAX(CASE WHEN order_rank = 1 THEN customer_state END) AS first_state,
+    TO_CHAR(MIN(order_purchase_ts), 'YYYY-MM') AS cohort_month,
+    CASE WHEN COUNT(*) > 1 THEN 1 ELSE 0 END AS is_repeat_customer
+FROM (
+    SELECT
+        customer_unique_id,
+        order_purchase_ts,
+        customer_state,
+        revenue_order,
+        ROW_NUMBER() OVER (
+            PARTITION BY customer_unique_id
+            ORDER BY order_purchase_ts, order_id
+        ) AS order_rank
+    FROM fact_orders
+    WHERE customer_unique_id IS NOT NULL
+) o
+GROUP BY customer_unique_id;
@@ -0,0 +1,43 @@
+-- Build cohort_retention from fact_orders + dim_customer (Postgres).
+-- month_offset = calendar months between the first purchase and the order.
+
+INSERT INTO cohort_retention (
+    cohort_month,
+    month_offset,
+    activity_month,
+    cohort_size,
+    active_customers,
+    retention_rate,
+    orders_cnt,
+    revenue
+)
+SELECT
+    a.cohort_month,
+    a.month_offset,
+    a.activity_month,
+    s.cohort_size,
+    COUNT(DISTINCT a.customer_unique_id) AS active_customers,
+    ROUND(COUNT(DISTINCT a.customer_unique_id)::numeric / s.cohort_size, 4) AS retention_rate,
+    COUNT(*) AS orders_cnt,
+    ROUND(SUM(a.revenue_order), 2) AS revenue
+FROM (
+    SELECT
+        f.customer_unique_id,
+        d.cohort_month,
+        (EXTRACT(YEAR FROM f.order_purchase_ts) * 12 + EXTRACT(MONTH FROM f.order_purchase_ts))
+          - (EXTRACT(YEAR FROM d.first_purchase_ts) * 12 + EXTRACT(MONTH FROM d.first_purchase_ts))
+          AS month_offset,
+        TO_CHAR(f.order_purchase_ts, 'YYYY-MM') AS activity_month,
+        f.revenue_order
+    FROM fact_orders f
+    JOIN dim_customer d
+        ON f.customer_unique_id = d.customer_unique_id
+    WHERE f.order_purchase_ts IS NOT NULL
+) a
+JOIN (
+    SELECT cohort_month, COUNT(*) AS cohort_size
+    FROM dim_customer
+    GROUP BY cohort_month
+) s
+    ON a.cohort_month = s.cohort_month
+GROUP BY a.cohort_month, a.month_offset, a.activity_month, s.cohort_size;
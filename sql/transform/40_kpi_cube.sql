@@ -0,0 +1,69 @@
+-- Build kpi_cube from fact_orders (Postgres).
+-- Day / ISO week / month x (each state + 'ALL') x order_status in one scan
+-- via GROUPING SETS. Orders without a state are grouped as 'UNKNOWN'.
+
+INSERT INTO kpi_cube (
+    period_grain,
+    period_start,
+    customer_state,
+    order_status,
+    orders_cnt,
+    revenue_sum,
+    revenue_orders_cnt,
+    items_cnt,
+    canceled_cnt,
+    on_time_cnt,
+    on_time_den,
+    delivered_days_sum,
+    delivered_days_cnt,
+    estimated_gap_days_sum,
+    estimated_gap_days_cnt,
+    new_customers_cnt
+)
+SELECT
+    CASE
+        WHEN GROUPING(b.day_start) = 0 THEN 'day'
+        WHEN GROUPING(b.week_start) = 0 THEN 'week'
+        ELSE 'month'
+    END AS period_grain,
+    COALESCE(b.day_start, b.week_start, b.month_start) AS period_start,
+    CASE WHEN GROUPING(b.customer_state) = 1 THEN 'ALL' ELSE b.customer_state END AS customer_state,
+    b.order_status,
+    SUM(b.orders_cnt) AS orders_cnt,
+    COALESCE(ROUND(SUM(b.revenue_order), 2), 0) AS revenue_sum,
+    COUNT(b.revenue_order) AS revenue_orders_cnt,
+    COALESCE(SUM(b.items_cnt), 0) AS items_cnt,
+    SUM(b.is_canceled) AS canceled_cnt,
+    COALESCE(SUM(b.on_time_flag), 0) AS on_time_cnt,
+    COUNT(b.on_time_flag) AS on_time_den,
+    COALESCE(SUM(b.delivered_days), 0) AS delivered_days_sum,
+    COUNT(b.delivered_days) AS delivered_days_cnt,
+    COALESCE(SUM(b.estimated_gap_days), 0) AS estimated_gap_days_sum,
+    COUNT(b.estimated_gap_days) AS estimated_gap_days_cnt,
+    COALESCE(SUM(b.is_new_customer), 0) AS new_customers_cnt
+FROM (
+    SELECT
+        CAST(order_purchase_ts AS DATE) AS day_start,
+        CAST(DATE_TRUNC('week', order_purchase_ts) AS DATE) AS week_start,
+        CAST(DATE_TRUNC('month', order_purchase_ts) AS DATE) AS month_start,
+        COALESCE(customer_state, 'UNKNOWN') AS customer_state,
+        order_status,
+        orders_cnt,
+        revenue_order,
+        items_cnt,
+        is_canceled,
+        on_time_flag,
+        delivered_days,
+        estimated_gap_days,
+        is_new_customer
+    FROM fact_orders
+    WHERE order_purchase_ts IS NOT NULL
+) b
+GROUP BY GROUPING SETS (
+    (b.day_start, b.customer_state, b.order_status),
+    (b.day_start, b.order_status),
+    (b.week_start, b.customer_state, b.order_status),
+    (b.week_start, b.order_status),
+    (b.month_start, b.customer_state, b.order_status),
+    (b.month_start, b.order_status)
+);
@@ -0,0 +1,26 @@
+-- mv_daily_kpis: order KPIs per purchase date (Postgres materialized view).
+-- Additive columns plus the ratios from docs/metrics_dictionary.md; the
+-- unique index on order_date allows REFRESH ... CONCURRENTLY.
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_daily_kpis AS
+SELECT
+    order_purchase_date AS order_date,
+    SUM(orders_cnt) AS orders_cnt,
+    COALESCE(SUM(revenue_order), 0) AS revenue,
+    COUNT(revenue_order) AS paid_orders_cnt,
+    COALESCE(SUM(items_cnt), 0) AS items_cnt,
+    SUM(is_canceled) AS canceled_cnt,
+    COALESCE(SUM(on_time_flag), 0) AS on_time_cnt,
+    COUNT(on_time_flag) AS on_time_den,
+    COALESCE(SUM(delivered_days), 0) AS delivered_days_sum,
+    COUNT(delivered_days) AS delivered_days_cnt,
+    COALESCE(SUM(is_new_customer), 0) AS new_customers_cnt,
+    ROUND(SUM(revenue_order) / NULLIF(SUM(orders_cnt), 0), 2) AS aov,
+    ROUND(CAST(SUM(is_canceled) AS NUMERIC) / NULLIF(SUM(orders_cnt), 0), 4) AS cancel_rate,
+    ROUND(CAST(SUM(on_time_flag) AS NUMERIC) / NULLIF(COUNT(on_time_flag), 0), 4) AS on_time_rate
+FROM fact_orders
+WHERE order_purchase_date IS NOT NULL
+GROUP BY order_purchase_date
+WITH DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_daily_kpis
+    ON mv_daily_kpis (order_date);
@@ -0,0 +1,24 @@
+-- mv_monthly_kpis: order KPIs per purchase month, rolled up from
+-- mv_daily_kpis (so it must be refreshed after it).
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_monthly_kpis AS
+SELECT
+    TO_CHAR(order_date, 'YYYY-MM') AS year_month,
+    SUM(orders_cnt) AS orders_cnt,
+    SUM(revenue) AS revenue,
+    SUM(paid_orders_cnt) AS paid_orders_cnt,
+    SUM(items_cnt) AS items_cnt,
+    SUM(canceled_cnt) AS canceled_cnt,
+    SUM(on_time_cnt) AS on_time_cnt,
+    SUM(on_time_den) AS on_time_den,
+    SUM(delivered_days_sum) AS delivered_days_sum,
+    SUM(delivered_days_cnt) AS delivered_days_cnt,
+    SUM(new_customers_cnt) AS new_customers_cnt,
+    ROUND(SUM(revenue) / NULLIF(SUM(orders_cnt), 0), 2) AS aov,
+    ROUND(CAST(SUM(canceled_cnt) AS NUMERIC) / NULLIF(SUM(orders_cnt), 0), 4) AS cancel_rate,
+    ROUND(CAST(SUM(on_time_cnt) AS NUMERIC) / NULLIF(SUM(on_time_den), 0), 4) AS on_time_rate
+FROM mv_daily_kpis
+GROUP BY TO_CHAR(order_date, 'YYYY-MM')
+WITH DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_monthly_kpis
+    ON mv_monthly_kpis (year_month);
@@ -0,0 +1,20 @@
+-- mv_category_gmv_monthly: item GMV per English category and purchase month
+-- (Postgres materialized view). Items without a category are 'unknown'.
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_category_gmv_monthly AS
+SELECT
+    TO_CHAR(order_date, 'YYYY-MM') AS year_month,
+    COALESCE(product_category_en, 'unknown') AS product_category_en,
+    SUM(item_cnt) AS items_cnt,
+    COUNT(DISTINCT order_id) AS orders_cnt,
+    SUM(item_price) AS item_price_sum,
+    SUM(freight_value) AS freight_value_sum,
+    SUM(item_gmv) AS gmv
+FROM fact_order_items
+WHERE order_date IS NOT NULL
+GROUP BY
+    TO_CHAR(order_date, 'YYYY-MM'),
+    COALESCE(product_category_en, 'unknown')
+WITH DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_category_gmv_monthly
+    ON mv_category_gmv_monthly (year_month, product_category_en);
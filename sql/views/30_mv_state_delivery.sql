@@ -0,0 +1,24 @@
+-- mv_state_delivery: delivery performance per customer state and purchase
+-- month (Postgres materialized view), over delivered orders only. Orders
+-- without a state are 'UNKNOWN'.
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_state_delivery AS
+SELECT
+    TO_CHAR(order_purchase_ts, 'YYYY-MM') AS year_month,
+    COALESCE(customer_state, 'UNKNOWN') AS customer_state,
+    COUNT(*) AS delivered_orders_cnt,
+    COALESCE(SUM(on_time_flag), 0) AS on_time_cnt,
+    COUNT(on_time_flag) AS on_time_den,
+    ROUND(CAST(SUM(on_time_flag) AS NUMERIC) / NULLIF(COUNT(on_time_flag), 0), 4) AS on_time_rate,
+    ROUND(AVG(delivered_days), 2) AS avg_delivered_days,
+    ROUND(AVG(estimated_gap_days), 2) AS avg_estimated_gap_days,
+    PERCENTILE_CONT(0.9) WITHIN GROUP (ORDER BY delivered_days) AS p90_delivered_days
+FROM fact_orders
+WHERE order_delivered_ts IS NOT NULL
+  AND order_purchase_ts IS NOT NULL
+GROUP BY
+    TO_CHAR(order_purchase_ts, 'YYYY-MM'),
+    COALESCE(customer_state, 'UNKNOWN')
+WITH DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_state_delivery
+    ON mv_state_delivery (year_month, customer_state);
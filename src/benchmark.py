@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Time and memory-profile the mart builders on synthetic data.
+
+For every scale factor, synthetic raw files are generated once into
+data/synthetic/sf<scale>/raw (see generate_synthetic.py), then each builder
+is run stage by stage:
+
+  fact_orders       load -> build -> checks -> write
+  fact_order_items  load -> build -> checks -> write
+  dim_date          load -> build -> write
+  load_postgres     one load_table() per raw file (only with --pg and
+                    PG_PASSWORD set; tables are prefixed bench_)
+
+Wall time is the median of --repeat timed runs. Peak memory comes from a
+separate tracemalloc run, since tracing slows pandas down noticeably.
+Results go to benchmarks/results/<timestamp>-<git rev>-sf<scale>.json and
+are compared with the most recent earlier result for the same scale; stages
+slower by more than --threshold are reported as regressions.
+
+Usage:
+  python src/benchmark.py
+  python src/benchmark.py --scale 1 --scale 10 --repeat 3
+  PG_PASSWORD=your_password python src/benchmark.py --scale 1 --pg
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import transform
+import transform_items
+from build_dim_date import build_dim_date
+from generate_synthetic import SYNTHETIC_DIR, generate
+from mart_io import write_mart
+from raw_cache import ensure_cached, read_raw
+
+
+RESULTS_DIR = Path("benchmarks/results")
+DEFAULT_THRESHOLD = 0.20
+
+# Files the Postgres stage loads, as in load_postgres.TABLE_FILES.
+PG_TABLES = {
+    "bench_raw_orders": "olist_orders_dataset.csv",
+    "bench_raw_order_items": "olist_order_items_dataset.csv",
+    "bench_raw_order_payments": "olist_order_payments_dataset.csv",
+    "bench_raw_customers": "olist_customers_dataset.csv",
+    "bench_raw_products": "olist_products_dataset.csv",
+}
+
+Stage = Tuple[str, Callable[[dict], None]]
+
+
+def git_revision() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "nogit"
+    return out.stdout.strip()
+
+
+def synthetic_raw_dir(scale: float) -> Path:
+    return SYNTHETIC_DIR / f"sf{scale:g}" / "raw"
+
+
+def ensure_synthetic(scale: float, seed: int) -> Path:
+    raw_dir = synthetic_raw_dir(scale)
+    # Reviews are written last; older drops without them are regenerated.
+    if not (raw_dir / "olist_order_reviews_dataset.csv").exists():
+        print(f"Generating synthetic data at scale {scale:g} -> {raw_dir}")
+        generate(raw_dir, scale=scale, seed=seed)
+    # Warm the raw cache so "load" measures steady-state reads.
+    for path in sorted(raw_dir.glob("*.csv")):
+        ensure_cached(path.name, raw_dir)
+    return raw_dir
+
+
+def _quiet(func: Callable[[], object]) -> None:
+    # The checks print their summaries; keep benchmark output readable.
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+
+
+def fact_orders_stages() -> List[Stage]:
+    def load(ctx: dict) -> None:
+        ctx["raw"] = transform.load_raw(ctx["raw_dir"])
+
+    def build(ctx: dict) -> None:
+        ctx["df"] = transform.build_fact_orders(ctx["raw"])
+
+    def checks(ctx: dict) -> None:
+        _quiet(lambda: transform.run_checks(ctx["df"]))
+
+    def write(ctx: dict) -> None:
+        write_mart(ctx["df"], "fact_orders", ctx["mart_dir"], ctx["fmt"])
+
+    return [("load", load), ("build", build), ("checks", checks), ("write", write)]
+
+
+def fact_order_items_stages() -> List[Stage]:
+    def load(ctx: dict) -> None:
+        ctx["raw"] = transform_items.load_raw(ctx["raw_dir"])
+
+    def build(ctx: dict) -> None:
+        ctx["df"] = transform_items.build_fact_order_items(ctx["raw"])
+
+    def checks(ctx: dict) -> None:
+        _quiet(lambda: transform_items.run_checks(ctx["df"]))
+
+    def write(ctx: dict) -> None:
+        write_mart(ctx["df"], "fact_order_items", ctx["mart_dir"], ctx["fmt"])
+
+    return [("load", load), ("build", build), ("checks", checks), ("write", write)]
+
+
+def dim_date_stages() -> List[Stage]:
+    def load(ctx: dict) -> None:
+        ctx["orders"] = read_raw(
+            "olist_orders_dataset.csv", ["order_purchase_timestamp"], ctx["raw_dir"]
+        )
+
+    def build(ctx: dict) -> None:
+        ctx["df"] = build_dim_date(ctx["orders"])
+
+    def write(ctx: dict) -> None:
+        write_mart(ctx["df"], "dim_date", ctx["mart_dir"], ctx["fmt"])
+
+    return [("load", load), ("build", build), ("write", write)]
+
+
+def load_postgres_stages(engine) -> List[Stage]:
+    from load_postgres import load_table
+
+    def _stage(table_name: str, filename: str) -> Stage:
+        def run(ctx: dict) -> None:
+            _quiet(
+                lambda: load_table(
+                    engine, table_name, ctx["raw_dir"] / filename, "replace"
+                )
+            )
+
+        return table_name, run
+
+    return [_stage(table_name, filename) for table_name, filename in PG_TABLES.items()]
+
+
+def run_once(stages: List[Stage], ctx: dict, trace_memory: bool) -> Dict[str, float]:
+    """Run stages in order; return seconds, or peak MiB when tracing memory."""
+    measured: Dict[str, float] = {}
+    ctx = dict(ctx)
+    for name, func in stages:
+        if trace_memory:
+            tracemalloc.start()
+            func(ctx)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            measured[name] = peak / 2**20
+        else:
+            start = time.perf_counter()
+            func(ctx)
+            measured[name] = time.perf_counter() - start
+    return measured
+
+
+def benchmark_builder(
+    stages: List[Stage], ctx: dict, repeat: int, memory: bool
+) -> Dict[str, dict]:
+    runs = [run_once(stages, ctx, trace_memory=False) for _ in range(repeat)]
+    peaks = run_once(stages, ctx, trace_memory=True) if memory else {}
+
+    results: Dict[str, dict] = {}
+    for name, _ in stages:
+        times = [run[name] for run in runs]
+        results[name] = {
+            "seconds": statistics.median(times),
+            "seconds_all": times,
+            "peak_mib": peaks.get(name),
+        }
+    return results
+
+
+def latest_result(results_dir: Path, scale: float, exclude: Path) -> Optional[dict]:
+    for path in sorted(results_dir.glob("*.json"), reverse=True):
+        if path == exclude:
+            continue
+        previous = json.loads(path.read_text(encoding="utf-8"))
+        if previous.get("scale") == scale:
+            previous["_path"] = str(path)
+            return previous
+    return None
+
+
+def compare(current: dict, previous: dict, threshold: float) -> List[str]:
+    regressions = []
+    for builder, stages in current["builders"].items():
+        for stage, stats in stages.items():
+            old = previous["builders"].get(builder, {}).get(stage)
+            if not old or not old["seconds"]:
+                continue
+            change = stats["seconds"] / old["seconds"] - 1
+            if change > threshold:
+                regressions.append(
+                    f"{builder}.{stage}: {old['seconds']:.3f}s -> "
+                    f"{stats['seconds']:.3f}s (+{change:.0%})"
+                )
+    return regressions
+
+
+def print_results(result: dict) -> None:
+    print(f"\nScale {result['scale']:g} ({result['rows']['orders']:,} orders)")
+    print(f"  {'stage':<40} {'median s':>10} {'peak MiB':>10}")
+    for builder, stages in result["builders"].items():
+        for stage, stats in stages.items():
+            peak = stats["peak_mib"]
+            peak_text = f"{peak:10.1f}" if peak is not None else f"{'-':>10}"
+            print(f"  {builder + '.' + stage:<40} {stats['seconds']:10.3f} {peak_text}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scale",
+        type=float,
+        action="append",
+        help="Scale factor to benchmark; repeatable (default: 1)",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per builder")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--format", default="csv", help="Mart output format for the write stages"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Skip the tracemalloc pass"
+    )
+    parser.add_argument(
+        "--pg",
+        action="store_true",
+        help="Also benchmark load_postgres.load_table (needs PG_PASSWORD)",
+    )
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--db", default="olist_analytics")
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Slowdown ratio reported as a regression (default: 0.20)",
+    )
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit non-zero when a regression is found",
+    )
+    args = parser.parse_args()
+
+    engine = None
+    if args.pg:
+        password = os.getenv("PG_PASSWORD")
+        if not password:
+            raise SystemExit("PG_PASSWORD env var is required with --pg.")
+        from load_postgres import build_engine
+
+        engine = build_engine(args.user, password, args.host, args.port, args.db)
+
+    revision = git_revision()
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+
+    found_regression = False
+    for scale in args.scale or [1.0]:
+        raw_dir = ensure_synthetic(scale, args.seed)
+        builders = {
+            "fact_orders": fact_orders_stages(),
+            "fact_order_items": fact_order_items_stages(),
+            "dim_date": dim_date_stages(),
+        }
+        if engine is not None:
+            builders["load_postgres"] = load_postgres_stages(engine)
+
+        result: dict = {
+            "timestamp": stamp,
+            "git_rev": revision,
+            "scale": scale,
+            "rows": {
+                "orders": len(
+                    read_raw("olist_orders_dataset.csv", ["order_id"], raw_dir)
+                ),
+            },
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "builders": {},
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            ctx = {"raw_dir": raw_dir, "mart_dir": Path(tmp), "fmt": args.format}
+            for name, stages in builders.items():
+                print(f"Benchmarking {name} at scale {scale:g} ...")
+                result["builders"][name] = benchmark_builder(
+                    stages, ctx, args.repeat, memory=not args.no_memory
+                )
+
+        out_path = args.results_dir / f"{stamp}-{revision}-sf{scale:g}.json"
+        out_path.write_text(json.dumps(result, indent=2), encoding="utf-8")
+        print_results(result)
+        print(f"Wrote results -> {out_path}")
+
+        previous = latest_result(args.results_dir, scale, exclude=out_path)
+        if previous is None:
+            print("No earlier result at this scale to compare with.")
+            continue
+        regressions = compare(result, previous, args.threshold)
+        print(f"Compared with {previous['_path']} (rev {previous['git_rev']}):")
+        if regressions:
+            found_regression = True
+            for line in regressions:
+                print(f"  REGRESSION {line}")
+        else:
+            print(f"  no stage slower by more than {args.threshold:.0%}")
+
+    if found_regression and args.fail_on_regression:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
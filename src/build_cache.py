@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Skip mart builds whose inputs did not change since the last build.
+
+A builder declares its stage: the raw files (or upstream marts) it reads,
+the mart it writes and the parameters that change the output. The stage
+fingerprint is the sha256 of
+  - every input file,
+  - the source of every module from src/ loaded by the builder (the script
+    plus its local imports, so an edit to a shared helper counts),
+  - the DDL column types of the raw inputs (see schema.py),
+  - the parameters.
+After a build the fingerprint and the digests of the written mart go to
+<mart dir>/_state/build_cache/<mart file>.json. The next run rebuilds only if
+any of them differs or the mart was removed or modified; otherwise the
+existing mart is reused as is. Files whose size and mtime match the manifest
+are not re-hashed.
+
+Usage:
+  python src/transform.py              # skips the build when nothing changed
+  python src/transform.py --force      # rebuild anyway
+  python src/build_cache.py            # status of every cached stage
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from raw_cache import _write_json, file_sha256, schema_signature
+from schema import RAW_TABLE_FILES
+
+
+MART_DIR = Path("data/mart")
+SRC_DIR = Path(__file__).resolve().parent
+
+Digests = Dict[str, dict]
+
+
+def state_dir(mart_dir: Path) -> Path:
+    return mart_dir / "_state" / "build_cache"
+
+
+def _files(path: Path) -> List[Path]:
+    # Partitioned Parquet/Arrow marts are directories.
+    if path.is_dir():
+        return sorted(p for p in path.rglob("*") if p.is_file())
+    return [path] if path.exists() else []
+
+
+def file_digests(paths: Sequence[Path], previous: Optional[Digests] = None) -> Digests:
+    """size / mtime / sha256 per file; unchanged size and mtime reuse the old hash."""
+    previous = previous or {}
+    digests: Digests = {}
+    for path in paths:
+        for file in _files(path):
+            stat = file.stat()
+            known = previous.get(str(file))
+            if (
+                known
+                and known["size"] == stat.st_size
+                and known["mtime_ns"] == stat.st_mtime_ns
+            ):
+                digests[str(file)] = known
+            else:
+                digests[str(file)] = {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "sha256": file_sha256(file),
+                }
+    return digests
+
+
+def loaded_sources() -> List[Path]:
+    """Modules from src/ imported by this process, the running script included."""
+    paths = set()
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if not path or Path(path).suffix != ".py":
+            continue
+        if Path(path).resolve().parent == SRC_DIR:
+            paths.add(Path(path).resolve())
+    return sorted(paths)
+
+
+def fingerprint(inputs: Digests, code: Digests, schema: dict, params: dict) -> str:
+    payload = {
+        "inputs": {Path(p).name: d["sha256"] for p, d in inputs.items()},
+        "code": {Path(p).name: d["sha256"] for p, d in code.items()},
+        "schema": schema,
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _changed(current: Digests, recorded: Dict[str, dict]) -> List[str]:
+    names = set(current) | set(recorded)
+    return sorted(
+        Path(name).name
+        for name in names
+        if current.get(name, {}).get("sha256") != recorded.get(name, {}).get("sha256")
+    )
+
+
+class BuildStage:
+    def __init__(
+        self,
+        name: str,
+        inputs: Sequence[Path],
+        outputs: Sequence[Path],
+        params: Optional[dict] = None,
+        mart_dir: Path = MART_DIR,
+    ) -> None:
+        self.name = name
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.manifest_path = state_dir(mart_dir) / f"{name}.json"
+        try:
+            self.manifest: Optional[dict] = json.loads(
+                self.manifest_path.read_text(encoding="utf-8")
+            )
+        except (OSError, ValueError):
+            self.manifest = None
+        self.reasons: List[str] = []
+        self.skipped = False
+
+    def _schema(self) -> Dict[str, dict]:
+        raw_files = set(RAW_TABLE_FILES.values())
+        return {
+            path.name: schema_signature(path.name)
+            for path in self.inputs
+            if path.name in raw_files
+        }
+
+    def stale_reasons(self) -> List[str]:
+        """Why the stage has to be rebuilt; empty when the last build is reusable."""
+        manifest = self.manifest
+        if manifest is None:
+            return ["no previous build"]
+        reasons = []
+        if manifest["params"] != self.params:
+            reasons.append("params")
+        changed = _changed(
+            file_digests(self.inputs, manifest["inputs"]), manifest["inputs"]
+        )
+        reasons += [f"input {name}" for name in changed]
+        # The recorded modules are enough: importing a new one means editing one.
+        code_paths = [Path(p) for p in manifest["code"]]
+        changed = _changed(file_digests(code_paths, manifest["code"]), manifest["code"])
+        reasons += [f"code {name}" for name in changed]
+        if manifest["schema"] != self._schema():
+            reasons.append("schema")
+        changed = _changed(
+            file_digests(self.outputs, manifest["outputs"]), manifest["outputs"]
+        )
+        reasons += [f"output {name}" for name in changed]
+        return reasons
+
+    def up_to_date(self, force: bool = False) -> bool:
+        self.reasons = ["--force"] if force else self.stale_reasons()
+        self.skipped = not self.reasons
+        return self.skipped
+
+    def save(self) -> None:
+        """Record the fingerprint of a finished build."""
+        previous = self.manifest or {}
+        inputs = file_digests(self.inputs, previous.get("inputs"))
+        code = file_digests(loaded_sources(), previous.get("code"))
+        schema = self._schema()
+        self.manifest = {
+            "stage": self.name,
+            "key": fingerprint(inputs, code, schema, self.params),
+            "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "params": self.params,
+            "input_paths": [str(path) for path in self.inputs],
+            "output_paths": [str(path) for path in self.outputs],
+            "inputs": inputs,
+            "code": code,
+            "schema": schema,
+            "outputs": file_digests(self.outputs),
+        }
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        _write_json(self.manifest_path, self.manifest)
+
+    def report(self) -> str:
+        key = (self.manifest or {}).get("key", "")[:12]
+        if self.skipped:
+            return (
+                f"build cache: skipped {self.name} (unchanged since "
+                f"{self.manifest['built_at']}, key {key})"
+            )
+        return f"build cache: built {self.name} ({', '.join(self.reasons)}; key {key})"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mart-dir", type=Path, default=MART_DIR)
+    args = parser.parse_args()
+
+    manifests = sorted(state_dir(args.mart_dir).glob("*.json"))
+    if not manifests:
+        print(f"No cached stages in {state_dir(args.mart_dir)}")
+        return
+    for path in manifests:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+        stage = BuildStage(
+            manifest["stage"],
+            [Path(p) for p in manifest["input_paths"]],
+            [Path(p) for p in manifest["output_paths"]],
+            manifest["params"],
+            args.mart_dir,
+        )
+        reasons = stage.stale_reasons()
+        status = "fresh" if not reasons else "stale: " + ", ".join(reasons)
+        print(
+            f"{manifest['stage']:<28} {manifest['built_at']}  "
+            f"{manifest['key'][:12]}  {status}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Build dim_customer (1 row per customer_unique_id) and cohort_retention
+(1 row per cohort month x months since first purchase) from fact_orders.
+
+dim_customer holds first/last purchase, order count, lifetime revenue, the
+state of the first order and the cohort month, so retention questions do
+not need a window over fact_orders. Like is_new_customer, every order counts
+regardless of status.
+
+Usage:
+  python src/build_dim_customer.py
+  python src/build_dim_customer.py --format parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import transform
+from mart_io import FORMATS, write_mart
+from profiling import add_profile_argument, profile_run, step
+
+
+MART_DIR = Path("data/mart")
+
+
+def build_dim_customer(fact_orders: pd.DataFrame) -> pd.DataFrame:
+    orders = fact_orders.loc[
+        fact_orders["customer_unique_id"].notna(),
+        [
+            "customer_unique_id",
+            "order_id",
+            "order_purchase_ts",
+            "customer_state",
+            "revenue_order",
+        ],
+    ]
+    # Sorted once, so "first" is the earliest order (ties broken by order_id).
+    orders = orders.sort_values(
+        ["customer_unique_id", "order_purchase_ts", "order_id"]
+    )
+
+    dim_customer = orders.groupby("customer_unique_id", sort=False).agg(
+        first_purchase_ts=("order_purchase_ts", "first"),
+        last_purchase_ts=("order_purchase_ts", "last"),
+        orders_cnt=("order_id", "size"),
+        lifetime_revenue=("revenue_order", "sum"),
+        paid_orders=("revenue_order", "count"),
+        first_state=("customer_state", "first"),
+    )
+    dim_customer = dim_customer.reset_index()
+    dim_customer["orders_cnt"] = dim_customer["orders_cnt"].astype(int)
+    # NULL like SQL's SUM when none of the customer's orders has a payment.
+    dim_customer["lifetime_revenue"] = (
+        dim_customer["lifetime_revenue"]
+        .where(dim_customer["paid_orders"] > 0)
+        .round(2)
+    )
+    dim_customer["cohort_month"] = dim_customer["first_purchase_ts"].dt.strftime(
+        "%Y-%m"
+    )
+    dim_customer["is_repeat_customer"] = (dim_customer["orders_cnt"] > 1).astype(int)
+
+    cols = [
+        "customer_unique_id",
+        "first_purchase_ts",
+        "last_purchase_ts",
+        "orders_cnt",
+        "lifetime_revenue",
+        "first_state",
+        "cohort_month",
+        "is_repeat_customer",
+    ]
+    return dim_customer[cols]
+
+
+def _month_index(ts: pd.Series) -> np.ndarray:
+    return (ts.dt.year * 12 + ts.dt.month - 1).to_numpy()
+
+
+def build_cohort_retention(
+    fact_orders: pd.DataFrame, dim_customer: pd.DataFrame
+) -> pd.DataFrame:
+    """Active customers and revenue per cohort month and month offset."""
+    cohorts = dim_customer.set_index("customer_unique_id")
+    orders = fact_orders.loc[
+        fact_orders["customer_unique_id"].notna()
+        & fact_orders["order_purchase_ts"].notna(),
+        ["customer_unique_id", "order_purchase_ts", "revenue_order"],
+    ]
+    first_ts = orders["customer_unique_id"].map(cohorts["first_purchase_ts"])
+
+    activity = pd.DataFrame(
+        {
+            "customer_unique_id": orders["customer_unique_id"].to_numpy(),
+            "cohort_month": first_ts.dt.strftime("%Y-%m").to_numpy(),
+            "activity_month": orders["order_purchase_ts"]
+            .dt.strftime("%Y-%m")
+            .to_numpy(),
+            "month_offset": _month_index(orders["order_purchase_ts"])
+            - _month_index(first_ts),
+            "revenue_order": orders["revenue_order"].to_numpy(),
+        }
+    )
+    retention = (
+        activity.groupby(["cohort_month", "month_offset", "activity_month"])
+        .agg(
+            active_customers=("customer_unique_id", "nunique"),
+            orders_cnt=("customer_unique_id", "size"),
+            revenue=("revenue_order", "sum"),
+        )
+        .reset_index()
+    )
+
+    cohort_size = dim_customer.groupby("cohort_month").size().rename("cohort_size")
+    retention = retention.merge(cohort_size, on="cohort_month", how="left")
+    retention["retention_rate"] = (
+        retention["active_customers"] / retention["cohort_size"]
+    ).round(4)
+    retention["revenue"] = retention["revenue"].round(2)
+
+    cols = [
+        "cohort_month",
+        "month_offset",
+        "activity_month",
+        "cohort_size",
+        "active_customers",
+        "retention_rate",
+        "orders_cnt",
+        "revenue",
+    ]
+    return retention[cols].astype({"month_offset": int})
+
+
+def run_checks(
+    dim_customer: pd.DataFrame,
+    cohort_retention: pd.DataFrame,
+    fact_orders: pd.DataFrame,
+) -> None:
+    assert dim_customer[
+        "customer_unique_id"
+    ].is_unique, "customer_unique_id is not unique in dim_customer"
+
+    expected_orders = int(fact_orders["customer_unique_id"].notna().sum())
+    assert (
+        int(dim_customer["orders_cnt"].sum()) == expected_orders
+    ), "dim_customer.orders_cnt does not add up to fact_orders"
+
+    first_month = cohort_retention[cohort_retention["month_offset"] == 0]
+    assert (
+        first_month["active_customers"] == first_month["cohort_size"]
+    ).all(), "month 0 of a cohort must contain every customer of the cohort"
+    assert (cohort_retention["month_offset"] >= 0).all(), "negative month_offset"
+
+    print("Customers:", len(dim_customer))
+    print(
+        "Repeat customer rate:",
+        round(float(dim_customer["is_repeat_customer"].mean()), 4),
+    )
+    print("\nLifetime revenue describe:")
+    print(dim_customer["lifetime_revenue"].describe())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--format",
+        default="csv",
+        choices=FORMATS,
+        help="Mart output format (default: csv)",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    MART_DIR.mkdir(parents=True, exist_ok=True)
+    with profile_run("build_dim_customer", args.profile):
+        with step("load_raw"):
+            raw = transform.load_raw()
+        with step("build_fact_orders", len(raw["orders"])) as s:
+            fact_orders = transform.build_fact_orders(raw)
+            s.rows_out(len(fact_orders))
+        with step("build_dim_customer", len(fact_orders)) as s:
+            dim_customer = build_dim_customer(fact_orders)
+            s.rows_out(len(dim_customer))
+        with step("build_cohort_retention", len(fact_orders)) as s:
+            cohort_retention = build_cohort_retention(fact_orders, dim_customer)
+            s.rows_out(len(cohort_retention))
+        with step("checks"):
+            run_checks(dim_customer, cohort_retention, fact_orders)
+
+        with step("write"):
+            for name, df in (
+                ("dim_customer", dim_customer),
+                ("cohort_retention", cohort_retention),
+            ):
+                out_path = write_mart(df, name, MART_DIR, args.format)
+                print(f"\nWrote {len(df)} rows -> {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,44 +4,96 @@ Build dim_date (1 row per date) from raw orders.
 
 Usage:
   python src/build_dim_date.py
+  python src/build_dim_date.py --format parquet
+  python src/build_dim_date.py --profile
 """
 
 from __future__ import annotations
 
+import argparse
 from pathlib import Path
 
 import pandas as pd
 
+from build_cache import BuildStage
+from mart_io import FORMATS, mart_path, write_mart
+from profiling import add_profile_argument, profile_run, step
+from raw_cache import read_raw
+
 
 RAW_DIR = Path("data/raw")
 MART_DIR = Path("data/mart")
 
 
-def main() -> None:
-    orders = pd.read_csv(RAW_DIR / "olist_orders_dataset.csv")
-    purchase_ts = pd.to_datetime(orders["order_purchase_timestamp"])
-    start_date = purchase_ts.min().normalize()
-    end_date = purchase_ts.max().normalize()
+def build_dim_date(orders: pd.DataFrame) -> pd.DataFrame:
+    with step("parse_timestamps", len(orders)):
+        purchase_ts = pd.to_datetime(orders["order_purchase_timestamp"])
+        start_date = purchase_ts.min().normalize()
+        end_date = purchase_ts.max().normalize()
 
     dates = pd.date_range(start=start_date, end=end_date, freq="D")
     dim_date = pd.DataFrame({"date_id": dates})
 
-    dim_date["year"] = dim_date["date_id"].dt.year
-    dim_date["quarter"] = dim_date["date_id"].dt.quarter
-    dim_date["month_num"] = dim_date["date_id"].dt.month
-    dim_date["month_name"] = dim_date["date_id"].dt.strftime("%B")
-    dim_date["year_month"] = dim_date["date_id"].dt.strftime("%Y-%m")
-    dim_date["week_of_year"] = dim_date["date_id"].dt.isocalendar().week.astype(int)
-    dim_date["day_of_week"] = dim_date["date_id"].dt.isocalendar().day.astype(int)
-    dim_date["day_name"] = dim_date["date_id"].dt.strftime("%A")
-    dim_date["is_weekend"] = dim_date["day_of_week"].isin([6, 7]).astype(int)
-    dim_date["is_month_start"] = dim_date["date_id"].dt.is_month_start.astype(int)
-    dim_date["is_month_end"] = dim_date["date_id"].dt.is_month_end.astype(int)
-
-    MART_DIR.mkdir(parents=True, exist_ok=True)
-    out_path = MART_DIR / "dim_date.csv"
-    dim_date.to_csv(out_path, index=False)
-    print(f"Wrote {len(dim_date)} rows -> {out_path}")
+    with step("date_attributes", len(dim_date)):
+        dim_date["year"] = dim_date["date_id"].dt.year
+        dim_date["quarter"] = dim_date["date_id"].dt.quarter
+        dim_date["month_num"] = dim_date["date_id"].dt.month
+        dim_date["month_name"] = dim_date["date_id"].dt.strftime("%B")
+        dim_date["year_month"] = dim_date["date_id"].dt.strftime("%Y-%m")
+        dim_date["week_of_year"] = dim_date["date_id"].dt.isocalendar().week.astype(int)
+        dim_date["day_of_week"] = dim_date["date_id"].dt.isocalendar().day.astype(int)
+        dim_date["day_name"] = dim_date["date_id"].dt.strftime("%A")
+        dim_date["is_weekend"] = dim_date["day_of_week"].isin([6, 7]).astype(int)
+        dim_date["is_month_start"] = dim_date["date_id"].dt.is_month_start.astype(int)
+        dim_date["is_month_end"] = dim_date["date_id"].dt.is_month_end.astype(int)
+
+    return dim_date
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--format",
+        default="csv",
+        choices=FORMATS,
+        help="Mart output format (default: csv)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if inputs and code are unchanged (see build_cache.py)",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    out_path = mart_path("dim_date", MART_DIR, args.format)
+    cache = BuildStage(
+        out_path.name,
+        [RAW_DIR / "olist_orders_dataset.csv"],
+        [out_path],
+        {"format": args.format},
+        MART_DIR,
+    )
+    with profile_run("build_dim_date", args.profile):
+        with step("fingerprint"):
+            fresh = cache.up_to_date(args.force)
+        if fresh:
+            print(cache.report())
+            return
+        with step("load_orders") as s:
+            orders = read_raw(
+                "olist_orders_dataset.csv", columns=["order_purchase_timestamp"]
+            )
+            s.rows_out(len(orders))
+        with step("build_dim_date", len(orders)) as s:
+            dim_date = build_dim_date(orders)
+            s.rows_out(len(dim_date))
+
+        with step("write", len(dim_date)):
+            out_path = write_mart(dim_date, "dim_date", MART_DIR, args.format)
+        print(f"Wrote {len(dim_date)} rows -> {out_path}")
+        cache.save()
+        print(cache.report())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Build kpi_cube: additive order KPIs pre-aggregated from fact_orders.
+
+Grain: period_grain (day / week / month) x period_start x customer_state x
+order_status. Every period grain also has customer_state = 'ALL' rows, and
+orders without a customer state are grouped under 'UNKNOWN'. Weeks are ISO
+weeks starting on Monday.
+
+Only additive measures are stored (sums, counts and numerator/denominator
+pairs), so any slice can be re-aggregated with SUM before dividing:
+
+  Revenue        = SUM(revenue_sum)
+  Orders         = SUM(orders_cnt)
+  AOV            = SUM(revenue_sum) / SUM(revenue_orders_cnt)
+  Cancel Rate    = SUM(canceled_cnt) / SUM(orders_cnt)
+  On-Time Rate   = SUM(on_time_cnt) / SUM(on_time_den)
+  Delivery Days  = SUM(delivered_days_sum) / SUM(delivered_days_cnt)
+
+Usage:
+  python src/build_kpi_cube.py
+  python src/build_kpi_cube.py --format parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+import transform
+from mart_io import FORMATS, write_mart
+from profiling import add_profile_argument, profile_run, step
+
+
+MART_DIR = Path("data/mart")
+
+ALL_STATES = "ALL"
+UNKNOWN_STATE = "UNKNOWN"
+PERIOD_GRAINS = ("day", "week", "month")
+
+KEY_COLUMNS = ["period_grain", "period_start", "customer_state", "order_status"]
+
+# measure -> (fact_orders column, aggregation); all of them add up.
+MEASURES: Dict[str, Tuple[str, str]] = {
+    "orders_cnt": ("orders_cnt", "sum"),
+    "revenue_sum": ("revenue_order", "sum"),
+    "revenue_orders_cnt": ("revenue_order", "count"),
+    "items_cnt": ("items_cnt", "sum"),
+    "canceled_cnt": ("is_canceled", "sum"),
+    "on_time_cnt": ("on_time_flag", "sum"),
+    "on_time_den": ("on_time_flag", "count"),
+    "delivered_days_sum": ("delivered_days", "sum"),
+    "delivered_days_cnt": ("delivered_days", "count"),
+    "estimated_gap_days_sum": ("estimated_gap_days", "sum"),
+    "estimated_gap_days_cnt": ("estimated_gap_days", "count"),
+    "new_customers_cnt": ("is_new_customer", "sum"),
+}
+
+
+def period_start(purchase_ts: pd.Series, grain: str) -> pd.Series:
+    day = purchase_ts.dt.normalize()
+    if grain == "day":
+        return day
+    if grain == "week":
+        return day - pd.to_timedelta(day.dt.weekday, unit="D")
+    if grain == "month":
+        return day - pd.to_timedelta(day.dt.day - 1, unit="D")
+    raise ValueError(f"Unknown period grain: {grain}")
+
+
+def build_kpi_cube(fact_orders: pd.DataFrame) -> pd.DataFrame:
+    orders = fact_orders[fact_orders["order_purchase_ts"].notna()]
+    keys = pd.DataFrame(
+        {
+            "day": orders["order_purchase_ts"].dt.normalize(),
+            "customer_state": orders["customer_state"]
+            .astype(object)
+            .fillna(UNKNOWN_STATE),
+            "order_status": orders["order_status"].astype(object),
+        }
+    )
+
+    # One pass over the orders at the finest grain; coarser levels are sums
+    # of these rows.
+    sources = list(dict.fromkeys(col for col, _ in MEASURES.values()))
+    daily = (
+        pd.concat([keys, orders[sources]], axis=1)
+        .groupby(["day", "customer_state", "order_status"], dropna=False)
+        .agg(**{name: spec for name, spec in MEASURES.items()})
+        .reset_index()
+    )
+
+    levels: List[pd.DataFrame] = []
+    measure_cols = list(MEASURES)
+    for grain in PERIOD_GRAINS:
+        periods = daily.assign(period_start=period_start(daily["day"], grain))
+        by_state = (
+            periods.groupby(["period_start", "customer_state", "order_status"])[
+                measure_cols
+            ]
+            .sum()
+            .reset_index()
+        )
+        all_states = (
+            periods.groupby(["period_start", "order_status"])[measure_cols]
+            .sum()
+            .reset_index()
+            .assign(customer_state=ALL_STATES)
+        )
+        levels.append(
+            pd.concat([by_state, all_states], ignore_index=True).assign(
+                period_grain=grain
+            )
+        )
+
+    cube = pd.concat(levels, ignore_index=True)
+    cube["period_start"] = cube["period_start"].dt.date
+    cube["revenue_sum"] = cube["revenue_sum"].round(2)
+    for col in measure_cols:
+        if col != "revenue_sum":
+            cube[col] = cube[col].astype("int64")
+
+    cube["grain_order"] = cube["period_grain"].map(
+        {grain: i for i, grain in enumerate(PERIOD_GRAINS)}
+    )
+    cube = cube.sort_values(
+        ["grain_order", "period_start", "customer_state", "order_status"],
+        ignore_index=True,
+    )
+    return cube[KEY_COLUMNS + measure_cols]
+
+
+def run_checks(kpi_cube: pd.DataFrame, fact_orders: pd.DataFrame) -> None:
+    assert not kpi_cube.duplicated(KEY_COLUMNS).any(), "duplicate kpi_cube keys"
+
+    # Every grain, with and without the state split, must cover every order.
+    expected = int(fact_orders["order_purchase_ts"].notna().sum())
+    is_all = kpi_cube["customer_state"] == ALL_STATES
+    totals = kpi_cube.groupby(["period_grain", is_all])["orders_cnt"].sum()
+    bad = totals[totals != expected]
+    assert bad.empty, f"kpi_cube order totals differ from fact_orders:\n{bad}"
+
+    print("KPI cube rows per grain:")
+    print(kpi_cube.groupby("period_grain", sort=False).size())
+
+    monthly = kpi_cube[(kpi_cube["period_grain"] == "month") & is_all]
+    revenue = round(float(monthly["revenue_sum"].sum()), 2)
+    print("\nMonthly revenue (all states):", revenue)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--format",
+        default="csv",
+        choices=FORMATS,
+        help="Mart output format (default: csv)",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    MART_DIR.mkdir(parents=True, exist_ok=True)
+    with profile_run("build_kpi_cube", args.profile):
+        with step("load_raw"):
+            raw = transform.load_raw()
+        with step("build_fact_orders", len(raw["orders"])) as s:
+            fact_orders = transform.build_fact_orders(raw)
+            s.rows_out(len(fact_orders))
+        with step("build_kpi_cube", len(fact_orders)) as s:
+            kpi_cube = build_kpi_cube(fact_orders)
+            s.rows_out(len(kpi_cube))
+        with step("checks"):
+            run_checks(kpi_cube, fact_orders)
+
+        with step("write", len(kpi_cube)):
+            out_path = write_mart(kpi_cube, "kpi_cube", MART_DIR, args.format)
+        print(f"\nWrote {len(kpi_cube)} rows -> {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Build fact_seller_daily: seller performance pre-aggregated by purchase day.
+
+Grain: seller_id x order_date (purchase day of the order). Items without a
+purchase timestamp are left out. All measures are additive, so leaderboards
+over any date range are sums over this table instead of scans of
+fact_order_items:
+
+  GMV            = SUM(gmv_sum)
+  Items          = SUM(items_cnt)
+  Orders         = SUM(orders_cnt)       (orders with at least one item of the seller)
+  Freight Share  = SUM(freight_sum) / SUM(gmv_sum)
+  Late Rate      = SUM(late_orders_cnt) / SUM(late_orders_den)
+
+Order-level measures (orders, late deliveries) count each seller/order pair
+once. An order is late when it was delivered after its estimated date, as
+fact_orders.on_time_flag = 0.
+
+--incremental keeps the rows before the last order_date of the existing mart
+and rebuilds from that day on (the last day may have been partial). Changes to
+older days (backfills, status updates) need a full build.
+
+Usage:
+  python src/build_seller_daily.py
+  python src/build_seller_daily.py --incremental
+  python src/build_seller_daily.py --format parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from build_cache import BuildStage
+from mart_io import FORMATS, PARTITION_COLUMN, mart_path, read_mart, write_mart
+from profiling import add_profile_argument, profile_run, step
+from raw_cache import read_raw
+from validation import ValidationResult, validate
+
+
+RAW_DIR = Path("data/raw")
+MART_DIR = Path("data/mart")
+
+RAW_FILES = [
+    "olist_orders_dataset.csv",
+    "olist_order_items_dataset.csv",
+    "olist_sellers_dataset.csv",
+]
+
+KEY_COLUMNS = ["seller_id", "order_date"]
+MEASURES = [
+    "items_cnt",
+    "orders_cnt",
+    "price_sum",
+    "freight_sum",
+    "gmv_sum",
+    "late_orders_cnt",
+    "late_orders_den",
+]
+MONEY_COLUMNS = ["price_sum", "freight_sum", "gmv_sum"]
+
+
+def load_raw(raw_dir: Path = RAW_DIR) -> dict:
+    return {
+        "orders": read_raw(
+            "olist_orders_dataset.csv",
+            columns=[
+                "order_id",
+                "order_purchase_timestamp",
+                "order_delivered_customer_date",
+                "order_estimated_delivery_date",
+            ],
+            raw_dir=raw_dir,
+        ),
+        "items": read_raw(
+            "olist_order_items_dataset.csv",
+            columns=["order_id", "seller_id", "price", "freight_value"],
+            raw_dir=raw_dir,
+        ),
+        "sellers": read_raw(
+            "olist_sellers_dataset.csv",
+            columns=["seller_id", "seller_state"],
+            raw_dir=raw_dir,
+        ),
+    }
+
+
+def build_fact_seller_daily(
+    raw: dict, since: Optional[pd.Timestamp] = None
+) -> pd.DataFrame:
+    """All days, or only order_date >= since."""
+    orders = raw["orders"][
+        [
+            "order_id",
+            "order_purchase_timestamp",
+            "order_delivered_customer_date",
+            "order_estimated_delivery_date",
+        ]
+    ]
+    items = raw["items"][["order_id", "seller_id", "price", "freight_value"]]
+
+    with step("merge_orders", len(items), join=True) as s:
+        df = items.merge(orders, on="order_id", how="left")
+        s.rows_out(len(df))
+
+    with step("filter_days", len(df)) as s:
+        day = pd.to_datetime(df["order_purchase_timestamp"]).dt.normalize()
+        keep = day.notna() if since is None else day >= since
+        df = df[keep.to_numpy()]
+        day = day[keep]
+        s.rows_out(len(df))
+
+    with step("aggregate", len(df)) as s:
+        delivered = pd.to_datetime(df["order_delivered_customer_date"])
+        estimated = pd.to_datetime(df["order_estimated_delivery_date"])
+        # Order-level measures count each seller/order pair once.
+        first = ~df.duplicated(["seller_id", "order_id"]).to_numpy()
+        rated = first & (delivered.notna() & estimated.notna()).to_numpy()
+        late = rated & (delivered > estimated).to_numpy()
+
+        price = df["price"].to_numpy(dtype="float64", na_value=np.nan)
+        freight = df["freight_value"].to_numpy(dtype="float64", na_value=np.nan)
+        # One grouped pass over the items; every measure is a sum.
+        daily = (
+            pd.DataFrame(
+                {
+                    "seller_id": df["seller_id"].to_numpy(),
+                    "order_date": day.to_numpy(),
+                    "items_cnt": 1,
+                    "orders_cnt": first.astype("int64"),
+                    "price_sum": price,
+                    "freight_sum": freight,
+                    "gmv_sum": price + freight,
+                    "late_orders_cnt": late.astype("int64"),
+                    "late_orders_den": rated.astype("int64"),
+                }
+            )
+            .groupby(KEY_COLUMNS, sort=False)[MEASURES]
+            .sum()
+            .reset_index()
+        )
+        s.rows_out(len(daily))
+
+    with step("merge_sellers", len(daily), join=True) as s:
+        sellers = raw["sellers"][["seller_id", "seller_state"]].astype(object)
+        daily["seller_id"] = daily["seller_id"].astype(object)
+        daily = daily.merge(sellers, on="seller_id", how="left")
+        s.rows_out(len(daily))
+
+    for col in MONEY_COLUMNS:
+        daily[col] = daily[col].round(2)
+    daily = daily.sort_values(["order_date", "seller_id"], ignore_index=True)
+    daily["order_date"] = daily["order_date"].dt.date
+    return daily[KEY_COLUMNS + ["seller_state"] + MEASURES]
+
+
+def read_fact_seller_daily(mart_dir: Path, fmt: str = "csv") -> pd.DataFrame:
+    """Read the mart back with the dtypes build_fact_seller_daily produces."""
+    if fmt != "csv":
+        df = read_mart("fact_seller_daily", mart_dir, fmt).drop(
+            columns=[PARTITION_COLUMN]
+        )
+    else:
+        df = pd.read_csv(
+            mart_path("fact_seller_daily", mart_dir, fmt),
+            float_precision="round_trip",
+        )
+    df["order_date"] = pd.to_datetime(df["order_date"]).dt.date
+    return df
+
+
+def build_incremental(raw: dict, mart_dir: Path, fmt: str = "csv") -> pd.DataFrame:
+    """Existing rows before the last built day + a rebuild from that day on."""
+    if not mart_path("fact_seller_daily", mart_dir, fmt).exists():
+        print("No existing fact_seller_daily; full build.")
+        return build_fact_seller_daily(raw)
+
+    existing = read_fact_seller_daily(mart_dir, fmt)
+    if existing.empty:
+        return build_fact_seller_daily(raw)
+    since = existing["order_date"].max()
+    delta = build_fact_seller_daily(raw, since=pd.Timestamp(since))
+    kept = existing[existing["order_date"] < since]
+    print(
+        f"Incremental: kept {len(kept)} rows before {since}, "
+        f"rebuilt {len(delta)} rows from {since}"
+    )
+    return pd.concat([kept, delta], ignore_index=True)
+
+
+def run_checks(fact_seller_daily: pd.DataFrame, raw: dict) -> ValidationResult:
+    result = validate("fact_seller_daily", fact_seller_daily)
+    print(result.summary())
+    result.raise_for_failures()
+
+    # Every item with a purchase day is counted exactly once.
+    purchase = raw["orders"].set_index("order_id")["order_purchase_timestamp"]
+    expected = int(raw["items"]["order_id"].map(purchase).notna().sum())
+    items = int(fact_seller_daily["items_cnt"].sum())
+    if items != expected:
+        raise ValueError(
+            f"fact_seller_daily counts {items} items, the raw drop has {expected} "
+            "with a purchase day (run a full build after backfills)"
+        )
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Rebuild only from the last built order_date on",
+    )
+    parser.add_argument(
+        "--format",
+        default="csv",
+        choices=FORMATS,
+        help="Mart output format (default: csv)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if inputs and code are unchanged (see build_cache.py)",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    MART_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = mart_path("fact_seller_daily", MART_DIR, args.format)
+    cache = None
+    if not args.incremental:
+        cache = BuildStage(
+            out_path.name,
+            [RAW_DIR / name for name in RAW_FILES],
+            [out_path],
+            {"format": args.format},
+            MART_DIR,
+        )
+    with profile_run("build_seller_daily", args.profile):
+        if cache is not None:
+            with step("fingerprint"):
+                fresh = cache.up_to_date(args.force)
+            if fresh:
+                print(cache.report())
+                return
+        with step("load_raw") as s:
+            raw = load_raw()
+            s.rows_out(len(raw["items"]))
+        with step("build_fact_seller_daily", len(raw["items"])) as s:
+            if args.incremental:
+                fact_seller_daily = build_incremental(raw, MART_DIR, args.format)
+            else:
+                fact_seller_daily = build_fact_seller_daily(raw)
+            s.rows_out(len(fact_seller_daily))
+        with step("checks", len(fact_seller_daily)):
+            run_checks(fact_seller_daily, raw)
+
+        with step("write", len(fact_seller_daily)):
+            out_path = write_mart(
+                fact_seller_daily, "fact_seller_daily", MART_DIR, args.format
+            )
+        print(f"\nWrote {len(fact_seller_daily)} rows -> {out_path}")
+        if cache is not None:
+            cache.save()
+            print(cache.report())
+
+
+if __name__ == "__main__":
+    main()
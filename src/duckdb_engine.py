@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Run the SQL transforms in process with DuckDB, straight over data/raw.
+
+The same files run_sql.py sends to Postgres (sql/ddl, sql/transform and
+optionally sql/checks) run here against an in-process DuckDB database:
+- raw_* are views over the CSVs in data/raw (read_csv with the column types
+  of sql/ddl/01_raw_tables.sql), so there is no loading step; a missing
+  geolocation or reviews file gives an empty raw_geolocation / raw_reviews,
+- statements go through translate() for the few Postgres constructs DuckDB
+  spells differently (TO_CHAR, compound interval literals, the scalar alias
+  of generate_series),
+- files are scheduled by run_sql.run_sql (same dependency inference, checks
+  and report), through DuckDBEngine, which offers the begin() /
+  exec_driver_sql() surface run_sql uses on a SQLAlchemy engine,
+- every table the transforms write is exported to data/mart with
+  mart_io.write_mart, ordered by all columns so reruns are reproducible.
+
+fact_orders and kpi_cube match the pandas builders column for column: the
+day differences are floored on both sides (FLOOR(EXTRACT(EPOCH ...) / 86400)
+in SQL, Timedelta.days in pandas).
+
+The incremental and partitioned variants are Postgres-only (ON CONFLICT
+upserts into a state table, BRIN indexes) and are not supported here.
+
+Usage:
+  python src/duckdb_engine.py
+  python src/duckdb_engine.py --format parquet
+  python src/duckdb_engine.py --checks --report data/duckdb_checks_report.md
+  python src/duckdb_engine.py --database data/olist.duckdb   # keep the tables
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import duckdb
+
+from mart_io import FORMATS, write_mart
+from profiling import add_profile_argument, profile_run, step
+from run_sql import (
+    SQL_DIR,
+    CheckFailed,
+    SqlFile,
+    discover,
+    format_report,
+    run_sql,
+    split_statements,
+)
+from schema import RAW_TABLE_FILES, TIMESTAMP_FORMAT
+
+
+RAW_DIR = Path("data/raw")
+# Raw files a drop may lack; the transforms then read them as empty tables,
+# like the empty raw_* tables 01_raw_tables.sql leaves in Postgres.
+OPTIONAL_RAW_TABLES = ("raw_geolocation", "raw_reviews")
+MART_DIR = Path("data/mart")
+
+# Postgres TO_CHAR patterns used by the transforms -> strftime.
+_TO_CHAR_PATTERNS = [
+    ("FMMonth", "%B"),
+    ("FMDay", "%A"),
+    ("YYYY", "%Y"),
+    ("HH24", "%H"),
+    ("MM", "%m"),
+    ("DD", "%d"),
+    ("MI", "%M"),
+    ("SS", "%S"),
+]
+
+_TO_CHAR = re.compile(r"\bTO_CHAR\s*\(", re.IGNORECASE)
+_GENERATE_SERIES = re.compile(r"\bgenerate_series\s*\(", re.IGNORECASE)
+_SCALAR_ALIAS = re.compile(r"\s+AS\s+(\w+)\b(?!\s*\()", re.IGNORECASE)
+_COMPOUND_INTERVAL = re.compile(
+    r"\bINTERVAL\s+'([^'-]+?)\s+-\s+([^']+?)'", re.IGNORECASE
+)
+_RETURNS_ROWS = re.compile(
+    r"^\s*(?:SELECT|WITH|VALUES|SHOW|DESCRIBE)\b", re.IGNORECASE
+)
+
+
+def _closing_paren(sql: str, open_pos: int) -> int:
+    depth = 0
+    quoted = False
+    for pos in range(open_pos, len(sql)):
+        char = sql[pos]
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+            if depth == 0:
+                return pos
+    raise ValueError(f"Unbalanced parentheses in: {sql[open_pos:open_pos + 60]}")
+
+
+def _strftime_format(pattern: str) -> str:
+    for postgres, strftime in _TO_CHAR_PATTERNS:
+        pattern = pattern.replace(postgres, strftime)
+    return pattern
+
+
+def _rewrite_to_char(sql: str) -> str:
+    # TO_CHAR(expr, 'pattern') -> strftime(expr, 'format'); the pattern is
+    # always the last argument.
+    match = _TO_CHAR.search(sql)
+    while match:
+        close = _closing_paren(sql, match.end() - 1)
+        args = sql[match.end() : close]
+        expr, _, pattern = args.rpartition(",")
+        pattern = pattern.strip()
+        if not (pattern.startswith("'") and pattern.endswith("'")):
+            raise ValueError(f"Unsupported TO_CHAR pattern: {pattern}")
+        call = f"strftime({expr}, '{_strftime_format(pattern[1:-1])}')"
+        sql = sql[: match.start()] + call + sql[close + 1 :]
+        match = _TO_CHAR.search(sql, match.start() + len(call))
+    return sql
+
+
+def _rewrite_generate_series(sql: str) -> str:
+    # Postgres lets "generate_series(...) AS d" name the column too; DuckDB
+    # needs "AS d(d)".
+    match = _GENERATE_SERIES.search(sql)
+    while match:
+        close = _closing_paren(sql, match.end() - 1)
+        alias = _SCALAR_ALIAS.match(sql, close + 1)
+        if alias:
+            name = alias.group(1)
+            sql = sql[: alias.start()] + f" AS {name}({name})" + sql[alias.end() :]
+        match = _GENERATE_SERIES.search(sql, close)
+    return sql
+
+
+def translate(sql: str) -> str:
+    """Postgres SQL of this repo -> DuckDB SQL."""
+    sql = _COMPOUND_INTERVAL.sub(r"(INTERVAL '\1' - INTERVAL '\2')", sql)
+    sql = _rewrite_to_char(sql)
+    return _rewrite_generate_series(sql)
+
+
+class _Result:
+    def __init__(self, cursor, returns_rows: bool) -> None:
+        self._cursor = cursor
+        self.returns_rows = returns_rows
+
+    def keys(self) -> List[str]:
+        return [column[0] for column in self._cursor.description]
+
+    def fetchall(self) -> List[tuple]:
+        return self._cursor.fetchall()
+
+    def scalar(self):
+        row = self._cursor.fetchone()
+        return row[0] if row else None
+
+
+class _Connection:
+    def __init__(self, cursor) -> None:
+        self._cursor = cursor
+
+    def exec_driver_sql(self, sql: str) -> _Result:
+        self._cursor.execute(translate(sql))
+        return _Result(
+            self._cursor,
+            self._cursor.description is not None and bool(_RETURNS_ROWS.match(sql)),
+        )
+
+
+class DuckDBEngine:
+    """The part of a SQLAlchemy engine run_sql uses, over one DuckDB database."""
+
+    def __init__(self, database: str = ":memory:") -> None:
+        self.con = duckdb.connect(database)
+
+    @contextmanager
+    def begin(self) -> Iterator[_Connection]:
+        # One cursor per transaction, so concurrent files do not share state.
+        cursor = self.con.cursor()
+        cursor.execute("BEGIN TRANSACTION")
+        try:
+            yield _Connection(cursor)
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        else:
+            cursor.execute("COMMIT")
+        finally:
+            cursor.close()
+
+
+def raw_column_types(
+    ddl_path: Path = SQL_DIR / "ddl" / "01_raw_tables.sql",
+) -> Dict[str, Dict[str, str]]:
+    """Raw table -> column -> DuckDB type, as the DDL declares them."""
+    scratch = duckdb.connect()
+    for _, statement in split_statements(ddl_path.read_text(encoding="utf-8")):
+        scratch.execute(translate(statement))
+    types: Dict[str, Dict[str, str]] = {}
+    for table in RAW_TABLE_FILES:
+        rows = scratch.execute(f"DESCRIBE {table}").fetchall()
+        types[table] = {row[0]: row[1] for row in rows}
+    scratch.close()
+    return types
+
+
+def create_raw_views(engine: DuckDBEngine, raw_dir: Path = RAW_DIR) -> List[str]:
+    """raw_* views over the CSV files present in raw_dir (empty when optional)."""
+    created = []
+    for table, columns in raw_column_types().items():
+        path = raw_dir / RAW_TABLE_FILES[table]
+        if not path.exists():
+            if table in OPTIONAL_RAW_TABLES:
+                select = ", ".join(
+                    f"CAST(NULL AS {kind}) AS {name}" for name, kind in columns.items()
+                )
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(
+                        f"CREATE OR REPLACE VIEW {table} AS SELECT {select} WHERE FALSE"
+                    )
+            continue
+        types = ", ".join(f"'{name}': '{kind}'" for name, kind in columns.items())
+        select = ", ".join(columns)
+        literal = path.resolve().as_posix().replace("'", "''")
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                f"CREATE OR REPLACE VIEW {table} AS SELECT {select} "
+                f"FROM read_csv('{literal}', header = true, "
+                f"timestampformat = '{TIMESTAMP_FORMAT}', types = {{{types}}})"
+            )
+        created.append(table)
+    return created
+
+
+def select_files(checks: bool) -> List[SqlFile]:
+    """Transforms, the DDL of the tables they write and optionally the checks."""
+    files = discover(["ddl", "transform", "checks"] if checks else ["ddl", "transform"])
+    marts = set().union(*(f.writes for f in files if f.stage == "transform"))
+    # raw_* are views here and the ETL state tables belong to the
+    # incremental (Postgres) variant.
+    return [f for f in files if f.stage != "ddl" or f.creates & marts]
+
+
+def export_marts(
+    engine: DuckDBEngine,
+    files: List[SqlFile],
+    mart_dir: Path = MART_DIR,
+    fmt: str = "csv",
+) -> Dict[str, Tuple[int, Path]]:
+    written: Dict[str, Tuple[int, Path]] = {}
+    for sql_file in files:
+        if sql_file.stage != "transform":
+            continue
+        for table in sorted(sql_file.writes):
+            with step(f"export_{table}") as s:
+                df = engine.con.cursor().execute(
+                    f"SELECT * FROM {table} ORDER BY ALL"
+                ).df()
+                path = write_mart(df, table, mart_dir, fmt)
+                s.rows_out(len(df))
+            written[table] = (len(df), path)
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    parser.add_argument("--mart-dir", type=Path, default=MART_DIR)
+    parser.add_argument(
+        "--format",
+        default="csv",
+        choices=FORMATS,
+        help="Mart output format (default: csv)",
+    )
+    parser.add_argument(
+        "--database",
+        default=":memory:",
+        help="DuckDB file to keep the tables in (default: in memory)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Independent SQL files run concurrently (default: 4)",
+    )
+    parser.add_argument(
+        "--checks", action="store_true", help="Also run sql/checks/*.sql"
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=None,
+        help="Write the checks report here (default: print it)",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    if args.jobs < 1:
+        raise SystemExit("--jobs must be >= 1.")
+
+    start = time.perf_counter()
+    with profile_run("duckdb_engine", args.profile):
+        engine = DuckDBEngine(args.database)
+        with step("create_raw_views"):
+            views = create_raw_views(engine, args.raw_dir)
+        print(f"raw views over {args.raw_dir}: {', '.join(views)}")
+
+        files = select_files(args.checks)
+        # Rebuilds into a kept --database start from empty tables.
+        results, timings, error = run_sql(engine, files, jobs=args.jobs, truncate=True)
+
+        written = {}
+        if error is None:
+            args.mart_dir.mkdir(parents=True, exist_ok=True)
+            written = export_marts(engine, files, args.mart_dir, args.format)
+    total = time.perf_counter() - start
+
+    print("\nSQL timings:")
+    for sql_file in files:
+        if sql_file.name in timings:
+            print(f"  {sql_file.name:<44} {timings[sql_file.name]:8.2f}s")
+    for n, path in written.values():
+        print(f"Wrote {n} rows -> {path}")
+    print(f"Total {total:.2f}s")
+
+    if args.checks:
+        report = format_report(files, results)
+        if args.report:
+            args.report.parent.mkdir(parents=True, exist_ok=True)
+            args.report.write_text(report, encoding="utf-8")
+            print(f"\nWrote {args.report}")
+        else:
+            print("\n" + report)
+
+    if error is not None:
+        kind = "Check failed" if isinstance(error, CheckFailed) else "SQL failed"
+        raise SystemExit(f"{kind}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+"""
+Generate referentially consistent synthetic Olist raw files at any scale.
+
+Scale factor 1 matches the size of the public Olist drop (~99k orders,
+~113k items). Distributions follow the real data: heavily skewed product and
+seller popularity, SP/RJ/MG-dominated geography, ~3% repeat customers, a
+Black Friday spike on top of a growth trend, and the observed order status,
+items-per-order and payment-split mixes. Orders are generated and appended in
+chunks, and every id is derived from its row index, so memory stays bounded
+and items/payments/customers/reviews always reference rows that exist.
+
+Payments of an order split its total (one Dirichlet draw per order). Reviews
+score late deliveries lower. The geolocation file has points around every zip
+prefix used by a customer or seller, plus a few geocoding errors outside
+Brazil, as in the real file.
+
+Usage:
+  python src/generate_synthetic.py --scale 1
+  python src/generate_synthetic.py --scale 10 --out data/synthetic/sf10 --seed 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import binascii
+import shutil
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+RAW_DIR = Path("data/raw")
+SYNTHETIC_DIR = Path("data/synthetic")
+
+BASE_ORDERS = 99_441
+BASE_PRODUCTS = 32_951
+BASE_SELLERS = 3_095
+UNIQUE_CUSTOMER_RATIO = 0.966
+CHUNK_ORDERS = 250_000
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+START_DATE = pd.Timestamp("2016-09-04")
+END_DATE = pd.Timestamp("2018-10-17")
+BLACK_FRIDAY = pd.Timestamp("2017-11-24")
+
+ORDER_STATUS: Dict[str, float] = {
+    "delivered": 0.9702,
+    "shipped": 0.0111,
+    "canceled": 0.0063,
+    "unavailable": 0.0061,
+    "invoiced": 0.0032,
+    "processing": 0.0030,
+    "created": 0.00005,
+    "approved": 0.00002,
+}
+
+ITEMS_PER_ORDER: Dict[int, float] = {
+    0: 0.0078,
+    1: 0.8930,
+    2: 0.0770,
+    3: 0.0130,
+    4: 0.0050,
+    5: 0.0020,
+    6: 0.0022,
+}
+
+PAYMENTS_PER_ORDER: Dict[int, float] = {0: 0.00001, 1: 0.9700, 2: 0.0200, 3: 0.0100}
+
+REVIEWS_PER_ORDER: Dict[int, float] = {0: 0.0077, 1: 0.9865, 2: 0.0058}
+
+# review_score mix of on-time vs late or undelivered orders.
+REVIEW_SCORES: Dict[int, float] = {5: 0.61, 4: 0.20, 3: 0.08, 2: 0.03, 1: 0.08}
+LATE_REVIEW_SCORES: Dict[int, float] = {5: 0.19, 4: 0.09, 3: 0.12, 2: 0.09, 1: 0.51}
+
+REVIEW_MESSAGES = [
+    "recebi bem antes do prazo",
+    "produto otimo, recomendo",
+    "chegou tudo certo",
+    "ainda nao recebi o produto",
+    "veio faltando um item",
+    "qualidade abaixo do esperado",
+]
+
+# Geolocation points per zip prefix (Poisson mean) and share of bad geocodes.
+GEO_POINTS_PER_ZIP = 25
+GEO_OUTLIER_RATE = 0.0005
+
+PAYMENT_TYPES: Dict[str, float] = {
+    "credit_card": 0.739,
+    "boleto": 0.190,
+    "voucher": 0.056,
+    "debit_card": 0.015,
+}
+
+# state -> (share of customers, zip prefix range, cities)
+STATES: Dict[str, Tuple[float, Tuple[int, int], List[str]]] = {
+    "SP": (0.420, (1000, 19999), ["sao paulo", "campinas", "guarulhos", "santos"]),
+    "RJ": (0.130, (20000, 28999), ["rio de janeiro", "niteroi", "nova iguacu"]),
+    "MG": (0.117, (30000, 39999), ["belo horizonte", "uberlandia", "contagem"]),
+    "RS": (0.055, (90000, 99999), ["porto alegre", "caxias do sul"]),
+    "PR": (0.051, (80000, 87999), ["curitiba", "londrina", "maringa"]),
+    "SC": (0.037, (88000, 89999), ["florianopolis", "joinville"]),
+    "BA": (0.034, (40000, 48999), ["salvador", "feira de santana"]),
+    "DF": (0.021, (70000, 72799), ["brasilia"]),
+    "ES": (0.020, (29000, 29999), ["vitoria", "vila velha"]),
+    "GO": (0.020, (72800, 76799), ["goiania", "anapolis"]),
+    "PE": (0.017, (50000, 56999), ["recife", "jaboatao dos guararapes"]),
+    "CE": (0.013, (60000, 63999), ["fortaleza"]),
+    "PA": (0.010, (66000, 68899), ["belem"]),
+    "MT": (0.009, (78000, 78899), ["cuiaba"]),
+    "MA": (0.0075, (65000, 65999), ["sao luis"]),
+    "MS": (0.0072, (79000, 79999), ["campo grande"]),
+    "PB": (0.0054, (58000, 58999), ["joao pessoa"]),
+    "PI": (0.0050, (64000, 64999), ["teresina"]),
+    "RN": (0.0049, (59000, 59999), ["natal"]),
+    "AL": (0.0041, (57000, 57999), ["maceio"]),
+    "SE": (0.0034, (49000, 49999), ["aracaju"]),
+    "TO": (0.0028, (77000, 77999), ["palmas"]),
+    "RO": (0.0025, (76800, 76999), ["porto velho"]),
+    "AM": (0.0015, (69000, 69299), ["manaus"]),
+    "AC": (0.0008, (69900, 69999), ["rio branco"]),
+    "AP": (0.0007, (68900, 68999), ["macapa"]),
+    "RR": (0.0005, (69300, 69399), ["boa vista"]),
+}
+
+# state -> approximate (lat, lng) of its populated area.
+STATE_CENTROIDS: Dict[str, Tuple[float, float]] = {
+    "SP": (-23.2, -47.3),
+    "RJ": (-22.6, -43.2),
+    "MG": (-19.5, -44.5),
+    "RS": (-29.9, -51.8),
+    "PR": (-24.6, -51.2),
+    "SC": (-27.2, -49.9),
+    "BA": (-12.9, -39.5),
+    "DF": (-15.8, -47.9),
+    "ES": (-20.0, -40.6),
+    "GO": (-16.4, -49.5),
+    "PE": (-8.2, -35.9),
+    "CE": (-4.4, -39.0),
+    "PA": (-2.3, -48.6),
+    "MT": (-15.3, -55.9),
+    "MA": (-3.9, -44.7),
+    "MS": (-20.8, -54.6),
+    "PB": (-7.2, -35.9),
+    "PI": (-5.6, -42.5),
+    "RN": (-5.8, -36.2),
+    "AL": (-9.6, -36.0),
+    "SE": (-10.8, -37.2),
+    "TO": (-10.2, -48.4),
+    "RO": (-10.2, -63.0),
+    "AM": (-3.4, -60.3),
+    "AC": (-9.8, -68.2),
+    "AP": (0.3, -51.3),
+    "RR": (2.6, -60.8),
+}
+
+FALLBACK_CATEGORIES = [
+    "cama_mesa_banho",
+    "beleza_saude",
+    "esporte_lazer",
+    "moveis_decoracao",
+    "informatica_acessorios",
+    "utilidades_domesticas",
+    "relogios_presentes",
+    "telefonia",
+    "ferramentas_jardim",
+    "automotivo",
+]
+
+# Salts keep ids of different entities apart even for equal row indexes.
+_SALTS = {
+    "order": 0x5EED0001,
+    "customer": 0x5EED0002,
+    "customer_unique": 0x5EED0003,
+    "product": 0x5EED0004,
+    "seller": 0x5EED0005,
+    "review": 0x5EED0006,
+}
+
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    x = x.astype(np.uint64)
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def hex_ids(index: np.ndarray, entity: str, seed: int) -> np.ndarray:
+    """32-char hex ids (md5-like) derived deterministically from row indexes."""
+    # Scramble the salt so index ^ salt never collides across entities.
+    salt = _splitmix64(np.array([_SALTS[entity] ^ (seed << 32)]))[0]
+    index = np.asarray(index, dtype=np.uint64)
+    halves = np.empty((len(index), 2), dtype=">u8")
+    halves[:, 0] = _splitmix64(index ^ salt)
+    halves[:, 1] = _splitmix64(index ^ ~salt)
+    hexed = binascii.hexlify(halves.tobytes())
+    return np.frombuffer(hexed, dtype="S32").astype("U32")
+
+
+def _choice(rng: np.random.Generator, table: Dict, size: int) -> np.ndarray:
+    keys = list(table)
+    probs = np.array([table[k] for k in keys], dtype=float)
+    return np.array(keys)[rng.choice(len(keys), size=size, p=probs / probs.sum())]
+
+
+def zipf_weights(n: int, exponent: float, rng: np.random.Generator) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def daily_weights() -> Tuple[pd.DatetimeIndex, np.ndarray]:
+    days = pd.date_range(START_DATE, END_DATE, freq="D")
+    t = np.linspace(0.0, 1.0, len(days))
+    weights = 0.2 + 1.8 * t
+    weights[days < pd.Timestamp("2017-01-01")] *= 0.02
+    weights[days > pd.Timestamp("2018-08-29")] *= 0.01
+    weights[days.dayofweek >= 5] *= 0.85
+    weights[(days >= BLACK_FRIDAY) & (days <= BLACK_FRIDAY + pd.Timedelta(days=3))] *= 5
+    return days, weights / weights.sum()
+
+
+def build_products(
+    n: int, categories: List[str], rng: np.random.Generator, seed: int
+):
+    category = np.array(categories, dtype=object)[
+        rng.choice(len(categories), size=n, p=zipf_weights(len(categories), 1.1, rng))
+    ]
+    category[rng.random(n) < 0.0185] = None
+
+    weight = np.round(rng.lognormal(6.7, 1.2, n)).clip(0, 40_425)
+    products = pd.DataFrame(
+        {
+            "product_id": hex_ids(np.arange(n), "product", seed),
+            "product_category_name": category,
+            "product_name_lenght": rng.integers(5, 76, n).astype(float),
+            "product_description_lenght": rng.integers(4, 3_993, n).astype(float),
+            "product_photos_qty": rng.integers(1, 7, n).astype(float),
+            "product_weight_g": weight,
+            "product_length_cm": rng.integers(7, 105, n).astype(float),
+            "product_height_cm": rng.integers(2, 105, n).astype(float),
+            "product_width_cm": rng.integers(6, 118, n).astype(float),
+        }
+    )
+    no_text = pd.isna(category)
+    products.loc[
+        no_text,
+        ["product_name_lenght", "product_description_lenght", "product_photos_qty"],
+    ] = np.nan
+    no_dims = rng.random(n) < 0.0001
+    products.loc[
+        no_dims,
+        ["product_weight_g", "product_length_cm", "product_height_cm", "product_width_cm"],
+    ] = np.nan
+    base_price = np.round(rng.lognormal(4.4, 0.9, n), 2).clip(0.85, 6_735.0)
+    return products, base_price, weight
+
+
+def place_people(n: int, rng: np.random.Generator, seller: bool = False):
+    names = list(STATES)
+    shares = np.array([STATES[s][0] for s in names])
+    if seller:
+        shares = shares ** 2  # sellers concentrate even more in SP
+    state_idx = rng.choice(len(names), size=n, p=shares / shares.sum())
+
+    zips = np.empty(n, dtype=np.int64)
+    cities = np.empty(n, dtype=object)
+    states = np.array(names, dtype=object)[state_idx]
+    for i, name in enumerate(names):
+        mask = state_idx == i
+        count = int(mask.sum())
+        if not count:
+            continue
+        (lo, hi), city_names = STATES[name][1], STATES[name][2]
+        zips[mask] = rng.integers(lo, hi + 1, count)
+        city_w = 1.0 / np.arange(1, len(city_names) + 1) ** 1.5
+        cities[mask] = np.array(city_names, dtype=object)[
+            rng.choice(len(city_names), size=count, p=city_w / city_w.sum())
+        ]
+    return states, cities, zips
+
+
+def build_geolocation(
+    zips: np.ndarray, states: np.ndarray, cities: np.ndarray, rng: np.random.Generator
+) -> pd.DataFrame:
+    """Points around every distinct zip prefix; a few land outside Brazil."""
+    zips, first = np.unique(zips, return_index=True)
+    states, cities = states[first], cities[first]
+    center = np.array([STATE_CENTROIDS[state] for state in states])
+    center += rng.uniform(-1.5, 1.5, center.shape)
+
+    points = rng.poisson(GEO_POINTS_PER_ZIP, len(zips)) + 1
+    owner = np.repeat(np.arange(len(zips)), points)
+    lat = center[owner, 0] + rng.normal(0, 0.02, len(owner))
+    lng = center[owner, 1] + rng.normal(0, 0.02, len(owner))
+    outlier = rng.random(len(owner)) < GEO_OUTLIER_RATE
+    lat[outlier] += rng.uniform(30, 60, int(outlier.sum()))
+    return pd.DataFrame(
+        {
+            "geolocation_zip_code_prefix": zips[owner],
+            "geolocation_lat": lat,
+            "geolocation_lng": lng,
+            "geolocation_city": cities[owner],
+            "geolocation_state": states[owner],
+        }
+    )
+
+
+def build_reviews(
+    order_ids: np.ndarray,
+    delivered: np.ndarray,
+    estimated: np.ndarray,
+    first_review: int,
+    rng: np.random.Generator,
+    seed: int,
+) -> pd.DataFrame:
+    """0-2 reviews per order, created the day after delivery (or the estimate)."""
+    n_reviews = _choice(rng, REVIEWS_PER_ORDER, len(order_ids)).astype(np.int64)
+    review_order = np.repeat(np.arange(len(order_ids)), n_reviews)
+    n = len(review_order)
+
+    late = ~(delivered <= estimated)[review_order]
+    score = _choice(rng, REVIEW_SCORES, n)
+    score[late] = _choice(rng, LATE_REVIEW_SCORES, int(late.sum()))
+
+    reference = np.where(np.isnat(delivered), estimated, delivered)[review_order]
+    created = pd.DatetimeIndex(reference).normalize() + pd.Timedelta(days=1)
+    answered = created + pd.to_timedelta(
+        rng.exponential(2.5 * 86_400, n).astype(np.int64) + 3_600, unit="s"
+    )
+    message = np.array(REVIEW_MESSAGES, dtype=object)[
+        rng.integers(0, len(REVIEW_MESSAGES), n)
+    ]
+    message[rng.random(n) < 0.59] = None
+    title = np.where(rng.random(n) < 0.12, "recomendo", None)
+    return pd.DataFrame(
+        {
+            "review_id": hex_ids(
+                np.arange(first_review, first_review + n), "review", seed
+            ),
+            "order_id": order_ids[review_order],
+            "review_score": score,
+            "review_comment_title": title,
+            "review_comment_message": message,
+            "review_creation_date": created,
+            "review_answer_timestamp": answered,
+        }
+    )
+
+
+def generate(
+    out_dir: Path,
+    scale: float = 1.0,
+    seed: int = 42,
+    source_raw_dir: Path = RAW_DIR,
+    chunk_orders: int = CHUNK_ORDERS,
+) -> Dict[str, int]:
+    rng = np.random.default_rng(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    n_orders = max(1, int(round(BASE_ORDERS * scale)))
+    n_products = max(10, int(round(BASE_PRODUCTS * scale)))
+    n_sellers = max(5, int(round(BASE_SELLERS * scale)))
+    n_people = max(1, int(round(n_orders * UNIQUE_CUSTOMER_RATIO)))
+
+    translation_src = source_raw_dir / "product_category_name_translation.csv"
+    if translation_src.exists():
+        translation_out = out_dir / translation_src.name
+        # --out data/raw generates over the source drop itself.
+        if not (
+            translation_out.exists() and translation_out.samefile(translation_src)
+        ):
+            shutil.copy(translation_src, translation_out)
+        categories = pd.read_csv(translation_src)["product_category_name"].tolist()
+    else:
+        categories = FALLBACK_CATEGORIES
+        pd.DataFrame(
+            {"product_category_name": categories, "product_category_name_english": categories}
+        ).to_csv(out_dir / translation_src.name, index=False)
+
+    products, base_price, product_weight = build_products(n_products, categories, rng, seed)
+    products.to_csv(out_dir / "olist_products_dataset.csv", index=False)
+
+    seller_state, seller_city, seller_zip = place_people(n_sellers, rng, seller=True)
+    pd.DataFrame(
+        {
+            "seller_id": hex_ids(np.arange(n_sellers), "seller", seed),
+            "seller_zip_code_prefix": seller_zip,
+            "seller_city": seller_city,
+            "seller_state": seller_state,
+        }
+    ).to_csv(out_dir / "olist_sellers_dataset.csv", index=False)
+
+    # Popularity skew: a few products / sellers carry most of the volume.
+    product_p = zipf_weights(n_products, 1.05, rng)
+    product_seller = rng.choice(
+        n_sellers, size=n_products, p=zipf_weights(n_sellers, 1.0, rng)
+    )
+
+    person_state, person_city, person_zip = place_people(n_people, rng)
+    days, day_p = daily_weights()
+
+    geolocation = build_geolocation(
+        np.concatenate([person_zip, seller_zip]),
+        np.concatenate([person_state, seller_state]),
+        np.concatenate([person_city, seller_city]),
+        rng,
+    )
+    geolocation.to_csv(out_dir / "olist_geolocation_dataset.csv", index=False)
+
+    counts = {
+        "orders": 0,
+        "order_items": 0,
+        "order_payments": 0,
+        "order_reviews": 0,
+        "customers": 0,
+    }
+    files = {
+        "orders": out_dir / "olist_orders_dataset.csv",
+        "order_items": out_dir / "olist_order_items_dataset.csv",
+        "order_payments": out_dir / "olist_order_payments_dataset.csv",
+        "order_reviews": out_dir / "olist_order_reviews_dataset.csv",
+        "customers": out_dir / "olist_customers_dataset.csv",
+    }
+
+    for start in range(0, n_orders, chunk_orders):
+        idx = np.arange(start, min(start + chunk_orders, n_orders))
+        n = len(idx)
+
+        # Customers: one customer_id per order, as in Olist. Orders past the
+        # people pool go to an existing person, which yields ~3.4% repeat
+        # customer_unique_ids.
+        person = idx.copy()
+        repeat = idx >= n_people
+        person[repeat] = rng.integers(0, n_people, int(repeat.sum()))
+        customers = pd.DataFrame(
+            {
+                "customer_id": hex_ids(idx, "customer", seed),
+                "customer_unique_id": hex_ids(person, "customer_unique", seed),
+                "customer_zip_code_prefix": person_zip[person],
+                "customer_city": person_city[person],
+                "customer_state": person_state[person],
+            }
+        )
+
+        status = _choice(rng, ORDER_STATUS, n)
+        purchase = (
+            days[rng.choice(len(days), size=n, p=day_p)]
+            + pd.to_timedelta(rng.integers(0, 86_400, n), unit="s")
+        ).to_numpy()
+        approved = purchase + pd.to_timedelta(
+            rng.exponential(10 * 3600, n).astype(np.int64), unit="s"
+        ).to_numpy()
+        unapproved = np.isin(status, ["created", "canceled"]) & (rng.random(n) < 0.5)
+        approved[unapproved] = np.datetime64("NaT")
+        carrier = approved + pd.to_timedelta(
+            rng.gamma(2.0, 1.5 * 86_400, n).astype(np.int64), unit="s"
+        ).to_numpy()
+        carrier[~np.isin(status, ["delivered", "shipped"])] = np.datetime64("NaT")
+        delivered = purchase + pd.to_timedelta(
+            rng.gamma(2.2, 5.5 * 86_400, n).astype(np.int64) + 86_400, unit="s"
+        ).to_numpy()
+        delivered[status != "delivered"] = np.datetime64("NaT")
+        delivered[(status == "delivered") & (rng.random(n) < 0.0008)] = np.datetime64("NaT")
+        estimated = (
+            pd.DatetimeIndex(purchase).normalize()
+            + pd.to_timedelta(rng.integers(10, 45, n), unit="D")
+        ).to_numpy()
+
+        order_ids = hex_ids(idx, "order", seed)
+        orders = pd.DataFrame(
+            {
+                "order_id": order_ids,
+                "customer_id": customers["customer_id"].to_numpy(),
+                "order_status": status,
+                "order_purchase_timestamp": purchase,
+                "order_approved_at": approved,
+                "order_delivered_carrier_date": carrier,
+                "order_delivered_customer_date": delivered,
+                "order_estimated_delivery_date": estimated,
+            }
+        )
+
+        # Items: skewed product choice; each product ships from its seller.
+        n_items = _choice(rng, ITEMS_PER_ORDER, n).astype(np.int64)
+        n_items[(status == "unavailable") & (rng.random(n) < 0.95)] = 0
+        item_order = np.repeat(np.arange(n), n_items)
+        first_of_order = np.r_[0, np.cumsum(n_items)[:-1]]
+        item_seq = np.arange(len(item_order)) - np.repeat(first_of_order, n_items) + 1
+        product = rng.choice(n_products, size=len(item_order), p=product_p)
+        # Multi-item orders usually repeat the same product.
+        same = (item_seq > 1) & (rng.random(len(item_order)) < 0.7)
+        same_idx = np.flatnonzero(same)
+        product[same_idx] = product[same_idx - 1]
+        price = np.round(base_price[product] * rng.uniform(0.9, 1.1, len(product)), 2)
+        freight = np.round(
+            np.nan_to_num(product_weight[product], nan=500.0) / 1000 * 2.5
+            + rng.lognormal(2.6, 0.45, len(product)),
+            2,
+        ).clip(0, 409.68)
+        items = pd.DataFrame(
+            {
+                "order_id": order_ids[item_order],
+                "order_item_id": item_seq,
+                "product_id": products["product_id"].to_numpy()[product],
+                "seller_id": hex_ids(product_seller[product], "seller", seed),
+                "shipping_limit_date": purchase[item_order] + np.timedelta64(6, "D"),
+                "price": price,
+                "freight_value": freight,
+            }
+        )
+
+        # Payments split the order total over 1-3 rows.
+        order_total = np.bincount(item_order, weights=price + freight, minlength=n)
+        no_items = n_items == 0
+        order_total[no_items] = np.round(rng.lognormal(4.6, 0.9, int(no_items.sum())), 2)
+        n_pay = _choice(rng, PAYMENTS_PER_ORDER, n).astype(np.int64)
+        pay_order = np.repeat(np.arange(n), n_pay)
+        pay_first = np.r_[0, np.cumsum(n_pay)[:-1]]
+        pay_seq = np.arange(len(pay_order)) - np.repeat(pay_first, n_pay) + 1
+        # One Dirichlet(2, ..., 2) vector of size n_pay per order: normalized
+        # gamma draws, so the shares of an order sum to 1.
+        weight = rng.gamma(2.0, 1.0, len(pay_order))
+        share = weight / np.bincount(pay_order, weights=weight, minlength=n)[pay_order]
+        value = np.round(order_total[pay_order] * share, 2)
+        # The last payment takes the rounding remainder, so they add up exactly.
+        last = np.flatnonzero(pay_seq == np.repeat(n_pay, n_pay))
+        last_order = pay_order[last]
+        paid = np.bincount(pay_order, weights=value, minlength=n)[last_order]
+        value[last] = np.round(order_total[last_order] - (paid - value[last]), 2)
+        pay_type = _choice(rng, PAYMENT_TYPES, len(pay_order))
+        installments = np.where(
+            pay_type == "credit_card", rng.integers(1, 11, len(pay_order)), 1
+        )
+        payments = pd.DataFrame(
+            {
+                "order_id": order_ids[pay_order],
+                "payment_sequential": pay_seq,
+                "payment_type": pay_type,
+                "payment_installments": installments,
+                "payment_value": value,
+            }
+        )
+
+        reviews = build_reviews(
+            order_ids, delivered, estimated, counts["order_reviews"], rng, seed
+        )
+
+        for key, frame in (
+            ("orders", orders),
+            ("order_items", items),
+            ("order_payments", payments),
+            ("order_reviews", reviews),
+            ("customers", customers),
+        ):
+            frame.to_csv(
+                files[key],
+                mode="w" if start == 0 else "a",
+                header=start == 0,
+                index=False,
+                date_format=TIMESTAMP_FORMAT,
+            )
+            counts[key] += len(frame)
+
+    counts["products"] = n_products
+    counts["sellers"] = n_sellers
+    counts["geolocation"] = len(geolocation)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1.0, help="1 = Olist size")
+    parser.add_argument(
+        "--out",
+        type=Path,
+        default=None,
+        help="Output raw dir (default: data/synthetic/sf<scale>/raw)",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    out_dir = args.out or SYNTHETIC_DIR / f"sf{args.scale:g}" / "raw"
+    counts = generate(out_dir, scale=args.scale, seed=args.seed)
+    for name, rows in counts.items():
+        print(f"{name:<16} {rows:>12,}")
+    print(f"Wrote synthetic raw files -> {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
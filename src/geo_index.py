@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Zip-prefix centroid index for seller -> customer delivery distances.
+
+The Olist geolocation file has about 1M points for ~19k zip code prefixes
+(many duplicates, a few far outside Brazil). It is collapsed once into one
+row per prefix (mean latitude / longitude of the points inside Brazil's
+bounding box) and cached next to the raw Parquet cache, keyed by the same
+content hash, so it is rebuilt only when the geolocation file changes.
+
+Lookups are vectorized: prefixes are resolved with a binary search on the
+sorted index and distances come from a numpy haversine, with no per-row
+Python work. Prefixes missing from the index give NaN distances, and so
+does a raw drop without the geolocation file.
+
+Usage:
+  python src/geo_index.py            # build / warm the index and print stats
+  python src/geo_index.py --rebuild
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from raw_cache import ensure_cached, pyarrow, read_raw
+
+
+RAW_DIR = Path("data/raw")
+GEO_FILE = "olist_geolocation_dataset.csv"
+GEO_COLUMNS = [
+    "geolocation_zip_code_prefix",
+    "geolocation_lat",
+    "geolocation_lng",
+]
+
+# Generous bounding box around Brazil; points outside are geocoding errors.
+LAT_BOUNDS = (-34.0, 5.5)
+LNG_BOUNDS = (-74.5, -34.0)
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def build_zip_index(geo: pd.DataFrame) -> pd.DataFrame:
+    """One row per zip prefix (sorted): zip_code_prefix, lat, lng, points."""
+    lat = geo["geolocation_lat"]
+    lng = geo["geolocation_lng"]
+    inside = lat.between(*LAT_BOUNDS) & lng.between(*LNG_BOUNDS)
+    index = (
+        geo[inside]
+        .groupby("geolocation_zip_code_prefix", sort=True)
+        .agg(
+            lat=("geolocation_lat", "mean"),
+            lng=("geolocation_lng", "mean"),
+            points=("geolocation_lat", "size"),
+        )
+        .rename_axis("zip_code_prefix")
+        .reset_index()
+    )
+    index["zip_code_prefix"] = index["zip_code_prefix"].astype("int64")
+    return index
+
+
+def load_zip_index(
+    raw_dir: Path = RAW_DIR,
+    cache_dir: Optional[Path] = None,
+    rebuild: bool = False,
+) -> Optional[pd.DataFrame]:
+    """The cached index, or None when raw_dir has no geolocation file."""
+    if not (raw_dir / GEO_FILE).exists():
+        return None
+    if pyarrow is None:
+        return build_zip_index(read_raw(GEO_FILE, GEO_COLUMNS, raw_dir))
+
+    # The raw cache file name carries the source sha256; reuse it as the key.
+    raw_path = ensure_cached(GEO_FILE, raw_dir=raw_dir, cache_dir=cache_dir)
+    key = raw_path.name.split(".")[1]
+    index_path = raw_path.with_name(f"zip_index.{key}.parquet")
+    if index_path.exists() and not rebuild:
+        return pd.read_parquet(index_path)
+
+    index = build_zip_index(pd.read_parquet(raw_path, columns=GEO_COLUMNS))
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    index.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, index_path)
+    for stale in raw_path.parent.glob("zip_index.*.parquet"):
+        if stale != index_path:
+            stale.unlink(missing_ok=True)
+    return index
+
+
+def coordinates(index: pd.DataFrame, zips) -> Tuple[np.ndarray, np.ndarray]:
+    """lat / lng per zip prefix (NaN where the prefix or the zip is missing)."""
+    zips = pd.to_numeric(pd.Series(np.asarray(zips)), errors="coerce").to_numpy(
+        dtype="float64", na_value=np.nan
+    )
+    lat = np.full(len(zips), np.nan)
+    lng = np.full(len(zips), np.nan)
+    keys = index["zip_code_prefix"].to_numpy()
+    known = np.flatnonzero(~np.isnan(zips))
+    if not len(keys) or not len(known):
+        return lat, lng
+
+    wanted = zips[known].astype(np.int64)
+    pos = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+    hit = keys[pos] == wanted
+    lat[known[hit]] = index["lat"].to_numpy()[pos[hit]]
+    lng[known[hit]] = index["lng"].to_numpy()[pos[hit]]
+    return lat, lng
+
+
+def haversine_km(lat1, lng1, lat2, lng2) -> np.ndarray:
+    lat1, lng1, lat2, lng2 = (np.radians(v) for v in (lat1, lng1, lat2, lng2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def distance_km(index: Optional[pd.DataFrame], from_zips, to_zips) -> np.ndarray:
+    """Great-circle km between zip prefix centroids, rounded to 0.01 km."""
+    if index is None:
+        return np.full(len(from_zips), np.nan)
+    distance = haversine_km(
+        *coordinates(index, from_zips), *coordinates(index, to_zips)
+    )
+    return np.round(distance, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    index = load_zip_index(args.raw_dir, rebuild=args.rebuild)
+    if index is None:
+        raise SystemExit(f"{args.raw_dir / GEO_FILE} not found.")
+    print(
+        f"{len(index)} zip prefixes from {int(index['points'].sum())} points "
+        f"inside the bounding box ({index.memory_usage(deep=True).sum() / 1e6:.1f} MB)"
+    )
+
+
+if __name__ == "__main__":
+    main()
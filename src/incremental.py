@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Incremental fact_orders build.
+
+A full build recomputes every order, including the whole-table
+first-purchase window behind is_new_customer. The incremental build keeps
+change-capture state in <mart dir>/_state/fact_orders/:
+- a (order_purchase_ts, order_id) watermark,
+- the size / mtime / sha256 of every raw input (as build_cache.py),
+- per source table, one hash per key (order_id, customer_id or seller_id)
+  of the raw rows fact_orders reads.
+
+On the next run:
+1. raw files whose digest is unchanged are not looked at again; when none
+   changed, the existing mart is up to date and nothing is rebuilt or
+   rewritten,
+2. only the tables of changed files are hashed, and the keys whose hash
+   changed are mapped to their orders (a changed customer touches its
+   orders, a changed seller the orders with its items, a new geolocation
+   file every order); orders above the watermark are new, the other touched
+   orders changed, orders gone from the raw drop are removed,
+3. only those orders go through build_fact_orders, is_new_customer is
+   recomputed only for the customer_unique_ids touched by the delta, and the
+   result is merged back into the existing mart in raw order, so it matches
+   a full rebuild row for row.
+
+The new state is returned rather than saved: transform.py saves it only
+after the checks pass and the mart is written, so a failed run is redone
+by the next one instead of being counted as built.
+
+Usage:
+  python src/transform.py --incremental
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from build_cache import file_digests
+from geo_index import GEO_FILE
+from mart_io import PARTITION_COLUMN, mart_path, read_mart
+from reviews import REVIEWS_FILE
+from transform import RAW_DIR, build_fact_orders
+
+
+TS_COLUMNS = ["order_purchase_ts", "order_delivered_ts", "order_estimated_ts"]
+NULLABLE_INT_COLUMNS = ["items_cnt", "on_time_flag", "is_new_customer", "reviews_cnt"]
+
+# Raw file -> (table in load_raw(), key its rows are hashed by).
+SOURCES: Dict[str, Tuple[str, str]] = {
+    "olist_orders_dataset.csv": ("orders", "order_id"),
+    "olist_order_items_dataset.csv": ("items", "order_id"),
+    "olist_order_payments_dataset.csv": ("payments", "order_id"),
+    "olist_customers_dataset.csv": ("customers", "customer_id"),
+    "olist_sellers_dataset.csv": ("sellers", "seller_id"),
+    REVIEWS_FILE: ("reviews", "order_id"),
+    # Every distance may move with a new geolocation file.
+    GEO_FILE: ("zip_index", ""),
+}
+
+
+def read_fact_orders(mart_dir: Path, fmt: str = "csv") -> pd.DataFrame:
+    """Read fact_orders back with the dtypes build_fact_orders produces."""
+    if fmt != "csv":
+        # Parquet/Arrow keep their types; only the partition key is extra.
+        return read_mart("fact_orders", mart_dir, fmt).drop(columns=[PARTITION_COLUMN])
+
+    fact_orders = pd.read_csv(
+        mart_path("fact_orders", mart_dir, fmt),
+        parse_dates=TS_COLUMNS,
+        dtype={col: "Int64" for col in NULLABLE_INT_COLUMNS},
+        float_precision="round_trip",
+    )
+    fact_orders["order_purchase_date"] = fact_orders["order_purchase_ts"].dt.date
+    return fact_orders
+
+
+def key_hashes(df: Optional[pd.DataFrame], key: str) -> pd.Series:
+    """One uint64 per key: the combined hash of its rows (order independent)."""
+    if df is None or not len(df):
+        return pd.Series(dtype="uint64")
+    if not key:
+        return pd.Series([pd.util.hash_pandas_object(df, index=False).sum()], index=[""])
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    keys = df[key].astype(object).to_numpy()
+    return pd.Series(rows, index=keys).groupby(level=0).sum()
+
+
+def changed_keys(current: pd.Series, stored: pd.Series) -> pd.Index:
+    """Keys added, removed or whose hash differs."""
+    both = current.index.intersection(stored.index)
+    differs = current[both].to_numpy() != stored[both].to_numpy()
+    return (
+        current.index.difference(stored.index)
+        .union(stored.index.difference(current.index))
+        .union(both[differs])
+    )
+
+
+def touched_orders(raw: dict, table: str, keys: pd.Index) -> pd.Index:
+    """order_ids whose fact_orders row depends on the changed keys of table."""
+    if table == "zip_index":
+        return pd.Index(raw["orders"]["order_id"].astype(object))
+    if table == "customers":
+        orders = raw["orders"]
+        hit = orders["customer_id"].astype(object).isin(keys)
+        return pd.Index(orders.loc[hit.to_numpy(), "order_id"].astype(object))
+    if table == "sellers":
+        items = raw["items"]
+        hit = items["seller_id"].astype(object).isin(keys)
+        return pd.Index(items.loc[hit.to_numpy(), "order_id"].astype(object).unique())
+    return keys
+
+
+def watermark_of(orders: pd.DataFrame) -> Optional[dict]:
+    ts = pd.to_datetime(orders["order_purchase_timestamp"])
+    if ts.notna().sum() == 0:
+        return None
+    max_ts = ts.max()
+    max_id = orders.loc[ts == max_ts, "order_id"].max()
+    return {"order_purchase_ts": max_ts.isoformat(), "order_id": max_id}
+
+
+def above_watermark(orders: pd.DataFrame, watermark: Optional[dict]) -> pd.Series:
+    if watermark is None:
+        return pd.Series(True, index=orders.index)
+    ts = pd.to_datetime(orders["order_purchase_timestamp"])
+    wm_ts = pd.Timestamp(watermark["order_purchase_ts"])
+    return (ts > wm_ts) | ((ts == wm_ts) & (orders["order_id"] > watermark["order_id"]))
+
+
+def load_state(state_dir: Path) -> Tuple[Optional[dict], Dict[str, pd.Series]]:
+    """(state.json, table -> stored key hashes); (None, {}) without state."""
+    state_path = state_dir / "state.json"
+    if not state_path.exists():
+        return None, {}
+    state = json.loads(state_path.read_text(encoding="utf-8"))
+    hashes = {}
+    for table, key in SOURCES.values():
+        path = state_dir / f"{table}.parquet"
+        if path.exists():
+            stored = pd.read_parquet(path)
+            hashes[table] = pd.Series(
+                stored["hash"].to_numpy(dtype="uint64"),
+                index=stored["key"].astype(object).to_numpy(),
+            )
+    return state, hashes
+
+
+def save_state(
+    watermark: Optional[dict],
+    digests: dict,
+    hashes: Dict[str, pd.Series],
+    state_dir: Path,
+) -> None:
+    state_dir.mkdir(parents=True, exist_ok=True)
+    for table, series in hashes.items():
+        pd.DataFrame(
+            {"key": series.index.astype(str), "hash": series.to_numpy(dtype="uint64")}
+        ).to_parquet(state_dir / f"{table}.parquet", index=False)
+    (state_dir / "state.json").write_text(
+        json.dumps({"watermark": watermark, "files": digests}, indent=2),
+        encoding="utf-8",
+    )
+
+
+@dataclass
+class PendingState:
+    """State of a finished incremental build, saved once its mart is written."""
+
+    watermark: Optional[dict]
+    digests: dict
+    hashes: Dict[str, pd.Series]
+    state_dir: Path
+
+    def save(self) -> None:
+        save_state(self.watermark, self.digests, self.hashes, self.state_dir)
+
+
+def recompute_is_new_customer(
+    fact_orders: pd.DataFrame, customers: pd.Index
+) -> pd.DataFrame:
+    """Re-evaluate the first-purchase flag only for the given customer_unique_ids."""
+    mask = fact_orders["customer_unique_id"].isin(customers)
+    if not mask.any():
+        return fact_orders
+
+    subset = fact_orders.loc[mask, ["customer_unique_id", "order_purchase_ts"]]
+    first_purchase = subset.groupby("customer_unique_id")[
+        "order_purchase_ts"
+    ].transform("min")
+    is_new = (subset["order_purchase_ts"] == first_purchase).astype(int)
+    fact_orders.loc[mask, "is_new_customer"] = is_new.astype("Int64")
+    return fact_orders
+
+
+def build_fact_orders_incremental(
+    raw: dict,
+    existing: pd.DataFrame,
+    watermark: Optional[dict],
+    touched: pd.Index,
+) -> Tuple[pd.DataFrame, dict]:
+    """Rebuild the orders above the watermark and the touched ones."""
+    orders = raw["orders"]
+    order_ids = orders["order_id"].astype(object)
+    is_new = above_watermark(orders, watermark).to_numpy()
+    is_changed = ~is_new & order_ids.isin(touched).to_numpy()
+    delta_ids = pd.Index(order_ids[is_new | is_changed])
+    deleted_ids = touched.difference(pd.Index(order_ids))
+
+    delta_raw = dict(raw)
+    delta_raw.pop("order_customers", None)
+    delta_raw["orders"] = orders[is_new | is_changed]
+    delta_raw["items"] = raw["items"][raw["items"]["order_id"].isin(delta_ids)]
+    delta_raw["payments"] = raw["payments"][
+        raw["payments"]["order_id"].isin(delta_ids)
+    ]
+    delta_rows = build_fact_orders(delta_raw)
+
+    replaced = existing["order_id"].isin(delta_ids.union(deleted_ids))
+    affected_customers = pd.Index(
+        pd.concat(
+            [
+                delta_rows["customer_unique_id"],
+                existing.loc[replaced, "customer_unique_id"],
+            ]
+        ).dropna().unique()
+    )
+
+    kept = existing.loc[~replaced]
+    merged = pd.concat([kept, delta_rows], ignore_index=True) if len(kept) else delta_rows
+    merged = recompute_is_new_customer(merged, affected_customers)
+
+    # Restore raw order so the result lines up with a full rebuild.
+    fact_orders = (
+        merged.set_index("order_id")
+        .reindex(orders["order_id"])
+        .reset_index()[delta_rows.columns]
+    )
+    for col in NULLABLE_INT_COLUMNS:
+        fact_orders[col] = fact_orders[col].astype("Int64")
+
+    stats = {
+        "new": int(is_new.sum()),
+        "changed": int(is_changed.sum()),
+        "deleted": len(deleted_ids),
+        "affected_customers": len(affected_customers),
+    }
+    return fact_orders, stats
+
+
+def run_incremental(
+    raw: dict,
+    mart_dir: Path,
+    fmt: str = "csv",
+    state_dir: Optional[Path] = None,
+    raw_dir: Path = RAW_DIR,
+) -> Tuple[Optional[pd.DataFrame], Optional[PendingState]]:
+    """
+    (updated fact_orders, state to save once it is written), or (None, None)
+    when the existing mart is up to date.
+    """
+    state_dir = state_dir or mart_dir / "_state" / "fact_orders"
+    state, stored = load_state(state_dir)
+    previous = (state or {}).get("files", {})
+    digests = file_digests(
+        [raw_dir / name for name in SOURCES],
+        {str(raw_dir / name): d for name, d in previous.items()},
+    )
+    digests = {Path(path).name: d for path, d in digests.items()}
+    watermark = watermark_of(raw["orders"])
+
+    if state is None or not mart_path("fact_orders", mart_dir, fmt).exists():
+        print("No incremental state found; running a full build.")
+        fact_orders = build_fact_orders(raw)
+        hashes = {
+            table: key_hashes(raw.get(table), key) for table, key in SOURCES.values()
+        }
+        return fact_orders, PendingState(watermark, digests, hashes, state_dir)
+
+    changed_files = [
+        name
+        for name in SOURCES
+        if digests.get(name, {}).get("sha256") != previous.get(name, {}).get("sha256")
+    ]
+    if not changed_files:
+        print("Incremental fact_orders: no raw input changed; the mart is up to date.")
+        return None, None
+
+    # Only the tables of changed files are hashed again.
+    touched = pd.Index([], dtype=object)
+    hashes = {}
+    for name in changed_files:
+        table, key = SOURCES[name]
+        hashes[table] = key_hashes(raw.get(table), key)
+        keys = changed_keys(hashes[table], stored.get(table, pd.Series(dtype="uint64")))
+        touched = touched.union(touched_orders(raw, table, keys))
+
+    existing = read_fact_orders(mart_dir, fmt)
+    fact_orders, stats = build_fact_orders_incremental(
+        raw, existing, state["watermark"], touched
+    )
+    print(
+        f"Incremental fact_orders ({', '.join(changed_files)} changed): "
+        f"{stats['new']} new, {stats['changed']} changed, "
+        f"{stats['deleted']} deleted orders; "
+        f"is_new_customer recomputed for {stats['affected_customers']} customers"
+    )
+    return fact_orders, PendingState(watermark, digests, hashes, state_dir)
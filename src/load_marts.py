@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Build fact_orders / fact_order_items and stream them into Postgres.
+
+There is no CSV round trip and no per-row Python work between the builders
+and the database:
+- each built frame is converted to Arrow (numeric columns without a copy)
+  and cast to the column types of its table in sql/ddl (NUMERIC(p,s) ->
+  decimal128, TIMESTAMP -> timestamp[us], ...),
+- record batches are encoded by pg_copy straight into a binary COPY stream,
+  a few thousand rows at a time,
+- every table is built on its own producer thread and copied by a background
+  thread on its own connection, fed through a bounded queue of batches: the
+  queue caps the memory between encoding and COPY, and the separate producers
+  keep a full queue from holding up the other table's build, so
+  fact_order_items is being built while fact_orders loads. With --chunksize
+  each items chunk is on its way to the server while the next one is joined.
+  The raw Parquet caches both builders read are filled once up front.
+
+The tables are created from their DDL if missing and emptied with TRUNCATE in
+the same transaction as the COPY, so a failed load leaves a table as it was.
+TRUNCATE takes an ACCESS EXCLUSIVE lock: readers of a table wait (they do not
+see the old rows) from the moment its load starts until it commits. Nothing is
+committed before every build, check and COPY has finished; the tables are then
+committed one after the other, so a failing commit keeps the tables committed
+before it (they are listed) and leaves the rest at their previous contents.
+
+--from-arrow skips the build and streams existing Arrow marts
+(python src/transform.py --format arrow) from memory-mapped IPC files.
+
+Builder columns the DDL table does not have are skipped and listed.
+
+Usage:
+  PG_PASSWORD=... python src/load_marts.py
+  PG_PASSWORD=... python src/load_marts.py --chunksize 250000
+  PG_PASSWORD=... python src/load_marts.py --from-arrow
+  PG_PASSWORD=... python src/load_marts.py --marts fact_orders --profile
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import transform
+import transform_items
+from geo_index import GEO_FILE, load_zip_index
+from load_postgres import build_engine
+from mart_io import PARTITION_COLUMN, iter_mart_batches
+from pg_copy import copy_from_batches
+from profiling import add_profile_argument, profile_run, step
+from raw_cache import ensure_cached
+from reviews import REVIEWS_FILE
+from run_sql import discover, split_statements
+from schema import Column, registry
+
+
+RAW_DIR = Path("data/raw")
+MART_DIR = Path("data/mart")
+
+MARTS = ["fact_orders", "fact_order_items"]
+
+# Rows per record batch handed to the encoder.
+BATCH_ROWS = 65_536
+# Batches buffered per table between the builder and its COPY thread.
+QUEUE_BATCHES = 8
+
+_ARROW_TYPES: Dict[str, pa.DataType] = {
+    "SMALLINT": pa.int16(),
+    "INT": pa.int32(),
+    "INTEGER": pa.int32(),
+    "BIGINT": pa.int64(),
+    "REAL": pa.float32(),
+    "DOUBLE PRECISION": pa.float64(),
+    "BOOLEAN": pa.bool_(),
+    "DATE": pa.date32(),
+    "TIMESTAMP": pa.timestamp("us"),
+    "VARCHAR": pa.string(),
+    "CHAR": pa.string(),
+    "TEXT": pa.string(),
+}
+
+_END = object()
+_ABORT = object()
+# The mart checks print their summaries: one producer at a time.
+_CHECKS_LOCK = threading.Lock()
+
+
+class CopyAborted(Exception):
+    pass
+
+
+def arrow_type(column: Column) -> pa.DataType:
+    """Arrow type the binary COPY encoder sends for a DDL column."""
+    if column.sql_type in ("NUMERIC", "DECIMAL"):
+        if not column.modifiers:
+            raise TypeError(f"{column.name}: NUMERIC needs a precision to be copied")
+        precision, scale = (column.modifiers + (0,))[:2]
+        return pa.decimal128(precision, scale)
+    if column.sql_type not in _ARROW_TYPES:
+        raise TypeError(f"{column.name}: no Arrow type for {column.sql_type}")
+    return _ARROW_TYPES[column.sql_type]
+
+
+def conform(table: pa.Table, types: Dict[str, pa.DataType]) -> pa.Table:
+    """The columns of types, in that order, cast to those types."""
+    columns = []
+    for name, kind in types.items():
+        column = table.column(name)
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        if pa.types.is_decimal(kind) and pa.types.is_floating(column.type):
+            # Same rounding as the ::NUMERIC(p,s) casts in sql/transform.
+            column = pc.round(column, kind.scale, round_mode="half_towards_infinity")
+        columns.append(column.cast(kind))
+    return pa.Table.from_arrays(columns, names=list(types))
+
+
+def ddl_statements(table: str) -> List[str]:
+    """Statements of the sql/ddl file(s) creating table."""
+    return [
+        statement
+        for sql_file in discover(["ddl"])
+        if table in sql_file.creates
+        for _, statement in split_statements(sql_file.path.read_text(encoding="utf-8"))
+    ]
+
+
+class CopyLoader:
+    """
+    COPY one table from Arrow batches on a background thread.
+
+    write(df) / close() / discard() match ChunkedMartWriter, so the chunked
+    items builder can stream into it; discard() stops the COPY and cancel()
+    makes the producer's next write raise. finish() marks
+    the end of the data and returns right away; close() also waits for the
+    COPY and returns the row count; commit() or abort() ends the transaction
+    and closes the connection, and abort() after commit() does nothing.
+    """
+
+    def __init__(
+        self,
+        engine,
+        table: str,
+        batch_rows: int = BATCH_ROWS,
+        queue_batches: int = QUEUE_BATCHES,
+    ) -> None:
+        self.table = table
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self.seconds = 0.0
+        self.skipped: List[str] = []
+        self._columns = registry()[table]
+        self._types: Optional[Dict[str, pa.DataType]] = None
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_batches)
+        self._finished = False
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._cancelled = threading.Event()
+        self.committed = False
+        self._closed = False
+
+        self._conn = engine.raw_connection()
+        cursor = self._conn.cursor()
+        try:
+            for statement in ddl_statements(table):
+                cursor.execute(statement)
+            cursor.execute(f"TRUNCATE {table}")
+        finally:
+            cursor.close()
+        self._thread = threading.Thread(
+            target=self._copy, name=f"copy_{table}", daemon=True
+        )
+        self._thread.start()
+
+    def _batches(self) -> Iterable[pa.RecordBatch]:
+        while True:
+            batch = self._queue.get()
+            if batch is _END or batch is _ABORT:
+                self._done = True
+                if batch is _ABORT:
+                    raise CopyAborted(self.table)
+                return
+            yield batch
+
+    def _copy(self) -> None:
+        # The COPY starts with the first batch: the column list comes from it.
+        first = self._queue.get()
+        if first is _END or first is _ABORT:
+            self._done = True
+            return
+        start = time.perf_counter()
+        cursor = self._conn.cursor()
+        try:
+            with step(f"copy_{self.table}") as s:
+
+                def batches():
+                    yield first
+                    yield from self._batches()
+
+                rows = copy_from_batches(
+                    cursor, self.table, list(self._types), batches()
+                )
+                s.rows_out(rows)
+        except BaseException as exc:
+            self._error = exc
+            # Keep draining so the builder never blocks on a full queue.
+            while not self._done:
+                item = self._queue.get()
+                self._done = item is _END or item is _ABORT
+        finally:
+            cursor.close()
+            self.seconds = time.perf_counter() - start
+
+    def _target_types(self, names: List[str]) -> Dict[str, pa.DataType]:
+        present = set(names)
+        self.skipped = [name for name in names if name not in self._columns]
+        return {
+            name: arrow_type(column)
+            for name, column in self._columns.items()
+            if name in present
+        }
+
+    def write_table(self, table: pa.Table) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"COPY into {self.table} failed") from self._error
+        if self._types is None:
+            self._types = self._target_types(table.column_names)
+        for batch in conform(table, self._types).to_batches(self.batch_rows):
+            if self._cancelled.is_set():
+                raise CopyAborted(self.table)
+            self._queue.put(batch)
+        self.rows += table.num_rows
+
+    def write(self, df: pd.DataFrame) -> None:
+        self.write_table(pa.Table.from_pandas(df, preserve_index=False))
+
+    def finish(self) -> None:
+        if not self._finished:
+            self._finished = True
+            self._queue.put(_END)
+
+    def close(self) -> int:
+        self.finish()
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError(f"COPY into {self.table} failed") from self._error
+        return self.rows
+
+    def commit(self) -> None:
+        self._closed = True
+        try:
+            self._conn.commit()
+            self.committed = True
+        finally:
+            self._conn.close()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def discard(self) -> None:
+        if self._thread.is_alive() and not self._finished:
+            self._finished = True
+            self._queue.put(_ABORT)
+            self._thread.join()
+
+    def abort(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.discard()
+        try:
+            self._conn.rollback()
+        finally:
+            self._conn.close()
+
+
+def warm_raw_cache(raw_dir: Path = RAW_DIR) -> None:
+    """
+    Build the Parquet caches (and zip index) both builders read, so their
+    threads do not rebuild the same stale cache files at once.
+    """
+    shared = set(transform.RAW_FILES) | set(transform_items.RAW_FILES)
+    for name in sorted(shared - {GEO_FILE, REVIEWS_FILE}):
+        if (raw_dir / name).exists():
+            ensure_cached(name, raw_dir=raw_dir)
+    load_zip_index(raw_dir)
+
+
+def stream_table(
+    loader: CopyLoader, from_arrow: bool, chunksize: Optional[int], batch_rows: int
+) -> None:
+    """Producer thread body: build (or read) one table into its loader."""
+    with step(loader.table):
+        if from_arrow:
+            stream_arrow_mart(loader, MART_DIR, batch_rows)
+        elif loader.table == "fact_orders":
+            stream_fact_orders(loader)
+        else:
+            stream_fact_order_items(loader, chunksize)
+
+
+def stream_fact_orders(loader: CopyLoader) -> None:
+    with step("load_raw") as s:
+        raw = transform.load_raw(RAW_DIR)
+        s.rows_out(len(raw["orders"]))
+    with step("build_fact_orders", len(raw["orders"])) as s:
+        fact_orders = transform.build_fact_orders(raw)
+        s.rows_out(len(fact_orders))
+    with _CHECKS_LOCK, step("checks", len(fact_orders)):
+        transform.run_checks(fact_orders)
+    with step("enqueue", len(fact_orders)):
+        loader.write(fact_orders)
+    loader.finish()
+
+
+def stream_fact_order_items(loader: CopyLoader, chunksize: Optional[int]) -> None:
+    if chunksize:
+        with step("load_dimensions"):
+            dims = transform_items.load_dimensions(RAW_DIR)
+        with step("build_fact_order_items_chunked") as s:
+            result = transform_items.build_fact_order_items_chunked(
+                dims,
+                RAW_DIR / "olist_order_items_dataset.csv",
+                loader,
+                chunksize=chunksize,
+            )
+            s.rows_out(result.rows)
+        return
+
+    with step("load_raw") as s:
+        raw = transform_items.load_raw(RAW_DIR)
+        s.rows_out(len(raw["items"]))
+    with step("build_fact_order_items", len(raw["items"])) as s:
+        fact_order_items = transform_items.build_fact_order_items(raw)
+        s.rows_out(len(fact_order_items))
+    with _CHECKS_LOCK, step("checks", len(fact_order_items)):
+        transform_items.run_checks(fact_order_items)
+    with step("enqueue", len(fact_order_items)):
+        loader.write(fact_order_items)
+    loader.finish()
+
+
+def stream_arrow_mart(loader: CopyLoader, mart_dir: Path, batch_rows: int) -> None:
+    """Existing data/mart/<table>.arrow, batch by batch from memory-mapped files."""
+    with step(f"read_{loader.table}"):
+        for batch in iter_mart_batches(
+            loader.table, mart_dir, "arrow", batch_rows=batch_rows
+        ):
+            table = pa.Table.from_batches([batch])
+            if PARTITION_COLUMN in table.column_names:
+                table = table.drop_columns([PARTITION_COLUMN])
+            loader.write_table(table)
+    loader.finish()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--db", default="olist_analytics")
+    parser.add_argument(
+        "--marts",
+        nargs="+",
+        default=MARTS,
+        choices=MARTS,
+        help="Tables to build and load (default: all)",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Stream the items file in chunks of this many rows (bounded memory)",
+    )
+    parser.add_argument(
+        "--from-arrow",
+        action="store_true",
+        help="Load the existing Arrow marts in data/mart instead of building",
+    )
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=BATCH_ROWS,
+        help=f"Rows per COPY batch (default: {BATCH_ROWS})",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    password = os.getenv("PG_PASSWORD")
+    if not password:
+        raise SystemExit("PG_PASSWORD env var is required.")
+    if args.from_arrow and args.chunksize:
+        parser.error("--chunksize cannot be combined with --from-arrow")
+
+    engine = build_engine(
+        args.user, password, args.host, args.port, args.db, pool_size=len(args.marts)
+    )
+
+    start = time.perf_counter()
+    loaders: List[CopyLoader] = []
+    with profile_run("load_marts", args.profile):
+        try:
+            if not args.from_arrow and len(args.marts) > 1:
+                with step("warm_raw_cache"):
+                    warm_raw_cache()
+            for table in args.marts:
+                loaders.append(CopyLoader(engine, table, args.batch_rows))
+            with ThreadPoolExecutor(
+                max_workers=len(loaders), thread_name_prefix="build"
+            ) as pool:
+                futures = [
+                    pool.submit(
+                        stream_table,
+                        loader,
+                        args.from_arrow,
+                        args.chunksize,
+                        args.batch_rows,
+                    )
+                    for loader in loaders
+                ]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except BaseException:
+                    # Stop the other producers at their next batch.
+                    for loader in loaders:
+                        loader.cancel()
+                    raise
+            # Builds are done; wait for the COPYs still in flight.
+            with step("wait_copy"):
+                for loader in loaders:
+                    loader.close()
+            with step("commit"):
+                for loader in loaders:
+                    loader.commit()
+        except BaseException:
+            for loader in loaders:
+                loader.abort()
+            committed = [loader.table for loader in loaders if loader.committed]
+            if committed:
+                print(f"Committed before the failure: {', '.join(committed)}")
+            raise
+    total = time.perf_counter() - start
+
+    print("\nLoad timings:")
+    for loader in loaders:
+        rate = loader.rows / loader.seconds if loader.seconds else float("inf")
+        print(
+            f"  {loader.table:<26} {loader.rows:>10} rows "
+            f"{loader.seconds:8.2f}s COPY ({rate:,.0f} rows/s)"
+        )
+        if loader.skipped:
+            print(f"    not in the DDL, skipped: {', '.join(loader.skipped)}")
+    total_rows = sum(loader.rows for loader in loaders)
+    print(f"  {'total (wall)':<26} {total_rows:>10} rows {total:8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,50 +4,209 @@ Load Olist raw CSVs into Postgres raw_* tables using SQLAlchemy.
 
 Example:
   PG_PASSWORD=your_password python src/load_postgres.py
+  PG_PASSWORD=your_password python src/load_postgres.py --method copy
+  PG_PASSWORD=your_password python src/load_postgres.py --method copy --copy-format binary
+  PG_PASSWORD=your_password python src/load_postgres.py --method copy --jobs 4
+  PG_PASSWORD=your_password python src/load_postgres.py --profile
 """
 
 from __future__ import annotations
 
 import argparse
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Tuple
 
 import pandas as pd
 from sqlalchemy import create_engine
 
+from profiling import add_profile_argument, profile_run, step
+from schema import RAW_TABLE_FILES, apply_schema, read_csv_dtypes
+
 
 RAW_DIR = Path("data/raw")
 
-TABLE_FILES: Dict[str, str] = {
-    "raw_orders": "olist_orders_dataset.csv",
-    "raw_order_items": "olist_order_items_dataset.csv",
-    "raw_order_payments": "olist_order_payments_dataset.csv",
-    "raw_customers": "olist_customers_dataset.csv",
-    "raw_products": "olist_products_dataset.csv",
-    "raw_category_translation": "product_category_name_translation.csv",
-    "raw_sellers": "olist_sellers_dataset.csv",
-    "raw_geolocation": "olist_geolocation_dataset.csv",
-    "raw_reviews": "olist_order_reviews_dataset.csv",
-}
+# Rows sampled to infer column types when the loader creates the table.
+SCHEMA_SAMPLE_ROWS = 100_000
+
+# Rows held in memory at once per table by the insert path.
+READ_CHUNK_ROWS = 50_000
+
+# Table -> raw file; column types come from sql/ddl/01_raw_tables.sql.
+TABLE_FILES: Dict[str, str] = RAW_TABLE_FILES
 
 
-def build_engine(user: str, password: str, host: str, port: int, database: str):
+def build_engine(
+    user: str, password: str, host: str, port: int, database: str, pool_size: int = 5
+):
     url = f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}"
-    return create_engine(url, future=True)
-
-
-def load_table(engine, table_name: str, file_path: Path, if_exists: str) -> None:
-    df = pd.read_csv(file_path, low_memory=False)
-    df.to_sql(
-        table_name,
-        con=engine,
-        if_exists=if_exists,
-        index=False,
-        method="multi",
-        chunksize=10_000,
+    return create_engine(url, future=True, pool_size=pool_size, max_overflow=0)
+
+
+def check_chunk_types(chunk: pd.DataFrame, sample: pd.DataFrame, table_name: str) -> None:
+    # A column typed as integer from the sample must not receive fractions
+    # later on; Postgres would silently round them into the BIGINT column.
+    for col, dtype in sample.dtypes.items():
+        if not pd.api.types.is_integer_dtype(dtype):
+            continue
+        values = chunk[col]
+        if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 != 0).any():
+            raise ValueError(
+                f"{table_name}.{col} was typed as integer from the first "
+                f"{SCHEMA_SAMPLE_ROWS} rows but later rows have fractions; "
+                "raise SCHEMA_SAMPLE_ROWS."
+            )
+
+
+def load_table(
+    engine,
+    table_name: str,
+    file_path: Path,
+    if_exists: str,
+    chunksize: int = READ_CHUNK_ROWS,
+) -> int:
+    # Read in bounded chunks; all chunks go in one transaction so a failed
+    # load never leaves a half-filled table behind.
+    rows = 0
+    with engine.begin() as conn:
+        with step("create_table"):
+            sample = create_table_from_sample(conn, table_name, file_path, if_exists)
+        for chunk in read_typed_chunks(file_path, chunksize):
+            check_chunk_types(chunk, sample, table_name)
+            with step("insert_chunk", len(chunk)):
+                chunk.to_sql(
+                    table_name,
+                    con=conn,
+                    if_exists="append",
+                    index=False,
+                    method="multi",
+                    chunksize=10_000,
+                )
+            rows += len(chunk)
+    print(f"Loaded {rows} rows -> {table_name}")
+    return rows
+
+
+def read_typed_chunks(file_path: Path, chunksize: int):
+    # Registry dtypes (categoricals, narrow ints); timestamps stay text and are
+    # cast in SQL, as before.
+    reader = pd.read_csv(
+        file_path,
+        chunksize=chunksize,
+        low_memory=False,
+        dtype=read_csv_dtypes(file_path.name),
+    )
+    for chunk in reader:
+        yield apply_schema(chunk, file_path.name, timestamps=False)
+
+
+def create_table_from_sample(conn, table_name: str, file_path: Path, if_exists: str):
+    """
+    Create (or replace / check) table_name with the types to_sql would pick.
+
+    Types come from a sample of the file, so the COPY path ends up with the
+    same raw_* schema as the insert path. Returns the sampled frame.
+    """
+    sample = pd.read_csv(
+        file_path,
+        nrows=SCHEMA_SAMPLE_ROWS,
+        low_memory=False,
+        dtype=read_csv_dtypes(file_path.name),
     )
-    print(f"Loaded {len(df)} rows -> {table_name}")
+    sample = apply_schema(sample, file_path.name, timestamps=False)
+    sample.head(0).to_sql(table_name, con=conn, if_exists=if_exists, index=False)
+    return sample
+
+
+def arrow_column_types(sample: pd.DataFrame) -> dict:
+    import pyarrow as pa
+
+    column_types = {}
+    for col, dtype in sample.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            column_types[col] = pa.bool_()
+        elif pd.api.types.is_integer_dtype(dtype):
+            # Same width as the column to_sql created (SMALLINT/INTEGER/BIGINT).
+            column_types[col] = pa.from_numpy_dtype(dtype)
+        elif pd.api.types.is_float_dtype(dtype):
+            column_types[col] = pa.float64()
+        else:
+            column_types[col] = pa.string()
+    return column_types
+
+
+def load_table_copy(
+    engine, table_name: str, file_path: Path, if_exists: str, copy_format: str = "csv"
+) -> int:
+    """Stream a CSV into table_name with COPY FROM STDIN (csv or binary)."""
+    from pg_copy import copy_from_batches, copy_from_file, iter_csv_batches
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        with step("create_table"):
+            sample = create_table_from_sample(conn, table_name, file_path, if_exists)
+        columns = list(sample.columns)
+        cursor = conn.connection.cursor()
+        try:
+            with step(f"copy_{copy_format}") as s:
+                if copy_format == "csv":
+                    # The file goes to the server as-is; nothing is parsed here.
+                    rows = copy_from_file(cursor, table_name, columns, file_path)
+                else:
+                    batches = iter_csv_batches(file_path, arrow_column_types(sample))
+                    rows = copy_from_batches(cursor, table_name, columns, batches)
+                s.rows_out(rows)
+        finally:
+            cursor.close()
+
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed else float("inf")
+    print(
+        f"Loaded {rows} rows -> {table_name} "
+        f"(COPY {copy_format}, {elapsed:.2f}s, {rate:,.0f} rows/s)"
+    )
+    return rows
+
+
+def load_all(
+    engine,
+    tables: List[Tuple[str, Path]],
+    if_exists: str,
+    method: str = "insert",
+    copy_format: str = "csv",
+    jobs: int = 1,
+) -> Dict[str, Tuple[int, float]]:
+    """Load tables (largest file first) on up to `jobs` pooled connections."""
+    tables = sorted(tables, key=lambda item: item[1].stat().st_size, reverse=True)
+
+    def _load(table_name: str, file_path: Path) -> Tuple[int, float]:
+        start = time.perf_counter()
+        with step(table_name) as s:
+            if method == "copy":
+                rows = load_table_copy(
+                    engine, table_name, file_path, if_exists, copy_format
+                )
+            else:
+                rows = load_table(engine, table_name, file_path, if_exists)
+            s.rows_out(rows)
+        return rows, time.perf_counter() - start
+
+    results: Dict[str, Tuple[int, float]] = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(_load, table_name, file_path): table_name
+            for table_name, file_path in tables
+        }
+        try:
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return results
 
 
 def main() -> None:
@@ -62,23 +221,62 @@ def main() -> None:
         choices=["replace", "append", "fail"],
         help="Behavior if table exists (default: replace)",
     )
+    parser.add_argument(
+        "--method",
+        default="insert",
+        choices=["insert", "copy"],
+        help="insert: DataFrame.to_sql; copy: stream files with COPY FROM STDIN",
+    )
+    parser.add_argument(
+        "--copy-format",
+        default="csv",
+        choices=["csv", "binary"],
+        help="COPY wire format for --method copy (default: csv)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Tables loaded concurrently, one pooled connection each (default: 1)",
+    )
+    add_profile_argument(parser)
     args = parser.parse_args()
 
     password = os.getenv("PG_PASSWORD")
     if not password:
         raise SystemExit("PG_PASSWORD env var is required.")
+    if args.jobs < 1:
+        raise SystemExit("--jobs must be >= 1.")
 
-    engine = build_engine(args.user, password, args.host, args.port, args.db)
+    engine = build_engine(
+        args.user, password, args.host, args.port, args.db, pool_size=args.jobs
+    )
 
     with engine.connect() as conn:
         conn.exec_driver_sql("SELECT 1")
 
+    tables = []
     for table_name, filename in TABLE_FILES.items():
         file_path = RAW_DIR / filename
         if not file_path.exists():
             print(f"Skip missing file: {file_path}")
             continue
-        load_table(engine, table_name, file_path, args.if_exists)
+        tables.append((table_name, file_path))
+
+    start = time.perf_counter()
+    with profile_run("load_postgres", args.profile):
+        results = load_all(
+            engine, tables, args.if_exists, args.method, args.copy_format, args.jobs
+        )
+    total = time.perf_counter() - start
+
+    print("\nLoad timings:")
+    for table_name, (rows, elapsed) in sorted(
+        results.items(), key=lambda item: item[1][1], reverse=True
+    ):
+        print(f"  {table_name:<26} {rows:>10} rows {elapsed:8.2f}s")
+    total_rows = sum(rows for rows, _ in results.values())
+    print(f"  {'total (wall)':<26} {total_rows:>10} rows {total:8.2f}s")
 
 
 if __name__ == "__main__":
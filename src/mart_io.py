@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Read and write the marts in data/mart as CSV, Parquet or Arrow IPC.
+
+CSV stays the default (data/mart/<name>.csv). Parquet and Arrow marts are
+compressed datasets in data/mart/<name>.parquet/ or data/mart/<name>.arrow/.
+Fact tables are hive-partitioned by year_month (year_month=YYYY-MM/
+directories) of their purchase timestamp, so read_mart(..., year_months=[...])
+only opens the matching partitions. Rows read back from a partitioned mart
+come out grouped by partition, not in build order.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+from schema import decode_categoricals
+
+
+MART_DIR = Path("data/mart")
+
+FORMATS = ("csv", "parquet", "arrow")
+DEFAULT_COMPRESSION = "zstd"
+
+PARTITION_COLUMN = "year_month"
+
+# Mart name -> column whose month drives the partition.
+PARTITION_SOURCES: Dict[str, str] = {
+    "fact_orders": "order_purchase_ts",
+    "fact_order_items": "order_date",
+    "fact_seller_daily": "order_date",
+}
+
+_SUFFIXES = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+_DATASET_FORMATS = {"parquet": "parquet", "arrow": "ipc"}
+
+
+def mart_path(name: str, mart_dir: Path = MART_DIR, fmt: str = "csv") -> Path:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown mart format: {fmt} (expected one of {FORMATS})")
+    return mart_dir / f"{name}{_SUFFIXES[fmt]}"
+
+
+def add_partition_column(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    source = PARTITION_SOURCES[name]
+    df = df.copy()
+    df[PARTITION_COLUMN] = pd.to_datetime(df[source]).dt.strftime("%Y-%m")
+    return df
+
+
+class ChunkedMartWriter:
+    """
+    Write a mart in one or more chunks, then publish it atomically on close().
+
+    Output goes to a temporary path first, so readers never see a half-written
+    mart and a failed build leaves the previous one in place; discard() drops
+    the temporary output. A CSV mart is
+    swapped in with one rename. A directory (Parquet/Arrow) cannot replace a
+    non-empty one in a single rename: the previous mart is first renamed to
+    <mart>.old and deleted only once the new one is in place. A crash
+    between the two renames leaves it there, and the next writer puts it
+    back.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        mart_dir: Path = MART_DIR,
+        fmt: str = "csv",
+        compression: str = DEFAULT_COMPRESSION,
+    ) -> None:
+        self.name = name
+        self.fmt = fmt
+        self.compression = compression
+        self.path = mart_path(name, mart_dir, fmt)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.old_path = self.path.with_name(self.path.name + ".old")
+        self.partitioned = fmt != "csv" and name in PARTITION_SOURCES
+        self.rows = 0
+        self._chunks = 0
+        self._schema = None
+
+        mart_dir.mkdir(parents=True, exist_ok=True)
+        if self.old_path.exists():
+            if self.path.exists():
+                shutil.rmtree(self.old_path)
+            else:
+                os.replace(self.old_path, self.path)
+        self.discard()
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.fmt == "csv":
+            df.to_csv(
+                self.tmp_path,
+                mode="w" if self._chunks == 0 else "a",
+                header=self._chunks == 0,
+                index=False,
+            )
+        else:
+            self._write_dataset_chunk(df)
+        self.rows += len(df)
+        self._chunks += 1
+
+    def _arrow_table(self, df: pd.DataFrame):
+        import pyarrow as pa
+
+        # Categories differ from chunk to chunk; store plain values.
+        table = pa.Table.from_pandas(decode_categoricals(df), preserve_index=False)
+        if self._schema is None:
+            # All-null object columns come through as the null type; store them
+            # as strings so later chunks with values still match the schema.
+            fields = [
+                field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ]
+            self._schema = pa.schema(fields, metadata=table.schema.metadata)
+        return table.cast(self._schema)
+
+    def _write_dataset_chunk(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        if self.partitioned:
+            df = add_partition_column(df, self.name)
+        table = self._arrow_table(df)
+
+        file_format = ds.ParquetFileFormat() if self.fmt == "parquet" else ds.IpcFileFormat()
+        if self.fmt == "parquet":
+            file_options = file_format.make_write_options(compression=self.compression)
+        else:
+            file_options = file_format.make_write_options(
+                compression=pa.Codec(self.compression)
+            )
+
+        ds.write_dataset(
+            table,
+            self.tmp_path,
+            format=_DATASET_FORMATS[self.fmt],
+            file_options=file_options,
+            partitioning=(
+                ds.partitioning(
+                    pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive"
+                )
+                if self.partitioned
+                else None
+            ),
+            basename_template=f"part-{self._chunks:05d}-{{i}}{_SUFFIXES[self.fmt]}",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+    def discard(self) -> None:
+        """Drop what was written so far; the published mart is left as is."""
+        if self.tmp_path.is_dir():
+            shutil.rmtree(self.tmp_path)
+        elif self.tmp_path.exists():
+            self.tmp_path.unlink()
+
+    def close(self) -> Path:
+        if self._chunks == 0:
+            raise ValueError(f"No data written for mart {self.name}")
+        if not self.path.is_dir():
+            os.replace(self.tmp_path, self.path)
+            return self.path
+        os.replace(self.path, self.old_path)
+        os.replace(self.tmp_path, self.path)
+        shutil.rmtree(self.old_path)
+        return self.path
+
+
+def write_mart(
+    df: pd.DataFrame,
+    name: str,
+    mart_dir: Path = MART_DIR,
+    fmt: str = "csv",
+    compression: str = DEFAULT_COMPRESSION,
+) -> Path:
+    writer = ChunkedMartWriter(name, mart_dir, fmt, compression)
+    writer.write(df)
+    return writer.close()
+
+
+def read_mart(
+    name: str,
+    mart_dir: Path = MART_DIR,
+    fmt: str = "csv",
+    columns: Optional[Sequence[str]] = None,
+    year_months: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Read a mart back. For partitioned Parquet/Arrow marts, year_months
+    restricts the scan to those partitions (partition pruning).
+    """
+    path = mart_path(name, mart_dir, fmt)
+    if fmt == "csv":
+        df = pd.read_csv(path, usecols=columns)
+        if year_months is not None and name in PARTITION_SOURCES:
+            months = pd.to_datetime(df[PARTITION_SOURCES[name]]).dt.strftime("%Y-%m")
+            df = df[months.isin(year_months)]
+        return df
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(
+        path,
+        format=_DATASET_FORMATS[fmt],
+        partitioning=(
+            ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+            if name in PARTITION_SOURCES
+            else None
+        ),
+    )
+    row_filter = None
+    if year_months is not None and name in PARTITION_SOURCES:
+        row_filter = ds.field(PARTITION_COLUMN).isin(list(year_months))
+    table = dataset.to_table(
+        columns=list(columns) if columns else None, filter=row_filter
+    )
+    return table.to_pandas()
+
+
+def iter_mart_batches(
+    name: str,
+    mart_dir: Path = MART_DIR,
+    fmt: str = "arrow",
+    columns: Optional[Sequence[str]] = None,
+    batch_rows: Optional[int] = None,
+) -> Iterator:
+    """
+    Stream a Parquet/Arrow mart as Arrow record batches, without pandas.
+
+    Arrow IPC files are memory-mapped; with the default zstd compression the
+    buffers are still decompressed batch by batch.
+    """
+    if fmt == "csv":
+        raise ValueError("iter_mart_batches needs a parquet or arrow mart")
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    dataset = ds.dataset(
+        str(mart_path(name, mart_dir, fmt).resolve()),
+        format=_DATASET_FORMATS[fmt],
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+        partitioning=(
+            ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+            if name in PARTITION_SOURCES
+            else None
+        ),
+    )
+    options = {"batch_size": batch_rows} if batch_rows else {}
+    yield from dataset.to_batches(
+        columns=list(columns) if columns else None, **options
+    )
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Hash-partitioned execution of a mart builder over a process pool.
+
+The driving table is split by a hash of the partition key, each partition
+is built by a worker process and the results are put back in the row order
+of the driving table, so the output is identical to a serial build as long
+as the builder keeps one output row per input row, in input order (left
+joins on unique keys, as the fact builders do).
+
+Tables every partition needs (small dimensions) are passed once per worker
+through the pool initializer instead of being pickled with each task.
+
+Usage:
+  python src/transform.py --workers 4
+  python src/transform_items.py --workers 4
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from sketches import hash_keys
+
+
+_SHARED: Dict[str, pd.DataFrame] = {}
+
+
+def hash_partition(keys: pd.Series, partitions: int) -> np.ndarray:
+    """Partition number per row; the same key always lands in the same partition."""
+    return (hash_keys(keys) % np.uint64(partitions)).astype(np.int64)
+
+
+def split(df: pd.DataFrame, parts: np.ndarray, partitions: int) -> List[pd.DataFrame]:
+    """Rows of each partition, in their original relative order."""
+    order = np.argsort(parts, kind="stable")
+    bounds = np.searchsorted(parts[order], np.arange(partitions + 1))
+    df = df.take(order)
+    return [df.iloc[bounds[i] : bounds[i + 1]] for i in range(partitions)]
+
+
+def route(keys: pd.Series, lookup: pd.Series) -> np.ndarray:
+    """
+    Partition of each row by a key -> partition lookup (e.g. order_id of a
+    payment -> partition of its order); keys not in the lookup get -1.
+    """
+    parts = pd.Series(keys.to_numpy()).map(lookup)
+    return parts.fillna(-1).to_numpy(dtype=np.int64)
+
+
+def _init_worker(shared: Dict[str, pd.DataFrame]) -> None:
+    # A forked worker inherits the parent's profiling run; its steps would be
+    # recorded into a copy nobody reads.
+    profiling._RUN = None
+    _SHARED.clear()
+    _SHARED.update(shared)
+
+
+def _build_partition(
+    func: Callable[[dict], pd.DataFrame], tables: Dict[str, pd.DataFrame]
+) -> pd.DataFrame:
+    return func({**_SHARED, **tables})
+
+
+def run_partitioned(
+    func: Callable[[dict], pd.DataFrame],
+    driver: str,
+    tables: Dict[str, pd.DataFrame],
+    parts: Dict[str, np.ndarray],
+    workers: int,
+    shared: Optional[Dict[str, pd.DataFrame]] = None,
+) -> pd.DataFrame:
+    """
+    Build func({**shared, **partition}) for every partition and reassemble.
+
+    tables are split by parts (partition number per row, -1 drops the row);
+    the result follows the row order of tables[driver]. func must be a
+    module-level function so it pickles by reference.
+    """
+    if not len(tables[driver]):
+        return func({**(shared or {}), **tables})
+    partitions = workers
+    split_tables = {
+        name: split(df[parts[name] >= 0], parts[name][parts[name] >= 0], partitions)
+        for name, df in tables.items()
+    }
+    positions = split(
+        pd.Series(np.arange(len(tables[driver]))), parts[driver], partitions
+    )
+    tasks = [
+        {name: frames[i] for name, frames in split_tables.items()}
+        for i in range(partitions)
+        if len(split_tables[driver][i])
+    ]
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(shared or {},)
+    ) as pool:
+        results = list(pool.map(_build_partition, [func] * len(tasks), tasks))
+
+    result = pd.concat(results, ignore_index=True)
+    order = np.concatenate([p.to_numpy() for p in positions if len(p)])
+    if len(result) != len(order):
+        raise ValueError(
+            f"Partitioned build returned {len(result)} rows for {len(order)} "
+            f"{driver} rows; the builder must keep one row per input row"
+        )
+    # Row k of result came from driver row order[k]; invert the permutation.
+    return result.take(np.argsort(order)).reset_index(drop=True)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Postgres COPY helpers for the loaders.
+
+COPY FROM STDIN is fed either straight from a CSV file (FORMAT csv, no
+parsing on the Python side) or from Arrow record batches encoded into the
+PGCOPY binary format. The binary encoder is vectorized with numpy per batch,
+so there is no per-row Python work in either path. It covers integers,
+floats, booleans, strings, timestamps, dates and decimal128 (as NUMERIC);
+the Arrow type of each column must match the target column type.
+"""
+
+from __future__ import annotations
+
+import io
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+
+BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + (0).to_bytes(4, "big") + (0).to_bytes(4, "big")
+BINARY_TRAILER = (-1).to_bytes(2, "big", signed=True)
+
+DEFAULT_BATCH_BYTES = 8 << 20
+# Rows encoded at a time: bigger record batches are sliced (zero-copy) first,
+# so the COPY stream never holds more than a few MB of encoded tuples.
+ENCODE_ROWS = 8_192
+
+
+class IterStream(io.RawIOBase):
+    """Read-only file object over an iterator of bytes (for cursor.copy_expert)."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b"")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        # copy_expert reads 8 KB at a time: keep a read offset into the current
+        # chunk instead of slicing the rest of it off on every call.
+        while self._pos >= len(self._buffer):
+            try:
+                self._buffer = memoryview(next(self._chunks)).cast("B")
+            except StopIteration:
+                return 0
+            self._pos = 0
+        n = min(len(b), len(self._buffer) - self._pos)
+        b[:n] = self._buffer[self._pos : self._pos + n]
+        self._pos += n
+        return n
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def copy_sql(table_name: str, columns: Sequence[str], copy_format: str) -> str:
+    cols = ", ".join(quote_ident(col) for col in columns)
+    if copy_format == "csv":
+        options = "FORMAT csv, HEADER true, ENCODING 'UTF8'"
+    elif copy_format == "binary":
+        options = "FORMAT binary"
+    else:
+        raise ValueError(f"Unsupported COPY format: {copy_format}")
+    return f"COPY {quote_ident(table_name)} ({cols}) FROM STDIN WITH ({options})"
+
+
+def copy_from_file(cursor, table_name: str, columns: Sequence[str], path: Path) -> int:
+    with path.open("rb") as fh:
+        cursor.copy_expert(copy_sql(table_name, columns, "csv"), fh)
+    return cursor.rowcount
+
+
+def copy_from_batches(
+    cursor,
+    table_name: str,
+    columns: Sequence[str],
+    batches: Iterable[pa.RecordBatch],
+) -> int:
+    stream = IterStream(binary_copy_stream(batches))
+    cursor.copy_expert(copy_sql(table_name, columns, "binary"), stream)
+    return cursor.rowcount
+
+
+def iter_csv_batches(
+    path: Path,
+    column_types: Optional[Dict[str, pa.DataType]] = None,
+    block_size: int = DEFAULT_BATCH_BYTES,
+) -> Iterator[pa.RecordBatch]:
+    """Stream a CSV file as Arrow record batches of roughly block_size bytes."""
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=column_types or {}, strings_can_be_null=True
+        ),
+    )
+    for batch in reader:
+        yield batch
+
+
+# --- PGCOPY binary encoding -------------------------------------------------
+
+_FIXED_WIDTH = {
+    pa.int16(): ">i2",
+    pa.int32(): ">i4",
+    pa.int64(): ">i8",
+    pa.float32(): ">f4",
+    pa.float64(): ">f8",
+}
+
+# Postgres timestamps and dates count from 2000-01-01.
+_PG_EPOCH_DAYS = 10_957
+_PG_EPOCH_US = _PG_EPOCH_DAYS * 86_400 * 1_000_000
+
+# NUMERIC wire format: base-10000 digits, sign word for negatives.
+_NBASE_DIGITS = 4
+_NUMERIC_NEG = 0x4000
+# Largest precision whose digits fit an int64 once padded to whole base-10000
+# groups.
+MAX_NUMERIC_PRECISION = 15
+
+
+def _numeric_payload(column: pa.Array) -> np.ndarray:
+    """Fixed-width NUMERIC payload per row for a decimal128 column."""
+    n = len(column)
+    precision, scale = column.type.precision, column.type.scale
+    if precision > MAX_NUMERIC_PRECISION:
+        raise TypeError(f"No binary COPY encoding for {column.type}")
+    # decimal128 values are 16-byte little-endian integers; with at most 15
+    # digits the low word holds the whole value.
+    unscaled = np.frombuffer(column.buffers()[1], dtype="<i8").reshape(-1, 2)[
+        column.offset : column.offset + n, 0
+    ]
+    frac_groups = -(-scale // _NBASE_DIGITS)
+    int_groups = max(-(-(precision - scale) // _NBASE_DIGITS), 1)
+    ndigits = int_groups + frac_groups
+    units = np.abs(unscaled) * 10 ** (frac_groups * _NBASE_DIGITS - scale)
+
+    words = np.empty((n, 4 + ndigits), dtype=">i2")
+    words[:, 0] = ndigits
+    words[:, 1] = int_groups - 1  # weight of the first digit
+    words[:, 2] = np.where(unscaled < 0, _NUMERIC_NEG, 0)
+    words[:, 3] = scale
+    for i in range(ndigits):
+        words[:, 4 + i] = units // 10_000 ** (ndigits - 1 - i) % 10_000
+    # The server strips the leading / trailing zero digits.
+    return words.view(np.uint8).reshape(n, -1)
+
+
+def _fixed_width_payload(column: pa.Array) -> np.ndarray:
+    """Big-endian payload bytes[n, width] of a fixed-width column."""
+    n = len(column)
+    kind = column.type
+    if pa.types.is_boolean(kind):
+        values = column.fill_null(False).to_numpy(zero_copy_only=False)
+        return values.astype(np.uint8).reshape(n, 1)
+    if pa.types.is_decimal(kind):
+        return _numeric_payload(column)
+    if pa.types.is_timestamp(kind):
+        micros = column.cast(pa.timestamp("us", kind.tz), safe=False).cast(pa.int64())
+        values = micros.fill_null(0).to_numpy(zero_copy_only=False) - _PG_EPOCH_US
+        dtype = ">i8"
+    elif pa.types.is_date(kind):
+        days = column.cast(pa.date32()).cast(pa.int32())
+        values = days.fill_null(0).to_numpy(zero_copy_only=False) - _PG_EPOCH_DAYS
+        dtype = ">i4"
+    else:
+        values = column.fill_null(0).to_numpy(zero_copy_only=False)
+        dtype = _FIXED_WIDTH[kind]
+    return values.astype(dtype).view(np.uint8).reshape(n, -1)
+
+
+def _is_fixed_width(kind: pa.DataType) -> bool:
+    return (
+        kind in _FIXED_WIDTH
+        or pa.types.is_boolean(kind)
+        or pa.types.is_decimal128(kind)
+        or pa.types.is_timestamp(kind)
+        or pa.types.is_date(kind)
+    )
+
+
+def _column_pieces(column: pa.Array):
+    """Return (header_bytes[n,4], payload_lengths[n], payload_writer) for a column."""
+    n = len(column)
+    valid = (
+        np.ones(n, dtype=bool)
+        if column.null_count == 0
+        else column.is_valid().to_numpy(zero_copy_only=False)
+    )
+
+    if _is_fixed_width(column.type):
+        payload = _fixed_width_payload(column)
+        width = payload.shape[1]
+        lengths = np.where(valid, width, 0)
+
+        def write(out: np.ndarray, dest: np.ndarray) -> None:
+            rows = dest[valid]
+            out[rows[:, None] + np.arange(width)] = payload[valid]
+
+    elif pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        offset_type = np.int64 if pa.types.is_large_string(column.type) else np.int32
+        buffers = column.buffers()
+        offsets = np.frombuffer(buffers[1], dtype=offset_type)[
+            column.offset : column.offset + n + 1
+        ].astype(np.int64)
+        data = (
+            np.frombuffer(buffers[2], dtype=np.uint8)
+            if buffers[2] is not None
+            else np.empty(0, np.uint8)
+        )
+        lengths = np.diff(offsets)
+        src = data[offsets[0] : offsets[-1]]
+        src_starts = offsets[:-1] - offsets[0]
+
+        def write(out: np.ndarray, dest: np.ndarray) -> None:
+            total = int(lengths.sum())
+            if not total:
+                return
+            shift = np.repeat(dest - src_starts, lengths)
+            out[shift + np.arange(total)] = src
+
+    else:
+        raise TypeError(f"No binary COPY encoding for Arrow type {column.type}")
+
+    header = np.where(valid, lengths, -1).astype(">i4").view(np.uint8).reshape(n, 4)
+    return header, lengths.astype(np.int64), write
+
+
+def encode_binary_batch(batch: pa.RecordBatch) -> bytes:
+    """Encode one record batch as PGCOPY binary tuples (no file header)."""
+    n = batch.num_rows
+    if n == 0:
+        return b""
+    pieces = [_column_pieces(column) for column in batch.columns]
+
+    # Per-row size: int16 field count, then int32 length + payload per field.
+    row_lengths = 2 + sum(4 + lengths for _, lengths, _ in pieces)
+    row_starts = np.zeros(n, dtype=np.int64)
+    np.cumsum(row_lengths[:-1], out=row_starts[1:])
+    out = np.empty(int(row_starts[-1] + row_lengths[-1]), dtype=np.uint8)
+
+    field_count = np.array([batch.num_columns], dtype=">i2").view(np.uint8)
+    out[row_starts[:, None] + np.arange(2)] = field_count
+
+    cursor = row_starts + 2
+    for header, lengths, write in pieces:
+        out[cursor[:, None] + np.arange(4)] = header
+        cursor = cursor + 4
+        write(out, cursor)
+        cursor = cursor + lengths
+    return out.tobytes()
+
+
+def binary_copy_stream(batches: Iterable[pa.RecordBatch]) -> Iterator[bytes]:
+    yield BINARY_HEADER
+    for batch in batches:
+        for offset in range(0, batch.num_rows, ENCODE_ROWS):
+            encoded = encode_binary_batch(batch.slice(offset, ENCODE_ROWS))
+            if encoded:
+                yield encoded
+    yield BINARY_TRAILER
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Create monthly range partitions for the partitioned fact tables
+(sql/ddl/partitioned/*.sql) ahead of the data.
+
+Partitions cover every month from the first purchase in raw_orders (or the
+fact table itself when raw_orders is missing) up to --months-ahead months
+after the last one. Existing partitions are left alone. If rows for a new
+month already sit in the DEFAULT partition, they are moved into the new
+partition in the same transaction (Postgres refuses to create the partition
+otherwise).
+
+Usage:
+  PG_PASSWORD=your_password python src/pg_partitions.py
+  PG_PASSWORD=your_password python src/pg_partitions.py --months-ahead 6
+  PG_PASSWORD=your_password python src/pg_partitions.py --start 2016-09 --end 2019-12
+  PG_PASSWORD=your_password python src/pg_partitions.py --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from load_postgres import build_engine
+
+
+# Partitioned table -> range partition key.
+PARTITIONED_TABLES: Dict[str, str] = {
+    "fact_orders": "order_purchase_ts",
+    "fact_order_items": "order_purchase_ts",
+}
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def parse_month(value: str) -> date:
+    year, month = value.split("-")[:2]
+    return date(int(year), int(month), 1)
+
+
+def month_range(first: date, last: date) -> List[date]:
+    months = []
+    month = date(first.year, first.month, 1)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(conn, table: str) -> bool:
+    relkind = conn.exec_driver_sql(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,)
+    ).scalar()
+    return relkind == "p"
+
+
+def existing_partitions(conn, table: str) -> List[str]:
+    rows = conn.exec_driver_sql(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        """,
+        (table,),
+    )
+    return [row[0] for row in rows]
+
+
+def data_months(conn, table: str, column: str) -> Optional[Tuple[date, date]]:
+    """First and last purchase month, from raw_orders if loaded."""
+    if conn.exec_driver_sql("SELECT to_regclass('raw_orders')").scalar():
+        sql = (
+            "SELECT MIN(CAST(order_purchase_timestamp AS TIMESTAMP)), "
+            "MAX(CAST(order_purchase_timestamp AS TIMESTAMP)) FROM raw_orders"
+        )
+    else:
+        sql = f"SELECT MIN({column}), MAX({column}) FROM {table}"
+    first, last = conn.exec_driver_sql(sql).one()
+    if first is None:
+        return None
+    return first.date().replace(day=1), last.date().replace(day=1)
+
+
+def partition_ddl(table: str, month: date) -> str:
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+        f"PARTITION OF {table} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    )
+
+
+def create_partition(conn, table: str, column: str, month: date) -> int:
+    """Create one monthly partition; returns rows moved out of DEFAULT."""
+    name = partition_name(table, month)
+    default = f"{table}_default"
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    in_range = f"{column} >= '{lower}' AND {column} < '{upper}'"
+
+    moved = 0
+    if conn.exec_driver_sql("SELECT to_regclass(%s)", (default,)).scalar():
+        moved = conn.exec_driver_sql(
+            f"SELECT COUNT(*) FROM {default} WHERE {in_range}"
+        ).scalar()
+
+    if not moved:
+        conn.exec_driver_sql(partition_ddl(table, month))
+        return 0
+
+    # Rows of this month are already in DEFAULT: detach it, create the month,
+    # move the rows across and attach DEFAULT again.
+    conn.exec_driver_sql(f"ALTER TABLE {table} DETACH PARTITION {default}")
+    conn.exec_driver_sql(partition_ddl(table, month))
+    conn.exec_driver_sql(f"INSERT INTO {name} SELECT * FROM {default} WHERE {in_range}")
+    conn.exec_driver_sql(f"DELETE FROM {default} WHERE {in_range}")
+    conn.exec_driver_sql(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT")
+    return moved
+
+
+def ensure_partitions(
+    engine,
+    months_ahead: int = 3,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    dry_run: bool = False,
+) -> Dict[str, List[str]]:
+    created: Dict[str, List[str]] = {}
+    for table, column in PARTITIONED_TABLES.items():
+        with engine.begin() as conn:
+            if not is_partitioned(conn, table):
+                print(f"Skip {table}: not a partitioned table")
+                continue
+            months = data_months(conn, table, column)
+            first = start or (months[0] if months else date.today().replace(day=1))
+            last = end or add_months(months[1] if months else first, months_ahead)
+            existing = set(existing_partitions(conn, table))
+
+        created[table] = []
+        for month in month_range(first, last):
+            name = partition_name(table, month)
+            if name in existing:
+                continue
+            if dry_run:
+                print(partition_ddl(table, month) + ";")
+                created[table].append(name)
+                continue
+            # One transaction per month keeps the DEFAULT detach short.
+            with engine.begin() as conn:
+                moved = create_partition(conn, table, column, month)
+            if moved:
+                print(f"  {name}: moved {moved} rows out of {table}_default")
+            created[table].append(name)
+
+        print(
+            f"{table}: {len(created[table])} partitions "
+            f"{'to create' if dry_run else 'created'} "
+            f"({first:%Y-%m} .. {last:%Y-%m}), {len(existing)} already present"
+        )
+    return created
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--db", default="olist_analytics")
+    parser.add_argument(
+        "--months-ahead",
+        type=int,
+        default=3,
+        help="Empty partitions kept after the last purchase month (default: 3)",
+    )
+    parser.add_argument("--start", type=parse_month, help="First month (YYYY-MM)")
+    parser.add_argument("--end", type=parse_month, help="Last month (YYYY-MM)")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Print the DDL instead of running it"
+    )
+    args = parser.parse_args()
+
+    password = os.getenv("PG_PASSWORD")
+    if not password:
+        raise SystemExit("PG_PASSWORD env var is required.")
+    if args.months_ahead < 0:
+        raise SystemExit("--months-ahead must be >= 0.")
+
+    engine = build_engine(args.user, password, args.host, args.port, args.db)
+    ensure_partitions(
+        engine,
+        months_ahead=args.months_ahead,
+        start=args.start,
+        end=args.end,
+        dry_run=args.dry_run,
+    )
+
+
+if __name__ == "__main__":
+    main()
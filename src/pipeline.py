@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Build every mart (fact_orders, fact_order_items, fact_seller_daily, dim_date,
+dim_customer, cohort_retention, kpi_cube) in one process.
+
+Raw tables are loaded once through the raw cache, orders are joined to
+customers once, and the builders run concurrently on the shared frames before
+checks and writes. Stages form a small DAG; a stage starts as soon as all of
+its dependencies have finished.
+
+Usage:
+  python src/pipeline.py
+  python src/pipeline.py --max-workers 2
+  python src/pipeline.py --format parquet
+  python src/pipeline.py --profile
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import pandas as pd
+
+import build_dim_customer
+import build_kpi_cube
+import build_seller_daily
+import transform
+import transform_items
+from build_dim_date import build_dim_date
+from geo_index import load_zip_index
+from mart_io import FORMATS, write_mart
+from profiling import add_profile_argument, profile_run, step
+from raw_cache import read_raw
+from reviews import order_review_metrics
+
+
+RAW_DIR = Path("data/raw")
+MART_DIR = Path("data/mart")
+
+# Union of the columns the builders need from each raw file.
+RAW_TABLES: Dict[str, Tuple[str, List[str]]] = {
+    "orders": (
+        "olist_orders_dataset.csv",
+        [
+            "order_id",
+            "customer_id",
+            "order_status",
+            "order_purchase_timestamp",
+            "order_delivered_customer_date",
+            "order_estimated_delivery_date",
+        ],
+    ),
+    "items": (
+        "olist_order_items_dataset.csv",
+        [
+            "order_id",
+            "order_item_id",
+            "product_id",
+            "seller_id",
+            "price",
+            "freight_value",
+        ],
+    ),
+    "payments": (
+        "olist_order_payments_dataset.csv",
+        ["order_id", "payment_value"],
+    ),
+    "customers": (
+        "olist_customers_dataset.csv",
+        [
+            "customer_id",
+            "customer_unique_id",
+            "customer_zip_code_prefix",
+            "customer_city",
+            "customer_state",
+        ],
+    ),
+    "sellers": (
+        "olist_sellers_dataset.csv",
+        ["seller_id", "seller_zip_code_prefix", "seller_state"],
+    ),
+    "products": (
+        "olist_products_dataset.csv",
+        [
+            "product_id",
+            "product_category_name",
+            "product_weight_g",
+            "product_length_cm",
+            "product_height_cm",
+            "product_width_cm",
+        ],
+    ),
+    "category_translation": ("product_category_name_translation.csv", []),
+}
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    func: Callable[[dict], object]
+    deps: Tuple[str, ...] = ()
+
+
+def load_stage(ctx: dict) -> dict:
+    raw_dir = ctx["raw_dir"]
+    with ThreadPoolExecutor(max_workers=len(RAW_TABLES) + 2) as pool:
+        futures = {
+            name: pool.submit(read_raw, filename, columns or None, raw_dir)
+            for name, (filename, columns) in RAW_TABLES.items()
+        }
+        futures["zip_index"] = pool.submit(load_zip_index, raw_dir)
+        futures["reviews"] = pool.submit(order_review_metrics, raw_dir)
+        return {name: future.result() for name, future in futures.items()}
+
+
+def enrich_stage(ctx: dict) -> dict:
+    raw = dict(ctx["raw"])
+    raw["order_customers"] = transform.join_order_customers(
+        raw["orders"], raw["customers"]
+    )
+    return raw
+
+
+def checks_stage(ctx: dict) -> None:
+    # Sequential on purpose: the checks print their summaries.
+    print("== fact_orders checks")
+    transform.run_checks(ctx["fact_orders"])
+    print("\n== fact_order_items checks")
+    transform_items.run_checks(ctx["fact_order_items"])
+    print("\n== fact_seller_daily checks")
+    build_seller_daily.run_checks(ctx["fact_seller_daily"], ctx["raw"])
+    print("\n== dim_customer checks")
+    build_dim_customer.run_checks(
+        ctx["dim_customer"], ctx["cohort_retention"], ctx["fact_orders"]
+    )
+    print("\n== kpi_cube checks")
+    build_kpi_cube.run_checks(ctx["kpi_cube"], ctx["fact_orders"])
+
+
+def write_stage(name: str) -> Callable[[dict], Path]:
+    def _write(ctx: dict) -> Path:
+        return write_mart(ctx[name], name, ctx["mart_dir"], ctx["fmt"])
+
+    return _write
+
+
+STAGES: Sequence[Stage] = (
+    Stage("raw", load_stage),
+    Stage("enriched", enrich_stage, ("raw",)),
+    Stage(
+        "fact_orders",
+        lambda ctx: transform.build_fact_orders(ctx["enriched"]),
+        ("enriched",),
+    ),
+    Stage(
+        "fact_order_items",
+        lambda ctx: transform_items.build_fact_order_items(ctx["enriched"]),
+        ("enriched",),
+    ),
+    Stage(
+        "fact_seller_daily",
+        lambda ctx: build_seller_daily.build_fact_seller_daily(ctx["raw"]),
+        ("raw",),
+    ),
+    Stage("dim_date", lambda ctx: build_dim_date(ctx["raw"]["orders"]), ("raw",)),
+    Stage(
+        "dim_customer",
+        lambda ctx: build_dim_customer.build_dim_customer(ctx["fact_orders"]),
+        ("fact_orders",),
+    ),
+    Stage(
+        "cohort_retention",
+        lambda ctx: build_dim_customer.build_cohort_retention(
+            ctx["fact_orders"], ctx["dim_customer"]
+        ),
+        ("dim_customer",),
+    ),
+    Stage(
+        "kpi_cube",
+        lambda ctx: build_kpi_cube.build_kpi_cube(ctx["fact_orders"]),
+        ("fact_orders",),
+    ),
+    Stage(
+        "checks",
+        checks_stage,
+        (
+            "fact_orders",
+            "fact_order_items",
+            "fact_seller_daily",
+            "dim_date",
+            "cohort_retention",
+            "kpi_cube",
+        ),
+    ),
+    Stage("write_fact_orders", write_stage("fact_orders"), ("checks",)),
+    Stage("write_fact_order_items", write_stage("fact_order_items"), ("checks",)),
+    Stage("write_fact_seller_daily", write_stage("fact_seller_daily"), ("checks",)),
+    Stage("write_dim_date", write_stage("dim_date"), ("checks",)),
+    Stage("write_dim_customer", write_stage("dim_customer"), ("checks",)),
+    Stage("write_cohort_retention", write_stage("cohort_retention"), ("checks",)),
+    Stage("write_kpi_cube", write_stage("kpi_cube"), ("checks",)),
+)
+
+MARTS = (
+    "fact_orders",
+    "fact_order_items",
+    "fact_seller_daily",
+    "dim_date",
+    "dim_customer",
+    "cohort_retention",
+    "kpi_cube",
+)
+
+
+def run_stages(
+    stages: Sequence[Stage], ctx: dict, max_workers: int = 4
+) -> Dict[str, float]:
+    """Run stages in dependency order, concurrently where the DAG allows."""
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        unknown = set(stage.deps) - names
+        if unknown:
+            raise ValueError(f"Stage {stage.name} depends on unknown {sorted(unknown)}")
+
+    pending = {stage.name: stage for stage in stages}
+    done: set = set()
+    timings: Dict[str, float] = {}
+    running: dict = {}
+
+    def _timed(stage: Stage, snapshot: dict) -> Tuple[object, float]:
+        start = time.perf_counter()
+        with step(stage.name):
+            result = stage.func(snapshot)
+        return result, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            ready = [s for s in pending.values() if set(s.deps) <= done]
+            for stage in ready:
+                del pending[stage.name]
+                running[pool.submit(_timed, stage, dict(ctx))] = stage
+            if not running:
+                raise ValueError(f"Dependency cycle among stages: {sorted(pending)}")
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                ctx[stage.name], timings[stage.name] = future.result()
+                done.add(stage.name)
+
+    return timings
+
+
+def run_pipeline(
+    raw_dir: Path = RAW_DIR,
+    mart_dir: Path = MART_DIR,
+    max_workers: int = 4,
+    fmt: str = "csv",
+) -> Dict[str, pd.DataFrame]:
+    mart_dir.mkdir(parents=True, exist_ok=True)
+    ctx: dict = {"raw_dir": raw_dir, "mart_dir": mart_dir, "fmt": fmt}
+
+    start = time.perf_counter()
+    timings = run_stages(STAGES, ctx, max_workers=max_workers)
+    total = time.perf_counter() - start
+
+    print("\nStage timings:")
+    for stage in STAGES:
+        print(f"  {stage.name:<24} {timings[stage.name]:8.2f}s")
+    print(f"  {'total (wall)':<24} {total:8.2f}s")
+
+    for name in MARTS:
+        print(f"Wrote {len(ctx[name])} rows -> {ctx['write_' + name]}")
+
+    return {name: ctx[name] for name in MARTS}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    parser.add_argument("--mart-dir", type=Path, default=MART_DIR)
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=4,
+        help="Maximum number of stages running at once (default: 4)",
+    )
+    parser.add_argument(
+        "--format",
+        default="csv",
+        choices=FORMATS,
+        help="Mart output format (default: csv)",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.max_workers < 1:
+        parser.error("--max-workers must be >= 1")
+
+    with profile_run("pipeline", args.profile):
+        run_pipeline(
+            args.raw_dir, args.mart_dir, max_workers=args.max_workers, fmt=args.format
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Opt-in per-step instrumentation for the builders and the loader.
+
+Code marks named steps with `with step("merge_payments", rows_in=n) as s:`
+and reports output rows with `s.rows_out(len(df))`. Nothing is recorded
+unless a run is active (the scripts start one with --profile), so when
+profiling is off step() just hands back a shared no-op object.
+
+For every step the run log holds wall time, CPU time, growth of the
+process peak RSS, rows in/out and, for joins, the fan-out (rows out / rows
+in). Steps nest: a step opened inside another is recorded as
+"outer/inner". Steps running on other threads (pipeline, --jobs) share the
+same process RSS, so their peak deltas overlap.
+
+Usage:
+  python src/transform.py --profile
+  python src/transform_items.py --profile data/profile/items.json
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+PROFILE_DIR = Path("data/profile")
+
+_RUN: Optional["ProfileRun"] = None
+
+
+def peak_rss_mib() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class _NullStep:
+    def __enter__(self) -> "_NullStep":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def rows_out(self, rows: int) -> None:
+        return None
+
+
+_NULL_STEP = _NullStep()
+
+
+class Step:
+    def __init__(
+        self, run: "ProfileRun", name: str, rows_in: Optional[int], join: bool
+    ) -> None:
+        self.run = run
+        self.name = name
+        self.rows_in = rows_in
+        self.join = join
+        self._rows_out: Optional[int] = None
+
+    def rows_out(self, rows: int) -> None:
+        self._rows_out = int(rows)
+
+    def __enter__(self) -> "Step":
+        stack = self.run.stack()
+        self.path = "/".join([s.name for s in stack] + [self.name])
+        stack.append(self)
+        self._peak = peak_rss_mib()
+        self._cpu = time.thread_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        peak = peak_rss_mib()
+        self.run.stack().pop()
+
+        record = {
+            "step": self.path,
+            "thread": threading.current_thread().name,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "peak_rss_delta_mib": (
+                round(peak - self._peak, 2) if peak is not None else None
+            ),
+            "rows_in": self.rows_in,
+            "rows_out": self._rows_out,
+            "fan_out": None,
+            "failed": exc_type is not None,
+        }
+        if self.join and self.rows_in and self._rows_out is not None:
+            record["fan_out"] = round(self._rows_out / self.rows_in, 4)
+        self.run.add(record)
+
+
+class ProfileRun:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.started = datetime.now(timezone.utc)
+        self.records: List[dict] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    def stack(self) -> List[Step]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def add(self, record: dict) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def to_dict(self) -> dict:
+        return {
+            "run": self.name,
+            "started": self.started.isoformat(),
+            "argv": sys.argv,
+            "wall_s": round(time.perf_counter() - self._wall, 6),
+            "cpu_s": round(time.process_time() - self._cpu, 6),
+            "peak_rss_mib": peak_rss_mib(),
+            "steps": self.records,
+        }
+
+
+def step(name: str, rows_in: Optional[int] = None, join: bool = False):
+    """Context manager timing one named step; a no-op unless a run is active."""
+    if _RUN is None:
+        return _NULL_STEP
+    return Step(_RUN, name, rows_in, join)
+
+
+def summarize(records: List[dict]) -> Dict[str, dict]:
+    """Aggregate repeated steps (per chunk, per table) by step path."""
+    summary: Dict[str, dict] = {}
+    for record in records:
+        agg = summary.setdefault(
+            record["step"],
+            {
+                "calls": 0,
+                "wall_s": 0.0,
+                "cpu_s": 0.0,
+                "peak_rss_delta_mib": 0.0,
+                "rows_in": 0,
+                "rows_out": 0,
+                "fan_out": None,
+            },
+        )
+        agg["calls"] += 1
+        agg["wall_s"] += record["wall_s"]
+        agg["cpu_s"] += record["cpu_s"]
+        agg["peak_rss_delta_mib"] += record["peak_rss_delta_mib"] or 0.0
+        agg["rows_in"] += record["rows_in"] or 0
+        agg["rows_out"] += record["rows_out"] or 0
+        if record["fan_out"] is not None and agg["rows_in"]:
+            agg["fan_out"] = agg["rows_out"] / agg["rows_in"]
+    return summary
+
+
+def print_summary(run: dict) -> None:
+    print(
+        f"\nProfile ({run['run']}): "
+        f"{run['wall_s']:.2f}s wall, {run['cpu_s']:.2f}s CPU"
+    )
+    print(
+        f"  {'step':<44} {'calls':>5} {'wall s':>8} {'cpu s':>8} "
+        f"{'+peak MiB':>9} {'rows in':>10} {'rows out':>10} {'fan-out':>7}"
+    )
+    for name, agg in summarize(run["steps"]).items():
+        fan_out = f"{agg['fan_out']:7.3f}" if agg["fan_out"] is not None else ""
+        print(
+            f"  {name:<44} {agg['calls']:>5} "
+            f"{agg['wall_s']:8.3f} {agg['cpu_s']:8.3f} "
+            f"{agg['peak_rss_delta_mib']:9.1f} {agg['rows_in'] or '':>10} "
+            f"{agg['rows_out'] or '':>10} {fan_out:>7}"
+        )
+
+
+def add_profile_argument(parser) -> None:
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help=(
+            "Record per-step timings and write a JSON run log "
+            f"(default path: {PROFILE_DIR}/<script>-<timestamp>.json)"
+        ),
+    )
+
+
+@contextmanager
+def profile_run(name: str, path: Optional[str]) -> Iterator[Optional[ProfileRun]]:
+    """
+    Activate profiling for the body when path is not None (the --profile
+    value), then write the run log and print a per-step summary.
+    """
+    global _RUN
+    if path is None:
+        yield None
+        return
+
+    run = ProfileRun(name)
+    _RUN = run
+    try:
+        yield run
+    finally:
+        _RUN = None
+        data = run.to_dict()
+        out_path = Path(path) if path else (
+            PROFILE_DIR / f"{name}-{run.started.strftime('%Y%m%dT%H%M%SZ')}.json"
+        )
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        print_summary(data)
+        print(f"Wrote profile -> {out_path}")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Columnar cache for the raw Olist CSVs.
+
+Each file in data/raw is parsed once into Parquet under data/cache/raw, typed
+by the schema registry (categoricals, narrow integers, parsed timestamps; see
+schema.py). A small JSON manifest next to each cache file records the source
+size, mtime and sha256 plus the column types used, so later reads only pay for
+the columns they ask for, and a changed source file or DDL is detected and
+re-converted automatically.
+
+Usage:
+  python src/raw_cache.py            # warm the cache for every file in data/raw
+  python src/raw_cache.py --rebuild  # force re-conversion
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import pandas as pd
+
+from schema import apply_schema, columns_for_file, read_csv_dtypes
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # pragma: no cover - CSV fallback without a columnar cache
+    pyarrow = None
+
+
+RAW_DIR = Path("data/raw")
+
+def default_cache_dir(raw_dir: Path) -> Path:
+    # data/raw -> data/cache/raw; keeps caches of different raw drops apart.
+    return raw_dir.parent / "cache" / raw_dir.name
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def schema_signature(filename: str) -> Dict[str, str]:
+    # Stored in the manifest: a DDL type change invalidates the cache.
+    return {
+        name: f"{column.sql_type}{'' if column.nullable else ' NOT NULL'}"
+        for name, column in columns_for_file(filename).items()
+    }
+
+
+def read_csv(
+    filename: str,
+    columns: Optional[Sequence[str]] = None,
+    raw_dir: Path = RAW_DIR,
+) -> pd.DataFrame:
+    df = pd.read_csv(
+        raw_dir / filename,
+        usecols=columns,
+        dtype=read_csv_dtypes(filename, columns),
+    )
+    return apply_schema(df, filename)
+
+
+def _manifest_path(cache_dir: Path, filename: str) -> Path:
+    return cache_dir / f"{Path(filename).stem}.json"
+
+
+def _load_manifest(path: Path) -> Optional[dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: Path, payload: dict) -> None:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def ensure_cached(
+    filename: str,
+    raw_dir: Path = RAW_DIR,
+    cache_dir: Optional[Path] = None,
+    rebuild: bool = False,
+) -> Path:
+    """Return the Parquet cache path for a raw file, (re)building it if stale."""
+    source = raw_dir / filename
+    cache_dir = cache_dir or default_cache_dir(raw_dir)
+    manifest_path = _manifest_path(cache_dir, filename)
+    manifest = _load_manifest(manifest_path)
+    stat = source.stat()
+    signature = schema_signature(filename)
+
+    if (
+        not rebuild
+        and manifest
+        and manifest.get("schema") == signature
+        and (cache_dir / manifest["cache_file"]).exists()
+    ):
+        # Fast path: same size and mtime means the file was not touched.
+        if (
+            manifest["size"] == stat.st_size
+            and manifest["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return cache_dir / manifest["cache_file"]
+
+        # Touched but possibly identical (e.g. re-downloaded): compare content.
+        sha256 = file_sha256(source)
+        if manifest["sha256"] == sha256:
+            manifest.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            _write_json(manifest_path, manifest)
+            return cache_dir / manifest["cache_file"]
+    else:
+        sha256 = file_sha256(source)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_file = f"{Path(filename).stem}.{sha256[:16]}.parquet"
+    df = read_csv(filename, raw_dir=raw_dir)
+    tmp_path = cache_dir / (cache_file + ".tmp")
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cache_dir / cache_file)
+
+    if manifest and manifest["cache_file"] != cache_file:
+        (cache_dir / manifest["cache_file"]).unlink(missing_ok=True)
+
+    _write_json(
+        manifest_path,
+        {
+            "source": filename,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "cache_file": cache_file,
+            "rows": len(df),
+            "schema": signature,
+        },
+    )
+    return cache_dir / cache_file
+
+
+def read_raw(
+    filename: str,
+    columns: Optional[Sequence[str]] = None,
+    raw_dir: Path = RAW_DIR,
+    cache_dir: Optional[Path] = None,
+) -> pd.DataFrame:
+    """Read a raw Olist file (optionally only some columns) via the cache."""
+    if pyarrow is None:
+        return read_csv(filename, columns=columns, raw_dir=raw_dir)
+    path = ensure_cached(filename, raw_dir=raw_dir, cache_dir=cache_dir)
+    return pd.read_parquet(path, columns=list(columns) if columns else None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    if pyarrow is None:
+        raise SystemExit("pyarrow is required to build the raw cache.")
+
+    for source in sorted(args.raw_dir.glob("*.csv")):
+        path = ensure_cached(source.name, raw_dir=args.raw_dir, rebuild=args.rebuild)
+        print(f"Cached {source.name} -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Refresh the KPI materialized views (sql/views/*.sql) after the transforms.
+
+Views are refreshed in dependency order (a view built on another view waits
+for it), read from the Postgres catalog. Each refresh runs in its own
+transaction with REFRESH MATERIALIZED VIEW CONCURRENTLY, so readers keep
+querying the previous contents until the new ones are swapped in. A view
+that has never been populated or lacks a unique index cannot be refreshed
+concurrently and falls back to a plain REFRESH (which blocks readers).
+
+Usage:
+  PG_PASSWORD=your_password python src/refresh_views.py
+  PG_PASSWORD=your_password python src/refresh_views.py --create
+  PG_PASSWORD=your_password python src/refresh_views.py mv_daily_kpis mv_monthly_kpis
+  PG_PASSWORD=your_password python src/refresh_views.py --profile
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from graphlib import TopologicalSorter
+from pathlib import Path
+from typing import Dict, List, Sequence, Set, Tuple
+
+from load_postgres import build_engine
+from profiling import add_profile_argument, profile_run, step
+
+
+VIEW_DIR = Path(__file__).resolve().parents[1] / "sql" / "views"
+
+# Materialized views of the current schema and whether they hold data.
+MATVIEWS_SQL = """
+SELECT matviewname, ispopulated
+FROM pg_matviews
+WHERE schemaname = current_schema()
+"""
+
+# Materialized view -> materialized views it selects from.
+MATVIEW_DEPS_SQL = """
+SELECT DISTINCT v.relname, src.relname
+FROM pg_depend d
+JOIN pg_rewrite r ON r.oid = d.objid
+JOIN pg_class v ON v.oid = r.ev_class
+JOIN pg_class src ON src.oid = d.refobjid
+WHERE v.relkind = 'm'
+  AND src.relkind = 'm'
+  AND src.oid <> v.oid
+  AND v.relnamespace = to_regnamespace(current_schema())
+"""
+
+# Unique, non-partial index: required by REFRESH ... CONCURRENTLY.
+UNIQUE_INDEX_SQL = """
+SELECT EXISTS (
+    SELECT 1
+    FROM pg_index
+    WHERE indrelid = to_regclass(%s)
+      AND indisunique
+      AND indpred IS NULL
+)
+"""
+
+
+def create_views(engine, view_dir: Path = VIEW_DIR) -> List[Path]:
+    paths = sorted(view_dir.glob("*.sql"))
+    for path in paths:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(path.read_text(encoding="utf-8"))
+    return paths
+
+
+def refresh_order(views: Sequence[str], deps: Dict[str, Set[str]]) -> List[str]:
+    """Views ordered so each one follows the views it reads from."""
+    selected = set(views)
+    sorter: TopologicalSorter = TopologicalSorter()
+    for view in sorted(selected):
+        sorter.add(view, *sorted(deps.get(view, set()) & selected))
+    return list(sorter.static_order())
+
+
+def load_catalog(conn) -> Tuple[Dict[str, bool], Dict[str, Set[str]]]:
+    populated = {name: bool(flag) for name, flag in conn.exec_driver_sql(MATVIEWS_SQL)}
+    deps: Dict[str, Set[str]] = {}
+    for view, source in conn.exec_driver_sql(MATVIEW_DEPS_SQL):
+        deps.setdefault(view, set()).add(source)
+    return populated, deps
+
+
+def refresh_view(engine, view: str, populated: bool) -> Tuple[str, float]:
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        concurrent = populated and conn.exec_driver_sql(
+            UNIQUE_INDEX_SQL, (view,)
+        ).scalar()
+        mode = "concurrently" if concurrent else "blocking"
+        with step(f"refresh_{view}"):
+            conn.exec_driver_sql(
+                "REFRESH MATERIALIZED VIEW "
+                f"{'CONCURRENTLY ' if concurrent else ''}{view}"
+            )
+    return mode, time.perf_counter() - start
+
+
+def refresh_views(engine, views: Sequence[str] = ()) -> Dict[str, Tuple[str, float]]:
+    with engine.connect() as conn:
+        populated, deps = load_catalog(conn)
+
+    unknown = sorted(set(views) - set(populated))
+    if unknown:
+        raise SystemExit(f"Unknown materialized views: {', '.join(unknown)}")
+
+    results: Dict[str, Tuple[str, float]] = {}
+    for view in refresh_order(views or list(populated), deps):
+        results[view] = refresh_view(engine, view, populated[view])
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("views", nargs="*", help="Views to refresh (default: all)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--db", default="olist_analytics")
+    parser.add_argument(
+        "--create",
+        action="store_true",
+        help="Create missing views from sql/views/*.sql before refreshing",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    password = os.getenv("PG_PASSWORD")
+    if not password:
+        raise SystemExit("PG_PASSWORD env var is required.")
+
+    engine = build_engine(args.user, password, args.host, args.port, args.db)
+
+    start = time.perf_counter()
+    with profile_run("refresh_views", args.profile):
+        if args.create:
+            with step("create_views"):
+                paths = create_views(engine)
+            print(f"Applied {len(paths)} view definitions from {VIEW_DIR}")
+        results = refresh_views(engine, args.views)
+    total = time.perf_counter() - start
+
+    print("\nRefresh timings:")
+    for view, (mode, elapsed) in results.items():
+        print(f"  {view:<28} {mode:<13} {elapsed:8.2f}s")
+    print(f"  {'total (wall)':<28} {'':<13} {total:8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Order-grain review metrics streamed from the reviews file.
+
+Most of olist_order_reviews_dataset.csv is the free-text comment title and
+message. They are never parsed into Python objects: the file is read in
+chunks with usecols restricted to the order id, the score and the two
+timestamps (registry dtypes, see schema.py). Each chunk is reduced right away
+to per-order sums (score, reviews, response seconds), which are mergeable, so
+peak memory is one chunk of four columns plus one small row per order.
+
+Per order:
+  review_score_avg           mean review_score
+  reviews_cnt                number of reviews with a review_score
+  review_response_hours_avg  mean hours from review_creation_date to
+                             review_answer_timestamp
+
+Usage:
+  python src/reviews.py
+  python src/reviews.py --chunksize 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from schema import apply_schema, read_csv_dtypes
+
+
+RAW_DIR = Path("data/raw")
+REVIEWS_FILE = "olist_order_reviews_dataset.csv"
+# Everything but review_id and the review_comment_* text columns.
+REVIEW_COLUMNS = [
+    "order_id",
+    "review_score",
+    "review_creation_date",
+    "review_answer_timestamp",
+]
+REVIEW_METRICS = ["review_score_avg", "reviews_cnt", "review_response_hours_avg"]
+
+CHUNKSIZE = 200_000
+# Fold the per-chunk partials together once this many have piled up.
+_FOLD_EVERY = 16
+
+
+def _hundredths(num: pd.Series, den: pd.Series) -> np.ndarray:
+    """
+    num / den to 0.01, half away from zero. One division of the exact sums,
+    so ties (whole seconds make many) round like the SQL NUMERIC columns.
+    """
+    scaled = (num * 100 / den.replace(0, np.nan)).to_numpy(dtype="float64")
+    return np.sign(scaled) * np.floor(np.abs(scaled) + 0.5) / 100
+
+
+def _order_sums(chunk: pd.DataFrame) -> pd.DataFrame:
+    seconds = (
+        chunk["review_answer_timestamp"] - chunk["review_creation_date"]
+    ).dt.total_seconds()
+    # Only scored reviews count, so the mean and the count agree.
+    scores = chunk["review_score"].astype("float64")
+    return (
+        pd.DataFrame(
+            {
+                "order_id": chunk["order_id"].to_numpy(),
+                "score_sum": scores.fillna(0).to_numpy(),
+                "reviews_cnt": scores.notna().to_numpy(dtype="int64"),
+                "seconds_sum": seconds.fillna(0).to_numpy(),
+                "seconds_cnt": seconds.notna().to_numpy(dtype="int64"),
+            }
+        )
+        .groupby("order_id", sort=False)
+        .sum()
+    )
+
+
+def _fold(partials: List[pd.DataFrame]) -> pd.DataFrame:
+    return pd.concat(partials).groupby(level=0, sort=False).sum()
+
+
+def order_review_metrics(
+    raw_dir: Path = RAW_DIR, chunksize: int = CHUNKSIZE
+) -> Optional[pd.DataFrame]:
+    """order_id + REVIEW_METRICS, or None when raw_dir has no reviews file."""
+    path = raw_dir / REVIEWS_FILE
+    if not path.exists():
+        return None
+
+    reader = pd.read_csv(
+        path,
+        usecols=REVIEW_COLUMNS,
+        dtype=read_csv_dtypes(REVIEWS_FILE, REVIEW_COLUMNS),
+        chunksize=chunksize,
+    )
+    partials: List[pd.DataFrame] = []
+    for chunk in reader:
+        partials.append(_order_sums(apply_schema(chunk, REVIEWS_FILE)))
+        if len(partials) >= _FOLD_EVERY:
+            partials = [_fold(partials)]
+    if not partials:
+        return pd.DataFrame(
+            {"order_id": pd.Series(dtype=str), **{m: [] for m in REVIEW_METRICS}}
+        )
+
+    sums = _fold(partials).sort_index()
+    metrics = pd.DataFrame(
+        {
+            "order_id": sums.index.to_numpy(),
+            "review_score_avg": _hundredths(sums["score_sum"], sums["reviews_cnt"]),
+            "reviews_cnt": sums["reviews_cnt"].to_numpy(dtype="int64"),
+            "review_response_hours_avg": _hundredths(
+                sums["seconds_sum"], sums["seconds_cnt"] * 3600
+            ),
+        }
+    )
+    return metrics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    metrics = order_review_metrics(args.raw_dir, args.chunksize)
+    if metrics is None:
+        raise SystemExit(f"{args.raw_dir / REVIEWS_FILE} not found.")
+    seconds = time.perf_counter() - start
+    print(
+        f"{int(metrics['reviews_cnt'].sum())} reviews -> {len(metrics)} orders "
+        f"in {seconds:.2f}s ({metrics.memory_usage(deep=True).sum() / 1e6:.1f} MB)"
+    )
+    print(metrics[REVIEW_METRICS].describe().round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
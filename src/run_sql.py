@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+Run sql/ddl, sql/transform and sql/checks against Postgres as one DAG.
+
+Dependencies are inferred from the files themselves: a file depends on every
+earlier file (by stage, then numeric prefix) that creates or writes a table
+it reads or writes. Files without a path between them run concurrently on
+pooled connections (e.g. the fact_order_items and dim_date transforms), each
+in its own transaction.
+
+Every check statement is timed and its result captured;
+docs/sql_checks_report.md is regenerated from them. A check fails when:
+- its comment says "should return 0" / "should be 0" and any value is not 0
+  ("should return 0 rows": any row comes back),
+- a result column is above a --threshold NAME=MAX bound,
+- a statement takes longer than --max-seconds.
+The first failure (a failed check or any SQL error) stops scheduling
+further files; the report is still written for what ran, and the exit code
+is 1. --partitioned and --incremental are exclusive: the incremental upserts
+need the unpartitioned primary keys for ON CONFLICT.
+
+Usage:
+  PG_PASSWORD=your_password python src/run_sql.py
+  PG_PASSWORD=your_password python src/run_sql.py --jobs 8 --truncate
+  PG_PASSWORD=your_password python src/run_sql.py --stages checks --threshold payment_null_rate=0.001
+  PG_PASSWORD=your_password python src/run_sql.py --partitioned
+  PG_PASSWORD=your_password python src/run_sql.py --incremental
+  python src/run_sql.py --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from pipeline import Stage, run_stages
+from profiling import add_profile_argument, profile_run
+
+
+SQL_DIR = Path(__file__).resolve().parents[1] / "sql"
+REPORT_PATH = Path("docs/sql_checks_report.md")
+
+STAGES = ("ddl", "transform", "checks")
+
+_CREATES = re.compile(
+    r"\bCREATE\s+(?:UNLOGGED\s+)?(?:TABLE|MATERIALIZED\s+VIEW)\s+"
+    r"(?:IF\s+NOT\s+EXISTS\s+)?(\w+)",
+    re.IGNORECASE,
+)
+_WRITES = re.compile(
+    r"\b(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?)\s+(?!SET\b)(\w+)",
+    re.IGNORECASE,
+)
+_INSERTS = re.compile(r"\bINSERT\s+INTO\s+(\w+)", re.IGNORECASE)
+_READS = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)", re.IGNORECASE)
+_TRIGGERS = re.compile(
+    r"\bCREATE\s+(?:OR\s+REPLACE\s+)?TRIGGER\s+\w+\s+[\w\s]*?\bON\s+(\w+)",
+    re.IGNORECASE,
+)
+_DOLLAR_QUOTE = re.compile(r"\$\w*\$")
+_EXPECT_ZERO = re.compile(r"should (?:return|be) 0\b( rows)?", re.IGNORECASE)
+_TRANSACTION = re.compile(r"^(?:BEGIN|COMMIT|START\s+TRANSACTION)$", re.IGNORECASE)
+
+
+class SqlFailed(Exception):
+    def __init__(self, message: str, results: List["StatementResult"]) -> None:
+        super().__init__(message)
+        self.results = results
+
+
+class CheckFailed(SqlFailed):
+    pass
+
+
+@dataclass
+class SqlFile:
+    stage: str
+    path: Path
+    creates: Set[str] = field(default_factory=set)
+    writes: Set[str] = field(default_factory=set)
+    reads: Set[str] = field(default_factory=set)
+
+    @property
+    def name(self) -> str:
+        return f"{self.stage}/{self.path.name}"
+
+    @property
+    def sort_key(self) -> Tuple[int, int, str]:
+        prefix = re.match(r"(\d+)", self.path.name)
+        return (
+            STAGES.index(self.stage),
+            int(prefix.group(1)) if prefix else 0,
+            self.path.name,
+        )
+
+
+@dataclass
+class StatementResult:
+    comment: str
+    columns: List[str]
+    rows: List[tuple]
+    seconds: float
+    failure: Optional[str] = None
+
+
+def split_statements(sql: str) -> List[Tuple[str, str]]:
+    """(leading comment, statement) pairs; ';' inside quotes, $$ bodies or comments is kept."""
+    statements: List[Tuple[str, str]] = []
+    comment: List[str] = []
+    current: List[str] = []
+    i, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            end = n if end == -1 else end
+            pending = "".join(current)
+            if not pending.strip():
+                # A blank line starts a new comment block (drops file headers).
+                if pending.count("\n") > 1:
+                    comment = []
+                comment.append(sql[i + 2 : end].strip())
+                current = []
+            i = end
+            continue
+        if ch == "'":
+            end = i + 1
+            while end < n:
+                if sql[end] == "'" and not sql.startswith("''", end):
+                    break
+                end += 2 if sql.startswith("''", end) else 1
+            current.append(sql[i : end + 1])
+            i = end + 1
+            continue
+        tag = _DOLLAR_QUOTE.match(sql, i) if ch == "$" else None
+        if tag:
+            end = sql.find(tag.group(), tag.end())
+            end = n if end == -1 else end + len(tag.group())
+            current.append(sql[i:end])
+            i = end
+            continue
+        if ch == ";":
+            statement = "".join(current).strip()
+            if statement:
+                statements.append((" ".join(comment), statement))
+            comment, current = [], []
+        else:
+            current.append(ch)
+        i += 1
+    statement = "".join(current).strip()
+    if statement:
+        statements.append((" ".join(comment), statement))
+    return statements
+
+
+def parse_file(stage: str, path: Path) -> SqlFile:
+    sql_file = SqlFile(stage, path)
+    for _, statement in split_statements(path.read_text(encoding="utf-8")):
+        sql_file.creates.update(t.lower() for t in _CREATES.findall(statement))
+        sql_file.writes.update(t.lower() for t in _WRITES.findall(statement))
+        sql_file.reads.update(t.lower() for t in _READS.findall(statement))
+        sql_file.reads.update(t.lower() for t in _TRIGGERS.findall(statement))
+    return sql_file
+
+
+def discover(
+    stages: Sequence[str] = STAGES,
+    sql_dir: Path = SQL_DIR,
+    partitioned: bool = False,
+    incremental: bool = False,
+) -> List[SqlFile]:
+    """SQL files per stage; variants replace the files with the same name."""
+    variants = {
+        "ddl": sql_dir / "ddl" / "partitioned" if partitioned else None,
+        "transform": sql_dir / "incremental" if incremental else None,
+    }
+    files: List[SqlFile] = []
+    for stage in stages:
+        paths = {path.name: path for path in sorted((sql_dir / stage).glob("*.sql"))}
+        variant_dir = variants.get(stage)
+        if variant_dir is not None:
+            paths.update({path.name: path for path in variant_dir.glob("*.sql")})
+        files += [parse_file(stage, path) for path in paths.values()]
+    return sorted(files, key=lambda f: f.sort_key)
+
+
+def infer_dependencies(files: Sequence[SqlFile]) -> Dict[str, Set[str]]:
+    """File -> earlier files producing a table it reads or writes."""
+    deps: Dict[str, Set[str]] = {}
+    for i, sql_file in enumerate(files):
+        touched = sql_file.reads | sql_file.writes
+        deps[sql_file.name] = {
+            earlier.name
+            for earlier in files[:i]
+            if earlier.sort_key < sql_file.sort_key
+            and touched & (earlier.creates | earlier.writes)
+        }
+    return deps
+
+
+def parse_thresholds(values: Sequence[str]) -> Dict[str, float]:
+    thresholds: Dict[str, float] = {}
+    for value in values:
+        name, sep, limit = value.partition("=")
+        if not sep:
+            raise SystemExit(f"--threshold expects NAME=MAX, got {value!r}")
+        thresholds[name.strip()] = float(limit)
+    return thresholds
+
+
+def check_failure(
+    result: StatementResult, thresholds: Dict[str, float], max_seconds: Optional[float]
+) -> Optional[str]:
+    expect = _EXPECT_ZERO.search(result.comment)
+    if expect and expect.group(1):
+        if result.rows:
+            return f"expected 0 rows, got {len(result.rows)}"
+    elif expect:
+        bad = [
+            f"{col}={value}"
+            for row in result.rows
+            for col, value in zip(result.columns, row)
+            if value not in (0, None)
+        ]
+        if bad:
+            return "expected 0, got " + ", ".join(bad)
+    for row in result.rows:
+        for col, value in zip(result.columns, row):
+            limit = thresholds.get(col)
+            if limit is not None and value is not None and float(value) > limit:
+                return f"{col}={value} exceeds threshold {limit}"
+    if max_seconds is not None and result.seconds > max_seconds:
+        return f"took {result.seconds:.2f}s (max {max_seconds}s)"
+    return None
+
+
+def is_incremental(sql_file: SqlFile) -> bool:
+    return sql_file.path.parent.name == "incremental"
+
+
+def run_file(
+    engine,
+    sql_file: SqlFile,
+    truncate: bool,
+    thresholds: Dict[str, float],
+    max_seconds: Optional[float],
+) -> List[StatementResult]:
+    results: List[StatementResult] = []
+    statements = split_statements(sql_file.path.read_text(encoding="utf-8"))
+    with engine.begin() as conn:
+        # Incremental upserts keep their rows (their state would be stale).
+        if truncate and sql_file.stage == "transform" and not is_incremental(sql_file):
+            targets = {t.lower() for _, sql in statements for t in _INSERTS.findall(sql)}
+            for table in sorted(targets):
+                conn.exec_driver_sql(f"TRUNCATE {table}")
+        for comment, statement in statements:
+            # Each file already runs in its own transaction.
+            if _TRANSACTION.match(statement):
+                continue
+            start = time.perf_counter()
+            try:
+                cursor = conn.exec_driver_sql(statement)
+            except Exception as exc:
+                error = str(getattr(exc, "orig", None) or exc).strip().splitlines()[0]
+                results.append(
+                    StatementResult(
+                        comment, [], [], time.perf_counter() - start, failure=error
+                    )
+                )
+                raise SqlFailed(
+                    f"{sql_file.name}: {comment or statement[:60]}: {error}", results
+                ) from exc
+            rows, columns = [], []
+            if cursor.returns_rows:
+                rows = [tuple(row) for row in cursor.fetchall()]
+                columns = list(cursor.keys())
+            result = StatementResult(comment, columns, rows, time.perf_counter() - start)
+            if sql_file.stage == "checks":
+                result.failure = check_failure(result, thresholds, max_seconds)
+            results.append(result)
+            if result.failure:
+                raise CheckFailed(
+                    f"{sql_file.name}: {comment or statement[:60]}: {result.failure}",
+                    results,
+                )
+    return results
+
+
+def section_title(path: Path) -> str:
+    name = re.sub(r"^\d+_", "", path.stem)
+    return re.sub(r"_checks$", "", name)
+
+
+def format_value(value: object) -> str:
+    return "NULL" if value is None else str(value)
+
+
+def format_report(
+    files: Sequence[SqlFile], results: Dict[str, List[StatementResult]]
+) -> str:
+    lines = ["# SQL Checks Report", ""]
+    timings: List[Tuple[str, str, float, str]] = []
+    for sql_file in files:
+        if sql_file.stage != "checks" or sql_file.name not in results:
+            continue
+        rel_path = sql_file.path.relative_to(SQL_DIR.parent).as_posix()
+        lines += [f"## {section_title(sql_file.path)} ({rel_path})", ""]
+        for result in results[sql_file.name]:
+            if not result.columns and not result.failure:
+                continue
+            if not result.columns:
+                lines.append(f"- {result.comment or 'check'}: error")
+            elif not result.rows:
+                lines.append(f"- {result.comment or 'check'}: no rows")
+            elif len(result.rows) == 1:
+                lines += [
+                    f"- {col}: {format_value(value)}"
+                    for col, value in zip(result.columns, result.rows[0])
+                ]
+            else:
+                lines += [
+                    "- "
+                    + ", ".join(
+                        f"{col}: {format_value(value)}"
+                        for col, value in zip(result.columns, row)
+                    )
+                    for row in result.rows
+                ]
+            if result.failure:
+                lines.append(f"- **FAILED**: {result.failure}")
+            timings.append(
+                (
+                    rel_path,
+                    result.comment or (result.columns or ["statement"])[0],
+                    result.seconds,
+                    "FAILED" if result.failure else "ok",
+                )
+            )
+        lines.append("")
+
+    lines += [
+        "## Execution Times",
+        "",
+        "| file | check | seconds | status |",
+        "| --- | --- | ---: | --- |",
+    ]
+    lines += [
+        f"| {path} | {check} | {seconds:.3f} | {status} |"
+        for path, check, seconds, status in timings
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def run_sql(
+    engine,
+    files: Sequence[SqlFile],
+    jobs: int = 4,
+    truncate: bool = False,
+    thresholds: Optional[Dict[str, float]] = None,
+    max_seconds: Optional[float] = None,
+) -> Tuple[Dict[str, List[StatementResult]], Dict[str, float], Optional[Exception]]:
+    deps = infer_dependencies(files)
+    results: Dict[str, List[StatementResult]] = {}
+    lock = threading.Lock()
+
+    def _stage(sql_file: SqlFile):
+        def _run(ctx: dict) -> None:
+            try:
+                file_results = run_file(
+                    engine, sql_file, truncate, thresholds or {}, max_seconds
+                )
+            except SqlFailed as exc:
+                # Keep what the failing file produced for the report.
+                with lock:
+                    results[sql_file.name] = exc.results
+                raise
+            with lock:
+                results[sql_file.name] = file_results
+
+        return Stage(sql_file.name, _run, tuple(sorted(deps[sql_file.name])))
+
+    timings: Dict[str, float] = {}
+    error: Optional[Exception] = None
+    try:
+        timings = run_stages([_stage(f) for f in files], {}, max_workers=jobs)
+    except Exception as exc:
+        error = exc
+    return results, timings, error
+
+
+def print_plan(files: Sequence[SqlFile]) -> None:
+    deps = infer_dependencies(files)
+    for sql_file in files:
+        after = ", ".join(sorted(deps[sql_file.name])) or "-"
+        print(f"{sql_file.name:<44} after: {after}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--db", default="olist_analytics")
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        default=list(STAGES),
+        choices=STAGES,
+        help="Stages to run (default: all)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Files run concurrently, one pooled connection each (default: 4)",
+    )
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="TRUNCATE each transform's target tables first, so reruns do not conflict",
+    )
+    parser.add_argument(
+        "--partitioned",
+        action="store_true",
+        help="Use sql/ddl/partitioned/ for the fact tables",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Use sql/incremental/ upserts for the fact transforms",
+    )
+    parser.add_argument(
+        "--threshold",
+        action="append",
+        default=[],
+        metavar="NAME=MAX",
+        help="Fail when a check column is above MAX (repeatable)",
+    )
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=None,
+        help="Fail when a check statement runs longer than this",
+    )
+    parser.add_argument("--report", type=Path, default=REPORT_PATH)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Print the inferred plan and exit"
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.partitioned and args.incremental:
+        parser.error(
+            "--partitioned cannot be combined with --incremental "
+            "(ON CONFLICT needs the unpartitioned primary keys)"
+        )
+
+    files = discover(
+        args.stages, partitioned=args.partitioned, incremental=args.incremental
+    )
+    if args.dry_run:
+        print_plan(files)
+        return
+
+    password = os.getenv("PG_PASSWORD")
+    if not password:
+        raise SystemExit("PG_PASSWORD env var is required.")
+    if args.jobs < 1:
+        raise SystemExit("--jobs must be >= 1.")
+
+    from load_postgres import build_engine
+
+    engine = build_engine(
+        args.user, password, args.host, args.port, args.db, pool_size=args.jobs
+    )
+
+    start = time.perf_counter()
+    with profile_run("run_sql", args.profile):
+        results, timings, error = run_sql(
+            engine,
+            files,
+            jobs=args.jobs,
+            truncate=args.truncate,
+            thresholds=parse_thresholds(args.threshold),
+            max_seconds=args.max_seconds,
+        )
+    total = time.perf_counter() - start
+
+    print("\nSQL timings:")
+    for sql_file in files:
+        if sql_file.name in timings:
+            print(f"  {sql_file.name:<44} {timings[sql_file.name]:8.2f}s")
+    print(f"  {'total (wall)':<44} {total:8.2f}s")
+
+    if "checks" in args.stages:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        args.report.write_text(format_report(files, results), encoding="utf-8")
+        print(f"\nWrote {args.report}")
+
+    if error is not None:
+        kind = "Check failed" if isinstance(error, CheckFailed) else "SQL failed"
+        raise SystemExit(f"{kind}: {error}")
+
+
+if __name__ == "__main__":
+    main()
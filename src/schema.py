@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Typed schema registry derived from the column definitions in sql/ddl/*.sql.
+
+The DDL is the single source of truth for column types; readers turn it
+into pandas dtypes instead of letting read_csv infer them:
+
+- VARCHAR columns become categoricals, except ids (*_id) and TEXT, which
+  stay plain strings,
+- NOT NULL integers get the width the DDL declares (SMALLINT -> int16,
+  INT -> int32, BIGINT -> int64) when every value fits; nullable integers
+  stay float64 so NaN handling and the written marts do not change,
+- NUMERIC / DOUBLE PRECISION stay float64 (money is not narrowed),
+- TIMESTAMP columns are parsed with one fixed format.
+
+Usage:
+  python src/schema.py                 # print the registry
+  python src/schema.py raw_orders
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+DDL_DIR = Path(__file__).resolve().parents[1] / "sql" / "ddl"
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+RAW_TABLE_FILES: Dict[str, str] = {
+    "raw_orders": "olist_orders_dataset.csv",
+    "raw_order_items": "olist_order_items_dataset.csv",
+    "raw_order_payments": "olist_order_payments_dataset.csv",
+    "raw_customers": "olist_customers_dataset.csv",
+    "raw_products": "olist_products_dataset.csv",
+    "raw_category_translation": "product_category_name_translation.csv",
+    "raw_sellers": "olist_sellers_dataset.csv",
+    "raw_geolocation": "olist_geolocation_dataset.csv",
+    "raw_reviews": "olist_order_reviews_dataset.csv",
+}
+
+_FILE_TABLES = {filename: table for table, filename in RAW_TABLE_FILES.items()}
+
+_INT_WIDTHS = {"SMALLINT": "int16", "INT": "int32", "INTEGER": "int32", "BIGINT": "int64"}
+
+_CREATE_TABLE = re.compile(
+    r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s*\((.*?)\n\);",
+    re.IGNORECASE | re.DOTALL,
+)
+_COLUMN = re.compile(
+    r"^\s*(\w+)\s+([A-Z]+(?:\s+PRECISION)?)(?:\s*\(([\d,\s]+)\))?(.*?),?\s*$",
+    re.IGNORECASE,
+)
+_TABLE_KEY = re.compile(r"^\s*PRIMARY\s+KEY\s*\(([^)]*)\)", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    sql_type: str
+    nullable: bool = True
+    # Type modifiers, e.g. (12, 2) for NUMERIC(12,2) or (50,) for VARCHAR(50).
+    modifiers: Tuple[int, ...] = ()
+
+    @property
+    def kind(self) -> str:
+        """One of: id, category, text, int, float, timestamp, date, bool."""
+        if self.sql_type in ("VARCHAR", "CHAR"):
+            return "id" if self.name.endswith("_id") else "category"
+        if self.sql_type == "TEXT":
+            return "text"
+        if self.sql_type in _INT_WIDTHS:
+            return "int"
+        if self.sql_type in ("NUMERIC", "DECIMAL", "REAL", "DOUBLE PRECISION"):
+            return "float"
+        if self.sql_type == "TIMESTAMP":
+            return "timestamp"
+        if self.sql_type == "DATE":
+            return "date"
+        if self.sql_type == "BOOLEAN":
+            return "bool"
+        return "text"
+
+
+def parse_ddl(sql: str) -> Dict[str, Dict[str, Column]]:
+    sql = re.sub(r"--[^\n]*", "", sql)
+    tables: Dict[str, Dict[str, Column]] = {}
+    for table, body in _CREATE_TABLE.findall(sql):
+        columns: Dict[str, Column] = {}
+        key_columns: List[str] = []
+        for line in body.splitlines():
+            key = _TABLE_KEY.match(line)
+            if key:
+                key_columns += [c.strip() for c in key.group(1).split(",")]
+                continue
+            match = _COLUMN.match(line)
+            if not match or match.group(1).upper() in ("CONSTRAINT", "PRIMARY"):
+                continue
+            name, sql_type, modifiers, rest = match.groups()
+            rest = rest.upper()
+            columns[name] = Column(
+                name,
+                " ".join(sql_type.upper().split()),
+                nullable="NOT NULL" not in rest and "PRIMARY KEY" not in rest,
+                modifiers=tuple(
+                    int(m) for m in (modifiers or "").split(",") if m.strip()
+                ),
+            )
+        for name in key_columns:
+            if name in columns:
+                columns[name] = replace(columns[name], nullable=False)
+        tables[table] = columns
+    return tables
+
+
+@lru_cache(maxsize=None)
+def registry(ddl_dir: Path = DDL_DIR) -> Dict[str, Dict[str, Column]]:
+    tables: Dict[str, Dict[str, Column]] = {}
+    for path in sorted(ddl_dir.glob("*.sql")):
+        tables.update(parse_ddl(path.read_text(encoding="utf-8")))
+    return tables
+
+
+def columns_for_file(filename: str) -> Dict[str, Column]:
+    """Registry columns for a raw file; empty if the file has no DDL."""
+    table = _FILE_TABLES.get(filename)
+    return registry().get(table, {}) if table else {}
+
+
+def read_csv_dtypes(
+    filename: str, columns: Optional[Sequence[str]] = None
+) -> Dict[str, object]:
+    """
+    dtype= for pd.read_csv. NOT NULL integers are left to inference and
+    narrowed afterwards (narrow_ints), so a bad value never aborts the read.
+    """
+    dtypes: Dict[str, object] = {}
+    for name, column in columns_for_file(filename).items():
+        if columns is not None and name not in columns:
+            continue
+        if column.kind == "category":
+            dtypes[name] = "category"
+        elif column.kind in ("id", "text"):
+            dtypes[name] = str
+        elif column.kind == "float" or (column.kind == "int" and column.nullable):
+            dtypes[name] = "float64"
+    return dtypes
+
+
+def narrow_ints(df: pd.DataFrame, filename: str) -> pd.DataFrame:
+    """Cast NOT NULL integer columns to their DDL width when values fit."""
+    for name, column in columns_for_file(filename).items():
+        if name not in df.columns or column.kind != "int" or column.nullable:
+            continue
+        values = df[name]
+        if not pd.api.types.is_integer_dtype(values) or not len(values):
+            continue
+        target = np.dtype(_INT_WIDTHS[column.sql_type])
+        info = np.iinfo(target)
+        if info.min <= values.min() and values.max() <= info.max:
+            df[name] = values.astype(target)
+    return df
+
+
+def timestamp_columns(filename: str) -> List[str]:
+    return [
+        name
+        for name, column in columns_for_file(filename).items()
+        if column.kind == "timestamp"
+    ]
+
+
+def parse_timestamps(df: pd.DataFrame, filename: str) -> pd.DataFrame:
+    for col in timestamp_columns(filename):
+        if col not in df.columns:
+            continue
+        try:
+            df[col] = pd.to_datetime(df[col], format=TIMESTAMP_FORMAT)
+        except (ValueError, TypeError):
+            # Leave unexpected formats as text; builders parse them as before.
+            pass
+    return df
+
+
+def apply_schema(
+    df: pd.DataFrame, filename: str, timestamps: bool = True
+) -> pd.DataFrame:
+    """Finish typing a frame read with read_csv_dtypes()."""
+    df = narrow_ints(df, filename)
+    if timestamps:
+        df = parse_timestamps(df, filename)
+    return df
+
+
+def decode_categoricals(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn categoricals back into plain columns (for writers that need stable types)."""
+    categorical = [
+        col for col, dtype in df.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)
+    ]
+    if not categorical:
+        return df
+    df = df.copy()
+    for col in categorical:
+        df[col] = df[col].astype(df[col].cat.categories.dtype)
+    return df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("tables", nargs="*", help="Tables to show (default: all)")
+    args = parser.parse_args()
+
+    for table, columns in registry().items():
+        if args.tables and table not in args.tables:
+            continue
+        print(table)
+        for column in columns.values():
+            null = "" if column.nullable else " NOT NULL"
+            print(f"  {column.name:<32} {column.sql_type + null:<28} {column.kind}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Mergeable, bounded-memory summaries for single-pass (chunked) scans.
+
+- QuantileSketch: exact count / mean / std / min / max plus approximate
+  quantiles from a DDSketch (log-spaced buckets, every quantile within
+  relative_accuracy of the true value). Memory depends on the value range,
+  not on the row count.
+- HashedKeySet: 64-bit hashes of keys (8 bytes per distinct key instead of a
+  Python object per value) for duplicate counts and join coverage. Hashes
+  come from pd.util.hash_pandas_object, which is stable across str /
+  categorical / integer widths, so keys read from different files compare
+  equal.
+
+Both summaries merge, so per-chunk or per-worker results can be combined.
+
+Usage:
+  python src/sketches.py   # accuracy self-check on random data
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+
+def hash_keys(keys: Union[pd.Series, pd.DataFrame]) -> np.ndarray:
+    """uint64 per row; a DataFrame hashes its columns together (composite key)."""
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy: float = 0.001) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self._zeros = 0
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _add_buckets(self, buckets: Dict[int, int], values: np.ndarray) -> None:
+        keys = np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+        for key, n in zip(*np.unique(keys, return_counts=True)):
+            buckets[int(key)] = buckets.get(int(key), 0) + int(n)
+
+    def _merge_moments(self, count: int, mean: float, m2: float) -> None:
+        # Chan et al. parallel variance update.
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def update(self, values) -> None:
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        mean = float(values.mean())
+        self._merge_moments(len(values), mean, float(((values - mean) ** 2).sum()))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        self._zeros += int((values == 0).sum())
+        self._add_buckets(self._positive, values[values > 0])
+        self._add_buckets(self._negative, -values[values < 0])
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        if not other.count:
+            return
+        self._merge_moments(other.count, other.mean, other._m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._zeros += other._zeros
+        for mine, theirs in (
+            (self._positive, other._positive),
+            (self._negative, other._negative),
+        ):
+            for key, n in theirs.items():
+                mine[key] = mine.get(key, 0) + n
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    def _bucket_value(self, key: int) -> float:
+        return 2 * self._gamma**key / (self._gamma + 1)
+
+    def _value_at(self, rank: int) -> float:
+        """Estimate of the rank-th smallest value (0-based)."""
+        ordered: List[tuple] = [
+            (-self._bucket_value(key), n)
+            for key, n in sorted(self._negative.items(), reverse=True)
+        ]
+        ordered.append((0.0, self._zeros))
+        ordered += [
+            (self._bucket_value(key), n) for key, n in sorted(self._positive.items())
+        ]
+        seen = 0
+        for value, n in ordered:
+            seen += n
+            if seen > rank:
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return math.nan
+        # Same convention as pandas: interpolate between the two values
+        # around rank q * (n - 1).
+        rank = q * (self.count - 1)
+        lower = math.floor(rank)
+        low_value = self._value_at(lower)
+        if rank == lower:
+            return low_value
+        return low_value + (self._value_at(lower + 1) - low_value) * (rank - lower)
+
+    def describe(self, percentiles: Sequence[float] = (0.25, 0.5, 0.75)) -> pd.Series:
+        """Same rows as Series.describe(percentiles=...) on a float column."""
+        stats = {
+            "count": float(self.count),
+            "mean": self.mean if self.count else math.nan,
+            "std": self.std,
+            "min": self.min if self.count else math.nan,
+        }
+        for q in sorted(percentiles):
+            stats[f"{q * 100:g}%"] = self.quantile(q)
+        stats["max"] = self.max if self.count else math.nan
+        return pd.Series(stats, dtype="float64")
+
+
+class HashedKeySet:
+    """
+    Sorted runs of distinct uint64 key hashes.
+
+    New keys are appended as a sorted run and runs of similar size are merged
+    (binary-counter style), so adding N keys costs O(N log N) overall and a
+    lookup checks O(log N) runs.
+    """
+
+    def __init__(self) -> None:
+        self._runs: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self._runs)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(run.nbytes for run in self._runs)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self._runs:
+            idx = np.searchsorted(run, hashes)
+            idx[idx == len(run)] = 0
+            found |= run[idx] == hashes
+        return found
+
+    def add(self, hashes: np.ndarray) -> int:
+        """Add keys; returns how many were duplicates (as DataFrame.duplicated)."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        batch = np.unique(hashes)
+        fresh = batch[~self.contains(batch)] if self._runs else batch
+        duplicates = len(hashes) - len(fresh)
+        if len(fresh):
+            self._runs.append(fresh)
+            while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+                newer = self._runs.pop()
+                # Two sorted, disjoint runs: a stable sort merges them in O(n).
+                self._runs[-1] = np.sort(
+                    np.concatenate([self._runs[-1], newer]), kind="stable"
+                )
+        return duplicates
+
+    def merge(self, other: "HashedKeySet") -> None:
+        for run in other._runs:
+            self.add(run)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(4, 1, 1_000_000)
+    sketch = QuantileSketch()
+    for chunk in np.array_split(values, 10):
+        part = QuantileSketch()
+        part.update(chunk)
+        sketch.merge(part)
+    exact = pd.Series(values).describe(percentiles=[0.5, 0.99])
+    approx = sketch.describe([0.5, 0.99])
+    print(pd.DataFrame({"exact": exact, "sketch": approx, "rel_err": approx / exact - 1}))
+
+    keys = pd.Series(rng.integers(0, 500_000, 1_000_000)).astype(str)
+    key_set = HashedKeySet()
+    dupes = sum(
+        key_set.add(hash_keys(keys.iloc[start : start + 150_000]))
+        for start in range(0, len(keys), 150_000)
+    )
+    print(
+        f"\nduplicates: {dupes} (exact {int(keys.duplicated().sum())}), "
+        f"{len(key_set)} keys in {key_set.nbytes / 1e6:.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,80 +4,200 @@ Build fact_orders at order grain from raw Olist CSVs.
 
 Usage:
   python src/transform.py
+  python src/transform.py --incremental
+  python src/transform.py --format parquet
+  python src/transform.py --workers 4          # hash-partitioned, 4 processes
+  python src/transform.py --profile
 """
 
 from __future__ import annotations
 
+import argparse
 from pathlib import Path
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 
+from build_cache import BuildStage
+from geo_index import GEO_FILE, distance_km, load_zip_index
+from mart_io import FORMATS, mart_path, write_mart
+from parallel import hash_partition, route, run_partitioned
+from profiling import add_profile_argument, profile_run, step
+from raw_cache import read_raw
+from reviews import REVIEW_METRICS, REVIEWS_FILE, order_review_metrics
+from validation import ValidationResult, validate
+
 
 RAW_DIR = Path("data/raw")
 MART_DIR = Path("data/mart")
 
+# Raw files read by load_raw(): the build cache inputs.
+RAW_FILES = [
+    "olist_orders_dataset.csv",
+    "olist_order_items_dataset.csv",
+    "olist_order_payments_dataset.csv",
+    "olist_customers_dataset.csv",
+    "olist_sellers_dataset.csv",
+    GEO_FILE,
+    REVIEWS_FILE,
+]
+
 
-def load_raw() -> dict:
+def load_raw(raw_dir: Path = RAW_DIR) -> dict:
     return {
-        "orders": pd.read_csv(RAW_DIR / "olist_orders_dataset.csv"),
-        "items": pd.read_csv(RAW_DIR / "olist_order_items_dataset.csv"),
-        "payments": pd.read_csv(RAW_DIR / "olist_order_payments_dataset.csv"),
-        "customers": pd.read_csv(RAW_DIR / "olist_customers_dataset.csv"),
+        "orders": read_raw(
+            "olist_orders_dataset.csv",
+            columns=[
+                "order_id",
+                "customer_id",
+                "order_status",
+                "order_purchase_timestamp",
+                "order_delivered_customer_date",
+                "order_estimated_delivery_date",
+            ],
+            raw_dir=raw_dir,
+        ),
+        "items": read_raw(
+            "olist_order_items_dataset.csv",
+            columns=["order_id", "order_item_id", "seller_id"],
+            raw_dir=raw_dir,
+        ),
+        "payments": read_raw(
+            "olist_order_payments_dataset.csv",
+            columns=["order_id", "payment_value"],
+            raw_dir=raw_dir,
+        ),
+        "customers": read_raw(
+            "olist_customers_dataset.csv",
+            columns=[
+                "customer_id",
+                "customer_unique_id",
+                "customer_zip_code_prefix",
+                "customer_city",
+                "customer_state",
+            ],
+            raw_dir=raw_dir,
+        ),
+        "sellers": read_raw(
+            "olist_sellers_dataset.csv",
+            columns=["seller_id", "seller_zip_code_prefix"],
+            raw_dir=raw_dir,
+        ),
+        "zip_index": load_zip_index(raw_dir),
+        "reviews": order_review_metrics(raw_dir),
     }
 
 
+def join_order_customers(orders: pd.DataFrame, customers: pd.DataFrame) -> pd.DataFrame:
+    return orders.merge(customers, on="customer_id", how="left")
+
+
+def order_max_distance(
+    items: pd.DataFrame,
+    order_customers: pd.DataFrame,
+    sellers: pd.DataFrame,
+    zip_index: Optional[pd.DataFrame],
+) -> pd.DataFrame:
+    """Longest seller -> customer distance per order (order_id, km)."""
+    zips = items[["order_id", "seller_id"]].merge(sellers, on="seller_id", how="left")
+    zips = zips.merge(
+        order_customers[["order_id", "customer_zip_code_prefix"]],
+        on="order_id",
+        how="left",
+    )
+    zips["max_delivery_distance_km"] = distance_km(
+        zip_index, zips["seller_zip_code_prefix"], zips["customer_zip_code_prefix"]
+    )
+    return zips.groupby("order_id", as_index=False)["max_delivery_distance_km"].max()
+
+
 def build_fact_orders(raw: dict) -> pd.DataFrame:
-    orders = raw["orders"]
     items = raw["items"]
     payments = raw["payments"]
-    customers = raw["customers"]
+
+    # The pipeline runner passes a shared orders x customers join; standalone
+    # runs compute it here.
+    order_customers = raw.get("order_customers")
+    if order_customers is None:
+        with step("join_order_customers", len(raw["orders"]), join=True) as s:
+            order_customers = join_order_customers(raw["orders"], raw["customers"])
+            s.rows_out(len(order_customers))
 
     # Pre-aggregate to order grain to avoid double counting.
-    payments_agg = (
-        payments.groupby("order_id", as_index=False)["payment_value"]
-        .sum()
-        .rename(columns={"payment_value": "payment_value_total"})
-    )
+    with step("aggregate_payments", len(payments)) as s:
+        payments_agg = (
+            payments.groupby("order_id", as_index=False)["payment_value"]
+            .sum()
+            .rename(columns={"payment_value": "payment_value_total"})
+        )
+        s.rows_out(len(payments_agg))
 
-    items_agg = (
-        items.groupby("order_id", as_index=False)
-        .agg(items_cnt=("order_item_id", "count"))
-    )
+    with step("aggregate_items", len(items)) as s:
+        items_agg = (
+            items.groupby("order_id", as_index=False)
+            .agg(items_cnt=("order_item_id", "count"))
+        )
+        s.rows_out(len(items_agg))
 
-    fact_orders = (
-        orders.merge(customers, on="customer_id", how="left")
-        .merge(payments_agg, on="order_id", how="left")
-        .merge(items_agg, on="order_id", how="left")
-    )
+    with step("merge_payments", len(order_customers), join=True) as s:
+        fact_orders = order_customers.merge(payments_agg, on="order_id", how="left")
+        s.rows_out(len(fact_orders))
 
-    fact_orders["order_purchase_ts"] = pd.to_datetime(
-        fact_orders["order_purchase_timestamp"]
-    )
-    fact_orders["order_purchase_date"] = fact_orders["order_purchase_ts"].dt.date
-    fact_orders["order_delivered_ts"] = pd.to_datetime(
-        fact_orders["order_delivered_customer_date"]
-    )
-    fact_orders["order_estimated_ts"] = pd.to_datetime(
-        fact_orders["order_estimated_delivery_date"]
-    )
+    with step("merge_items", len(fact_orders), join=True) as s:
+        fact_orders = fact_orders.merge(items_agg, on="order_id", how="left")
+        s.rows_out(len(fact_orders))
+
+    with step("delivery_distance", len(items)):
+        distance = order_max_distance(
+            items, order_customers, raw["sellers"], raw.get("zip_index")
+        )
+    with step("merge_distance", len(fact_orders), join=True) as s:
+        fact_orders = fact_orders.merge(distance, on="order_id", how="left")
+        s.rows_out(len(fact_orders))
+
+    reviews = raw.get("reviews")
+    with step("merge_reviews", len(fact_orders), join=True) as s:
+        if reviews is not None:
+            fact_orders = fact_orders.merge(reviews, on="order_id", how="left")
+            fact_orders["reviews_cnt"] = fact_orders["reviews_cnt"].fillna(0)
+        else:
+            # No reviews file in the raw drop: unknown, not zero.
+            for col in REVIEW_METRICS:
+                fact_orders[col] = np.nan
+        fact_orders["reviews_cnt"] = fact_orders["reviews_cnt"].astype("Int64")
+        s.rows_out(len(fact_orders))
+
+    with step("parse_timestamps", len(fact_orders)):
+        fact_orders["order_purchase_ts"] = pd.to_datetime(
+            fact_orders["order_purchase_timestamp"]
+        )
+        fact_orders["order_purchase_date"] = fact_orders["order_purchase_ts"].dt.date
+        fact_orders["order_delivered_ts"] = pd.to_datetime(
+            fact_orders["order_delivered_customer_date"]
+        )
+        fact_orders["order_estimated_ts"] = pd.to_datetime(
+            fact_orders["order_estimated_delivery_date"]
+        )
 
-    fact_orders["delivered_days"] = (
-        fact_orders["order_delivered_ts"] - fact_orders["order_purchase_ts"]
-    ).dt.days
+    with step("delivery_metrics", len(fact_orders)):
+        fact_orders["delivered_days"] = (
+            fact_orders["order_delivered_ts"] - fact_orders["order_purchase_ts"]
+        ).dt.days
 
-    fact_orders["estimated_gap_days"] = (
-        fact_orders["order_delivered_ts"] - fact_orders["order_estimated_ts"]
-    ).dt.days
+        fact_orders["estimated_gap_days"] = (
+            fact_orders["order_delivered_ts"] - fact_orders["order_estimated_ts"]
+        ).dt.days
 
-    mask = fact_orders["order_delivered_ts"].notna() & fact_orders[
-        "order_estimated_ts"
-    ].notna()
-    fact_orders["on_time_flag"] = pd.NA
-    fact_orders.loc[mask, "on_time_flag"] = (
-        fact_orders.loc[mask, "order_delivered_ts"]
-        <= fact_orders.loc[mask, "order_estimated_ts"]
-    ).astype(int)
-    fact_orders["on_time_flag"] = fact_orders["on_time_flag"].astype("Int64")
+        mask = fact_orders["order_delivered_ts"].notna() & fact_orders[
+            "order_estimated_ts"
+        ].notna()
+        fact_orders["on_time_flag"] = pd.NA
+        fact_orders.loc[mask, "on_time_flag"] = (
+            fact_orders.loc[mask, "order_delivered_ts"]
+            <= fact_orders.loc[mask, "order_estimated_ts"]
+        ).astype(int)
+        fact_orders["on_time_flag"] = fact_orders["on_time_flag"].astype("Int64")
 
     fact_orders["is_canceled"] = (fact_orders["order_status"] == "canceled").astype(
         int
@@ -88,15 +208,20 @@ def build_fact_orders(raw: dict) -> pd.DataFrame:
     fact_orders["items_cnt"] = fact_orders["items_cnt"].fillna(0).astype("Int64")
     fact_orders["orders_cnt"] = 1
 
-    first_purchase = fact_orders.groupby("customer_unique_id")[
-        "order_purchase_ts"
-    ].transform("min")
-    is_new_mask = fact_orders["order_purchase_ts"] == first_purchase
-    fact_orders["is_new_customer"] = pd.NA
-    fact_orders.loc[is_new_mask, "is_new_customer"] = 1
-    fact_orders.loc[~is_new_mask, "is_new_customer"] = 0
-    fact_orders.loc[fact_orders["customer_unique_id"].isna(), "is_new_customer"] = pd.NA
-    fact_orders["is_new_customer"] = fact_orders["is_new_customer"].astype("Int64")
+    with step("first_purchase", len(fact_orders)):
+        first_purchase = fact_orders.groupby("customer_unique_id")[
+            "order_purchase_ts"
+        ].transform("min")
+
+    with step("is_new_customer", len(fact_orders)):
+        is_new_mask = fact_orders["order_purchase_ts"] == first_purchase
+        fact_orders["is_new_customer"] = pd.NA
+        fact_orders.loc[is_new_mask, "is_new_customer"] = 1
+        fact_orders.loc[~is_new_mask, "is_new_customer"] = 0
+        fact_orders.loc[
+            fact_orders["customer_unique_id"].isna(), "is_new_customer"
+        ] = pd.NA
+        fact_orders["is_new_customer"] = fact_orders["is_new_customer"].astype("Int64")
 
     cols = [
         "order_id",
@@ -118,31 +243,140 @@ def build_fact_orders(raw: dict) -> pd.DataFrame:
         "on_time_flag",
         "is_canceled",
         "is_new_customer",
+        "max_delivery_distance_km",
+        "review_score_avg",
+        "reviews_cnt",
+        "review_response_hours_avg",
     ]
 
     return fact_orders[cols]
 
 
-def run_checks(fact_orders: pd.DataFrame) -> None:
-    assert fact_orders["order_id"].is_unique, "order_id is not unique in fact_orders"
+def build_fact_orders_parallel(raw: dict, workers: int) -> pd.DataFrame:
+    """
+    build_fact_orders over hash partitions of customer_unique_id, so the
+    first-purchase window behind is_new_customer stays inside one partition.
+    Items, payments and reviews follow the partition of their order.
+    """
+    order_customers = raw.get("order_customers")
+    if order_customers is None:
+        with step("join_order_customers", len(raw["orders"]), join=True) as s:
+            order_customers = join_order_customers(raw["orders"], raw["customers"])
+            s.rows_out(len(order_customers))
+
+    with step("partition", len(order_customers)):
+        parts = hash_partition(order_customers["customer_unique_id"], workers)
+        order_parts = pd.Series(parts, index=order_customers["order_id"].to_numpy())
+        tables = {
+            "order_customers": order_customers,
+            "items": raw["items"],
+            "payments": raw["payments"],
+        }
+        table_parts = {
+            "order_customers": parts,
+            "items": route(raw["items"]["order_id"], order_parts),
+            "payments": route(raw["payments"]["order_id"], order_parts),
+        }
+        if raw.get("reviews") is not None:
+            tables["reviews"] = raw["reviews"]
+            table_parts["reviews"] = route(raw["reviews"]["order_id"], order_parts)
+    return run_partitioned(
+        build_fact_orders,
+        "order_customers",
+        tables,
+        table_parts,
+        workers,
+        shared={"sellers": raw["sellers"], "zip_index": raw.get("zip_index")},
+    )
 
-    missing_rates = fact_orders[["payment_value_total", "items_cnt"]].isna().mean()
-    print("Missing rates (payment_value_total, items_cnt):")
-    print(missing_rates)
 
-    print("\nAOV sanity (payment_value_total describe):")
-    print(fact_orders["payment_value_total"].describe())
+def run_checks(fact_orders: pd.DataFrame) -> ValidationResult:
+    result = validate("fact_orders", fact_orders)
+    print(result.summary())
+    result.raise_for_failures()
+    return result
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Rebuild only new/changed orders since the last run (see incremental.py)",
+    )
+    parser.add_argument(
+        "--format",
+        default="csv",
+        choices=FORMATS,
+        help="Mart output format (default: csv)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Build hash partitions in this many processes (default: 1, serial)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if inputs and code are unchanged (see build_cache.py)",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    if args.incremental and args.workers > 1:
+        parser.error("--workers cannot be combined with --incremental")
+
     MART_DIR.mkdir(parents=True, exist_ok=True)
-    raw = load_raw()
-    fact_orders = build_fact_orders(raw)
-    run_checks(fact_orders)
+    out_path = mart_path("fact_orders", MART_DIR, args.format)
+    cache = None
+    pending = None
+    if not args.incremental:
+        cache = BuildStage(
+            out_path.name,
+            [RAW_DIR / name for name in RAW_FILES],
+            [out_path],
+            {"format": args.format},
+            MART_DIR,
+        )
+    with profile_run("transform", args.profile):
+        if cache is not None:
+            with step("fingerprint"):
+                fresh = cache.up_to_date(args.force)
+            if fresh:
+                print(cache.report())
+                return
+        with step("load_raw") as s:
+            raw = load_raw()
+            s.rows_out(len(raw["orders"]))
+        if args.incremental:
+            from incremental import run_incremental
+
+            with step("build_fact_orders_incremental", len(raw["orders"])) as s:
+                fact_orders, pending = run_incremental(raw, MART_DIR, args.format)
+                if fact_orders is None:
+                    return
+                s.rows_out(len(fact_orders))
+        else:
+            with step("build_fact_orders", len(raw["orders"])) as s:
+                if args.workers > 1:
+                    fact_orders = build_fact_orders_parallel(raw, args.workers)
+                else:
+                    fact_orders = build_fact_orders(raw)
+                s.rows_out(len(fact_orders))
+        with step("checks", len(fact_orders)):
+            run_checks(fact_orders)
 
-    out_path = MART_DIR / "fact_orders.csv"
-    fact_orders.to_csv(out_path, index=False)
-    print(f"\nWrote {len(fact_orders)} rows -> {out_path}")
+        with step("write", len(fact_orders)):
+            out_path = write_mart(fact_orders, "fact_orders", MART_DIR, args.format)
+        print(f"\nWrote {len(fact_orders)} rows -> {out_path}")
+        if pending is not None:
+            # Only now: a failed check or write leaves the old state in place.
+            pending.save()
+        if cache is not None:
+            cache.save()
+            print(cache.report())
 
 
 if __name__ == "__main__":
@@ -4,41 +4,131 @@ Build fact_order_items at item grain from raw Olist CSVs.
 
 Usage:
   python src/transform_items.py
+  python src/transform_items.py --chunksize 250000   # streaming, bounded memory
+  python src/transform_items.py --format parquet
+  python src/transform_items.py --workers 4          # hash-partitioned, 4 processes
+  python src/transform_items.py --profile
 """
 
 from __future__ import annotations
 
+import argparse
 from pathlib import Path
+from typing import Optional
 
 import pandas as pd
 
+from build_cache import BuildStage
+from geo_index import GEO_FILE, distance_km, load_zip_index
+from mart_io import FORMATS, ChunkedMartWriter, mart_path, write_mart
+from parallel import hash_partition, run_partitioned
+from profiling import add_profile_argument, profile_run, step
+from raw_cache import read_raw
+from schema import apply_schema, read_csv_dtypes
+from transform import join_order_customers
+from validation import ValidationResult, Validator, validate
+
 
 RAW_DIR = Path("data/raw")
 MART_DIR = Path("data/mart")
 
+# Raw files read by load_raw(): the build cache inputs.
+RAW_FILES = [
+    "olist_orders_dataset.csv",
+    "olist_customers_dataset.csv",
+    "olist_products_dataset.csv",
+    "product_category_name_translation.csv",
+    "olist_order_items_dataset.csv",
+    "olist_sellers_dataset.csv",
+    GEO_FILE,
+]
+
+
+ITEM_COLUMNS = [
+    "order_id",
+    "order_item_id",
+    "product_id",
+    "seller_id",
+    "price",
+    "freight_value",
+]
+
+DEFAULT_CHUNKSIZE = 250_000
 
-def load_raw() -> dict:
+
+def load_dimensions(raw_dir: Path = RAW_DIR) -> dict:
     return {
-        "orders": pd.read_csv(RAW_DIR / "olist_orders_dataset.csv"),
-        "items": pd.read_csv(RAW_DIR / "olist_order_items_dataset.csv"),
-        "customers": pd.read_csv(RAW_DIR / "olist_customers_dataset.csv"),
-        "products": pd.read_csv(RAW_DIR / "olist_products_dataset.csv"),
-        "category_translation": pd.read_csv(
-            RAW_DIR / "product_category_name_translation.csv"
+        "orders": read_raw(
+            "olist_orders_dataset.csv",
+            columns=[
+                "order_id",
+                "customer_id",
+                "order_status",
+                "order_purchase_timestamp",
+            ],
+            raw_dir=raw_dir,
         ),
+        "customers": read_raw(
+            "olist_customers_dataset.csv",
+            columns=[
+                "customer_id",
+                "customer_unique_id",
+                "customer_zip_code_prefix",
+                "customer_city",
+                "customer_state",
+            ],
+            raw_dir=raw_dir,
+        ),
+        "products": read_raw(
+            "olist_products_dataset.csv",
+            columns=[
+                "product_id",
+                "product_category_name",
+                "product_weight_g",
+                "product_length_cm",
+                "product_height_cm",
+                "product_width_cm",
+            ],
+            raw_dir=raw_dir,
+        ),
+        "category_translation": read_raw(
+            "product_category_name_translation.csv", raw_dir=raw_dir
+        ),
+        "sellers": read_raw(
+            "olist_sellers_dataset.csv",
+            columns=["seller_id", "seller_zip_code_prefix"],
+            raw_dir=raw_dir,
+        ),
+        "zip_index": load_zip_index(raw_dir),
     }
 
 
-def build_fact_order_items(raw: dict) -> pd.DataFrame:
-    orders = raw["orders"]
-    items = raw["items"]
-    customers = raw["customers"]
-    products = raw["products"]
-    category_translation = raw["category_translation"]
-
-    fact_order_items = (
-        items.merge(
-            orders[
+def load_raw(raw_dir: Path = RAW_DIR) -> dict:
+    raw = load_dimensions(raw_dir)
+    raw["items"] = read_raw(
+        "olist_order_items_dataset.csv", columns=ITEM_COLUMNS, raw_dir=raw_dir
+    )
+    return raw
+
+
+ORDER_CUSTOMER_COLUMNS = [
+    "order_id",
+    "customer_id",
+    "order_status",
+    "order_purchase_timestamp",
+    "customer_unique_id",
+    "customer_zip_code_prefix",
+    "customer_city",
+    "customer_state",
+]
+
+
+def order_customer_lookup(raw: dict) -> pd.DataFrame:
+    # Shared with build_fact_orders when run from the pipeline runner.
+    order_customers = raw.get("order_customers")
+    if order_customers is None:
+        order_customers = join_order_customers(
+            raw["orders"][
                 [
                     "order_id",
                     "customer_id",
@@ -46,17 +136,47 @@ def build_fact_order_items(raw: dict) -> pd.DataFrame:
                     "order_purchase_timestamp",
                 ]
             ],
-            on="order_id",
-            how="left",
+            raw["customers"],
         )
-        .merge(customers, on="customer_id", how="left")
-        .merge(products, on="product_id", how="left")
-        .merge(category_translation, on="product_category_name", how="left")
-    )
+    return order_customers[ORDER_CUSTOMER_COLUMNS]
 
-    fact_order_items["order_purchase_ts"] = pd.to_datetime(
-        fact_order_items["order_purchase_timestamp"]
-    )
+
+def enrich_items(
+    items: pd.DataFrame,
+    order_customers: pd.DataFrame,
+    products: pd.DataFrame,
+    category_translation: pd.DataFrame,
+    sellers: pd.DataFrame,
+    zip_index: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    with step("merge_orders", len(items), join=True) as s:
+        fact_order_items = items.merge(order_customers, on="order_id", how="left")
+        s.rows_out(len(fact_order_items))
+    with step("merge_products", len(fact_order_items), join=True) as s:
+        fact_order_items = fact_order_items.merge(
+            products, on="product_id", how="left"
+        )
+        s.rows_out(len(fact_order_items))
+    with step("merge_translation", len(fact_order_items), join=True) as s:
+        fact_order_items = fact_order_items.merge(
+            category_translation, on="product_category_name", how="left"
+        )
+        s.rows_out(len(fact_order_items))
+    with step("merge_sellers", len(fact_order_items), join=True) as s:
+        fact_order_items = fact_order_items.merge(sellers, on="seller_id", how="left")
+        s.rows_out(len(fact_order_items))
+
+    with step("delivery_distance", len(fact_order_items)):
+        fact_order_items["delivery_distance_km"] = distance_km(
+            zip_index,
+            fact_order_items["seller_zip_code_prefix"],
+            fact_order_items["customer_zip_code_prefix"],
+        )
+
+    with step("parse_timestamps", len(fact_order_items)):
+        fact_order_items["order_purchase_ts"] = pd.to_datetime(
+            fact_order_items["order_purchase_timestamp"]
+        )
     fact_order_items["order_date"] = fact_order_items["order_purchase_ts"].dt.date
     fact_order_items["item_price"] = fact_order_items["price"]
     fact_order_items["item_gmv"] = (
@@ -86,6 +206,7 @@ def build_fact_order_items(raw: dict) -> pd.DataFrame:
         "freight_value",
         "item_gmv",
         "item_cnt",
+        "delivery_distance_km",
     ]
 
     fact_order_items = fact_order_items[cols].rename(
@@ -95,40 +216,200 @@ def build_fact_order_items(raw: dict) -> pd.DataFrame:
     return fact_order_items
 
 
-def run_checks(fact_order_items: pd.DataFrame) -> None:
-    dupes = fact_order_items.duplicated(["order_id", "order_item_id"]).sum()
-    assert dupes == 0, "Duplicate (order_id, order_item_id) found"
-
-    if (fact_order_items["item_gmv"] < 0).any():
-        raise ValueError("Negative item_gmv values detected")
+def build_fact_order_items(raw: dict) -> pd.DataFrame:
+    return enrich_items(
+        raw["items"],
+        order_customer_lookup(raw),
+        raw["products"],
+        raw["category_translation"],
+        raw["sellers"],
+        raw.get("zip_index"),
+    )
 
-    print("Item GMV describe:")
-    print(fact_order_items["item_gmv"].describe())
 
-    missing_orders = fact_order_items["customer_id"].isna().sum()
-    missing_products = fact_order_items["product_id"].isna().sum()
-    missing_translation = fact_order_items["product_category_en"].isna().sum()
-    total = len(fact_order_items)
-    print("\nJoin coverage (missing rows):")
-    print(
-        {
-            "items_without_orders": missing_orders,
-            "items_without_products": missing_products,
-            "items_without_translation": missing_translation,
-            "total_items": total,
+def build_fact_order_items_parallel(raw: dict, workers: int) -> pd.DataFrame:
+    """
+    build_fact_order_items over hash partitions of order_id. Products and the
+    category translation are shared with every worker once.
+    """
+    order_customers = order_customer_lookup(raw)
+    with step("partition", len(raw["items"])):
+        tables = {"items": raw["items"], "order_customers": order_customers}
+        table_parts = {
+            name: hash_partition(df["order_id"], workers) for name, df in tables.items()
         }
+    return run_partitioned(
+        build_fact_order_items,
+        "items",
+        tables,
+        table_parts,
+        workers,
+        shared={
+            "products": raw["products"],
+            "category_translation": raw["category_translation"],
+            "sellers": raw["sellers"],
+            "zip_index": raw.get("zip_index"),
+        },
     )
 
 
+def build_fact_order_items_chunked(
+    dims: dict,
+    items_path: Path,
+    writer: ChunkedMartWriter,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> ValidationResult:
+    """
+    Stream the items file through the joins and append each chunk to writer.
+
+    Only the dimension frames (orders x customers lookup, products, category
+    translation, sellers, zip index) stay resident, so the frames in memory
+    are bounded by chunksize rather than by the size of the item history. The
+    key uniqueness check still keeps one 8-byte hash per item, so that part
+    grows with the history.
+
+    The mart checks run on each chunk as it is produced and their result is
+    printed before the writer publishes anything: on a failure (or any error
+    while streaming) the chunks written so far are discarded, the previous
+    mart stays in place and the error is raised. Returns the ValidationResult.
+    """
+    order_customers = order_customer_lookup(dims)
+    products = dims["products"]
+    category_translation = dims["category_translation"]
+    sellers = dims["sellers"]
+    zip_index = dims.get("zip_index")
+
+    validator = Validator("fact_order_items")
+
+    # Registry dtypes, so every streamed chunk has the same types as a full read.
+    reader = pd.read_csv(
+        items_path,
+        usecols=ITEM_COLUMNS,
+        dtype=read_csv_dtypes(items_path.name, ITEM_COLUMNS),
+        chunksize=chunksize,
+    )
+    try:
+        for items in reader:
+            items = apply_schema(items, items_path.name)
+            with step("enrich_chunk", len(items)) as s:
+                chunk = enrich_items(
+                    items,
+                    order_customers,
+                    products,
+                    category_translation,
+                    sellers,
+                    zip_index,
+                )
+                s.rows_out(len(chunk))
+
+            with step("validate_chunk", len(chunk)):
+                validator.update(chunk)
+
+            with step("write_chunk", len(chunk)):
+                writer.write(chunk)
+
+        result = validator.result()
+        print(result.summary())
+        result.raise_for_failures()
+    except BaseException:
+        writer.discard()
+        raise
+    writer.close()
+    return result
+
+
+def run_checks(fact_order_items: pd.DataFrame) -> ValidationResult:
+    result = validate("fact_order_items", fact_order_items)
+    print(result.summary())
+    result.raise_for_failures()
+    return result
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Stream the items file in chunks of this many rows (bounded memory)",
+    )
+    parser.add_argument(
+        "--format",
+        default="csv",
+        choices=FORMATS,
+        help="Mart output format (default: csv)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Build hash partitions in this many processes (default: 1, serial)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if inputs and code are unchanged (see build_cache.py)",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    if args.chunksize and args.workers > 1:
+        parser.error("--workers cannot be combined with --chunksize")
+
     MART_DIR.mkdir(parents=True, exist_ok=True)
-    raw = load_raw()
-    fact_order_items = build_fact_order_items(raw)
-    run_checks(fact_order_items)
+    out_path = mart_path("fact_order_items", MART_DIR, args.format)
+    # --chunksize only bounds memory; the mart is the same, so is the stage.
+    cache = BuildStage(
+        out_path.name,
+        [RAW_DIR / name for name in RAW_FILES],
+        [out_path],
+        {"format": args.format},
+        MART_DIR,
+    )
+
+    with profile_run("transform_items", args.profile):
+        with step("fingerprint"):
+            fresh = cache.up_to_date(args.force)
+        if fresh:
+            print(cache.report())
+            return
+        if args.chunksize:
+            with step("load_dimensions"):
+                dims = load_dimensions()
+            writer = ChunkedMartWriter("fact_order_items", MART_DIR, args.format)
+            with step("build_fact_order_items_chunked") as s:
+                result = build_fact_order_items_chunked(
+                    dims,
+                    RAW_DIR / "olist_order_items_dataset.csv",
+                    writer,
+                    chunksize=args.chunksize,
+                )
+                s.rows_out(result.rows)
+            print(f"\nWrote {result.rows} rows -> {writer.path}")
+            cache.save()
+            print(cache.report())
+            return
+
+        with step("load_raw") as s:
+            raw = load_raw()
+            s.rows_out(len(raw["items"]))
+        with step("build_fact_order_items", len(raw["items"])) as s:
+            if args.workers > 1:
+                fact_order_items = build_fact_order_items_parallel(raw, args.workers)
+            else:
+                fact_order_items = build_fact_order_items(raw)
+            s.rows_out(len(fact_order_items))
+        with step("checks", len(fact_order_items)):
+            run_checks(fact_order_items)
 
-    out_path = MART_DIR / "fact_order_items.csv"
-    fact_order_items.to_csv(out_path, index=False)
-    print(f"\nWrote {len(fact_order_items)} rows -> {out_path}")
+        with step("write", len(fact_order_items)):
+            out_path = write_mart(
+                fact_order_items, "fact_order_items", MART_DIR, args.format
+            )
+        print(f"\nWrote {len(fact_order_items)} rows -> {out_path}")
+        cache.save()
+        print(cache.report())
 
 
 if __name__ == "__main__":
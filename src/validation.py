@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Declarative data checks for the marts, computed in one fused pass.
+
+Checks are registered per mart in CHECKS. A Validator evaluates all checks
+of a mart together: null counts of every checked column come from a single
+isna() over those columns, each numeric column is converted to a float array
+once and shared by its range and distribution checks, and key uniqueness is
+tracked with hashed key sets (8 bytes per key). Validator.update() can be
+fed the whole mart or each chunk as it is produced; everything it keeps is
+mergeable, so the result is the same either way (distribution quantiles are
+approximate, see sketches.QuantileSketch).
+
+Validation returns a ValidationResult with one CheckResult per check (value,
+threshold, pass/fail) instead of printing; raise_for_failures() turns failed
+checks into a ValueError.
+
+Usage:
+  python src/validation.py                      # validate all marts in data/mart
+  python src/validation.py fact_order_items
+  python src/validation.py --format parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from mart_io import FORMATS, read_mart
+from sketches import HashedKeySet, QuantileSketch, hash_keys
+
+
+MART_DIR = Path("data/mart")
+
+
+@dataclass(frozen=True)
+class Unique:
+    """No duplicate keys (as DataFrame.duplicated(columns))."""
+
+    name: str
+    columns: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class NullRate:
+    """Share of missing values; max_rate=None only reports it."""
+
+    name: str
+    column: str
+    max_rate: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class InRange:
+    """No values outside [min, max] (missing values are not counted)."""
+
+    name: str
+    column: str
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class Distribution:
+    """Summary statistics of a numeric column (report only)."""
+
+    name: str
+    column: str
+    percentiles: Tuple[float, ...] = (0.25, 0.5, 0.75)
+
+
+Check = Union[Unique, NullRate, InRange, Distribution]
+
+
+CHECKS: Dict[str, List[Check]] = {
+    "fact_orders": [
+        Unique("order_id_unique", ("order_id",)),
+        NullRate("payment_value_total_missing", "payment_value_total"),
+        NullRate("items_cnt_missing", "items_cnt"),
+        NullRate("distance_missing", "max_delivery_distance_km"),
+        NullRate("review_score_missing", "review_score_avg"),
+        InRange("review_score_in_range", "review_score_avg", min=1, max=5),
+        Distribution("payment_value_total", "payment_value_total"),
+    ],
+    "fact_order_items": [
+        Unique("order_item_key_unique", ("order_id", "order_item_id")),
+        InRange("item_gmv_non_negative", "item_gmv", min=0),
+        Distribution("item_gmv", "item_gmv"),
+        NullRate("items_without_orders", "customer_id"),
+        NullRate("items_without_products", "product_id"),
+        NullRate("items_without_translation", "product_category_en"),
+        NullRate("items_without_distance", "delivery_distance_km"),
+    ],
+    "fact_seller_daily": [
+        Unique("seller_day_unique", ("seller_id", "order_date")),
+        InRange("gmv_sum_non_negative", "gmv_sum", min=0),
+        NullRate("sellers_without_state", "seller_state"),
+        Distribution("gmv_sum", "gmv_sum"),
+    ],
+}
+
+
+@dataclass
+class CheckResult:
+    name: str
+    value: Union[int, float, Dict[str, float]]
+    passed: bool = True
+    threshold: Optional[str] = None
+    details: Dict[str, Union[int, float]] = field(default_factory=dict)
+
+
+@dataclass
+class ValidationResult:
+    mart: str
+    rows: int
+    checks: List[CheckResult]
+    seconds: float
+
+    @property
+    def passed(self) -> bool:
+        return all(check.passed for check in self.checks)
+
+    @property
+    def failures(self) -> List[CheckResult]:
+        return [check for check in self.checks if not check.passed]
+
+    def __getitem__(self, name: str) -> CheckResult:
+        for check in self.checks:
+            if check.name == name:
+                return check
+        raise KeyError(name)
+
+    def raise_for_failures(self) -> None:
+        if self.failures:
+            failed = ", ".join(
+                f"{check.name}={check.value} (expected {check.threshold})"
+                for check in self.failures
+            )
+            raise ValueError(f"{self.mart} validation failed: {failed}")
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            [
+                {
+                    "check": check.name,
+                    "value": check.value,
+                    "threshold": check.threshold,
+                    "passed": check.passed,
+                }
+                for check in self.checks
+            ]
+        )
+
+    def summary(self) -> str:
+        lines = [f"{self.mart}: {self.rows} rows, validated in {self.seconds:.3f}s"]
+        for check in self.checks:
+            status = "ok  " if check.passed else "FAIL"
+            if isinstance(check.value, dict):
+                value = ", ".join(f"{k}={v:.4g}" for k, v in check.value.items())
+            elif isinstance(check.value, float):
+                value = f"{check.value:.4%}"
+                if "missing" in check.details:
+                    value += f" ({check.details['missing']} rows)"
+            else:
+                value = str(check.value)
+            threshold = f"  (expected {check.threshold})" if check.threshold else ""
+            lines.append(f"  [{status}] {check.name:<28} {value}{threshold}")
+        return "\n".join(lines)
+
+
+class Validator:
+    """Accumulates the checks of one mart over one or more update() calls."""
+
+    def __init__(self, mart: str, checks: Optional[Sequence[Check]] = None) -> None:
+        if checks is None:
+            if mart not in CHECKS:
+                raise KeyError(f"No checks registered for {mart}")
+            checks = CHECKS[mart]
+        self.mart = mart
+        self.checks = list(checks)
+        self.rows = 0
+        self._seconds = 0.0
+
+        self._null_columns = list(
+            dict.fromkeys(c.column for c in self.checks if isinstance(c, NullRate))
+        )
+        self._nulls: Dict[str, int] = dict.fromkeys(self._null_columns, 0)
+        self._numeric_columns = list(
+            dict.fromkeys(
+                c.column for c in self.checks if isinstance(c, (InRange, Distribution))
+            )
+        )
+        self._keys: Dict[str, HashedKeySet] = {}
+        self._duplicates: Dict[str, int] = {}
+        self._out_of_range: Dict[str, int] = {}
+        self._sketches: Dict[str, QuantileSketch] = {}
+        for check in self.checks:
+            if isinstance(check, Unique):
+                self._keys[check.name] = HashedKeySet()
+                self._duplicates[check.name] = 0
+            elif isinstance(check, InRange):
+                self._out_of_range[check.name] = 0
+            elif isinstance(check, Distribution):
+                self._sketches[check.name] = QuantileSketch()
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        start = time.perf_counter()
+        self.rows += len(chunk)
+        if not len(chunk):
+            return
+
+        if self._null_columns:
+            for column, n in chunk[self._null_columns].isna().sum().items():
+                self._nulls[column] += int(n)
+
+        values = {
+            column: chunk[column].to_numpy(dtype="float64", na_value=np.nan)
+            for column in self._numeric_columns
+        }
+        for check in self.checks:
+            if isinstance(check, Unique):
+                hashes = hash_keys(chunk[list(check.columns)])
+                self._duplicates[check.name] += self._keys[check.name].add(hashes)
+            elif isinstance(check, InRange):
+                column = values[check.column]
+                bad = np.zeros(len(column), dtype=bool)
+                if check.min is not None:
+                    bad |= column < check.min
+                if check.max is not None:
+                    bad |= column > check.max
+                self._out_of_range[check.name] += int(bad.sum())
+            elif isinstance(check, Distribution):
+                self._sketches[check.name].update(values[check.column])
+        self._seconds += time.perf_counter() - start
+
+    def _check_result(self, check: Check) -> CheckResult:
+        if isinstance(check, Unique):
+            dupes = self._duplicates[check.name]
+            return CheckResult(check.name, dupes, dupes == 0, "0 duplicates")
+        if isinstance(check, InRange):
+            bad = self._out_of_range[check.name]
+            if check.min is not None and check.max is not None:
+                bounds = f"in [{check.min}, {check.max}]"
+            elif check.min is not None:
+                bounds = f">= {check.min}"
+            else:
+                bounds = f"<= {check.max}"
+            return CheckResult(check.name, bad, bad == 0, f"all {bounds}")
+        if isinstance(check, NullRate):
+            missing = self._nulls[check.column]
+            rate = missing / self.rows if self.rows else 0.0
+            if check.max_rate is None:
+                return CheckResult(check.name, rate, details={"missing": missing})
+            return CheckResult(
+                check.name,
+                rate,
+                rate <= check.max_rate,
+                f"<= {check.max_rate:.4%}",
+                {"missing": missing},
+            )
+        described = self._sketches[check.name].describe(check.percentiles)
+        return CheckResult(check.name, described.to_dict())
+
+    def result(self) -> ValidationResult:
+        return ValidationResult(
+            self.mart,
+            self.rows,
+            [self._check_result(check) for check in self.checks],
+            self._seconds,
+        )
+
+
+def validate(mart: str, df: pd.DataFrame) -> ValidationResult:
+    validator = Validator(mart)
+    validator.update(df)
+    return validator.result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "marts", nargs="*", help=f"Marts to validate (default: {', '.join(CHECKS)})"
+    )
+    parser.add_argument("--mart-dir", type=Path, default=MART_DIR)
+    parser.add_argument("--format", default="csv", choices=FORMATS)
+    args = parser.parse_args()
+
+    failed = []
+    for mart in args.marts or list(CHECKS):
+        result = validate(mart, read_mart(mart, args.mart_dir, args.format))
+        print(result.summary())
+        if not result.passed:
+            failed.append(mart)
+    if failed:
+        raise SystemExit(f"Validation failed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()